@@ -11,7 +11,8 @@ ProductsRawSchema = DataFrameSchema(
         "dimensions_mm": Column(pa.String, nullable=True),
         "vendor_code": Column(pa.String, nullable=True),
         "launch_date": Column(pa.String, nullable=True),
-        "msrp_usd": Column(pa.Float, nullable=True),
+        # text: feeds write decimal commas ("159,90"), parsed by the transform
+        "msrp_usd": Column(pa.String, nullable=True, coerce=True),
     }
 )
 
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the ETL and RAG pipelines.
+Generates a seeded dataset (scripts/gen_data.py), runs every stage in a fresh
+process and records throughput, latency and peak memory per stage. Each run
+is appended to a JSON history with its commit, and compared with the previous
+run of the same configuration so regressions stand out.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from gen_data import add_arguments, generate, read_spec_pages
+from src.etl.profiling import RunProfile
+from src.rag.chunking import chunk_pages
+from src.rag.ingest import build_lexical_index, build_vector_index, save_index
+from src.rag.retriever import SEARCH_MODES, RAGIndex
+
+ROOT = Path(__file__).resolve().parent.parent
+HISTORY = ROOT / "bench" / "history.json"
+ETL_MODES = ("in_memory", "streaming")
+SEARCH_BATCH = 64
+# a metric is flagged when it gets this much worse than in the previous run
+REGRESSION = 0.10
+# timings under this many seconds are too noisy to flag
+MIN_SECONDS = 0.05
+# metric -> True when higher is better
+COMPARED = {"seconds": False, "p99_ms": False, "peak_rss_mb": False, "recall_at_k": True}
+
+
+def _record(seconds: float, rows: int, peak_rss_mb: float) -> dict:
+    return {
+        "seconds": seconds,
+        "rows": rows,
+        "rows_per_second": rows / seconds if seconds else None,
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _in_child(fn, *args):
+    # a fresh interpreter per stage, so peak RSS belongs to that stage alone
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def bench_etl(raw_dir: Path, out_dir: Path, mode: str, input_rows: int) -> dict:
+    """One `python -m src.etl.run --profile` run; its per-stage metrics become records."""
+    cmd = [sys.executable, "-m", "src.etl.run", "--raw-dir", str(raw_dir)]
+    cmd += ["--out-dir", str(out_dir), "--profile"]
+    if mode == "streaming":
+        cmd.append("--streaming")
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    subprocess.run(cmd, check=True, cwd=ROOT, env=env, capture_output=True)
+    metrics = json.loads((out_dir / "run_metrics.json").read_text())
+
+    results = {}
+    for stage in metrics["stages"]:
+        rows = sum((stage["rows_in"] or {}).values()) or input_rows
+        results[f"etl.{mode}.{stage['name']}"] = _record(
+            stage["wall_seconds"], rows, stage["peak_rss_mb"]
+        )
+    peak = max(stage["peak_rss_mb"] for stage in metrics["stages"])
+    results[f"etl.{mode}"] = _record(metrics["wall_seconds"], input_rows, peak)
+    return results
+
+
+def bench_ingest(spec_dir: Path, index_dir: Path) -> dict:
+    """Chunk, embed, index and save the spec corpus, one record per step."""
+    profile = RunProfile("rag")
+    with contextlib.redirect_stdout(io.StringIO()):
+        with profile.stage("chunk") as stage:
+            chunks, meta = [], []
+            for path in sorted(spec_dir.glob("*.txt")):
+                for text, page in chunk_pages(read_spec_pages(path)):
+                    chunks.append(text)
+                    meta.append({"page": page, "source": path.name})
+            stage["rows_out"] = len(chunks)
+        with profile.stage("embed"):
+            index, embedder = build_vector_index(chunks)
+        with profile.stage("lexical"):
+            lexical = build_lexical_index(chunks)
+        with profile.stage("save"):
+            save_index(index_dir, index, chunks, meta, lexical, embedder)
+
+    return {
+        f"rag.ingest.{s['name']}": _record(s["wall_seconds"], len(chunks), s["peak_rss_mb"])
+        for s in profile.stages
+    }
+
+
+def bench_search(index_dir: Path, queries_path: Path, n_queries: int, k: int = 5) -> dict:
+    """Index load time, then per search mode: latency percentiles, throughput and recall@k."""
+    lines = queries_path.read_text(encoding="utf-8").splitlines()[:n_queries]
+    queries = [json.loads(line) for line in lines]
+    questions = [q["question"] for q in queries]
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        rag = RAGIndex(index_dir)
+        results = {
+            "rag.load": _record(time.perf_counter() - start, len(rag.chunks), _peak_rss_mb())
+        }
+
+    for mode in SEARCH_MODES:
+        latencies, found = [], 0
+        for q in queries:
+            start = time.perf_counter()
+            hits = rag.search(q["question"], k=k, mode=mode)
+            latencies.append(time.perf_counter() - start)
+            found += any(h["source"] == q["source"] for h in hits)
+        start = time.perf_counter()
+        for i in range(0, len(questions), SEARCH_BATCH):
+            rag.search_batch(questions[i : i + SEARCH_BATCH], k=k, mode=mode)
+        batch_seconds = time.perf_counter() - start
+
+        ms = np.array(latencies) * 1000
+        results[f"rag.search.{mode}"] = {
+            "seconds": float(sum(latencies)),
+            "queries": len(queries),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99)),
+            "qps": len(queries) / sum(latencies),
+            "batch_qps": len(queries) / batch_seconds,
+            "recall_at_k": found / len(queries),
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+    return results
+
+
+def _git(*args) -> str:
+    try:
+        out = subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path: Path) -> list:
+    return json.loads(path.read_text()) if path.exists() else []
+
+
+def regressions(current: dict, previous: dict, threshold: float = REGRESSION) -> list:
+    """(benchmark, metric, previous, current, relative change) that got worse than threshold."""
+    found = []
+    for name, record in current.items():
+        before = previous.get(name, {})
+        for metric, higher_is_better in COMPARED.items():
+            old, new = before.get(metric), record.get(metric)
+            if not old or new is None:
+                continue
+            if metric == "seconds" and max(old, new) < MIN_SECONDS:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                found.append((name, metric, old, new, change))
+    return found
+
+
+def _print_results(results: dict, previous: dict):
+    header = ["seconds", "rows/s", "p99 ms", "recall", "peak MB", "vs prev"]
+    print(f"\n{'benchmark':<26}" + "".join(f"{h:>10}" for h in header))
+    for name, r in results.items():
+        before = previous.get(name, {}).get("seconds")
+        cells = [
+            f"{r['seconds']:.3f}",
+            f"{r.get('rows_per_second') or r.get('qps') or 0:,.0f}",
+            f"{r['p99_ms']:.1f}" if "p99_ms" in r else "",
+            f"{r['recall_at_k']:.2f}" if "recall_at_k" in r else "",
+            f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "",
+            f"{(r['seconds'] - before) / before:+.0%}" if before else "",
+        ]
+        print(f"{name:<26}" + "".join(f"{c:>10}" for c in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL and RAG pipelines")
+    add_arguments(parser)
+    parser.add_argument("--queries", type=int, default=300, help="Search queries per mode")
+    parser.add_argument(
+        "--only", choices=["etl", "rag"], action="append", help="Run only these pipelines"
+    )
+    parser.add_argument("--history", default=str(HISTORY), help="JSON history to append to")
+    parser.add_argument("--label", help="Free-form note stored with the run")
+    parser.add_argument("--work-dir", help="Keep generated data and outputs here")
+    parser.add_argument(
+        "--threshold", type=float, default=REGRESSION, help="Relative change flagged as regression"
+    )
+    parser.add_argument(
+        "--fail-on-regression", action="store_true", help="Exit with status 1 on any regression"
+    )
+    args = parser.parse_args()
+    only = args.only or ["etl", "rag"]
+    config = {
+        "rows": args.rows,
+        "docs": args.docs,
+        "pages": args.pages,
+        "queries": args.queries,
+        "seed": args.seed,
+        "only": sorted(only),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(args.work_dir or tmp)
+        print(f"🚀 Generating {args.rows:,} products and {args.docs} spec sheets...")
+        generated = generate(work, args.rows, args)
+        results = {
+            f"generate.{name}": _record(r["seconds"], r["rows"], None)
+            for name, r in generated.items()
+        }
+        input_rows = sum(generated[name]["rows"] for name in ("products", "vendors", "inventory"))
+
+        if "etl" in only:
+            for mode in ETL_MODES:
+                print(f"⏱️ ETL ({mode})...")
+                results.update(bench_etl(work / "raw", work / f"etl-{mode}", mode, input_rows))
+        if "rag" in only:
+            print("⏱️ RAG ingest and search...")
+            results.update(_in_child(bench_ingest, work / "specs", work / "index"))
+            results.update(
+                _in_child(
+                    bench_search, work / "index", work / "specs" / "queries.jsonl", args.queries
+                )
+            )
+
+    history_path = Path(args.history)
+    history = load_history(history_path)
+    previous = next((run for run in reversed(history) if run["config"] == config), None)
+    _print_results(results, previous["results"] if previous else {})
+
+    run = {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "label": args.label,
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": config,
+        "results": results,
+    }
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    history_path.write_text(json.dumps(history + [run], indent=2))
+    print(f"\n📄 Appended run to {history_path}")
+
+    if previous is None:
+        print("No previous run with this configuration to compare with")
+        return
+    found = regressions(results, previous["results"], args.threshold)
+    print(f"Compared with {previous['commit']} ({previous['date']}): {len(found)} regressions")
+    for name, metric, old, new, change in found:
+        print(f"  ⚠️ {name} {metric}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+    if found and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the ETL transforms.
+Generates synthetic dirty inputs with scripts/gen_data.py, times each engine
+and checks they agree.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from gen_data import Rates, add_arguments, inventory_batch, vendor_batch, write_products
+from src.etl.lookup import TrustedTables
+from src.etl.transform import build_dim_product, build_dim_vendor, build_fact_inventory
+from src.etl.utils import SORT_KEYS, read_products_csv, write_parquet
+from src.etl.validators import (
+    configure_validation,
+    validate_dim_product,
+    validate_fact_inventory,
+    validate_raw_inventory,
+)
+
+
+def _default_rates() -> Rates:
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    return Rates(parser.parse_args([]))
+
+
+# gen_data's default dirty-data rates
+RATES = _default_rates()
+
+
+def raw_products(n: int, seed: int = 0) -> pd.DataFrame:
+    """n generated products, as read_products_csv returns them."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "products.csv"
+        write_products(path, n, max(n // 100, 10), RATES, seed)
+        return read_products_csv(path)[0]
+
+
+def raw_inventory(n: int, n_products: int, seed: int = 0) -> pd.DataFrame:
+    """n generated inventory rows over the products of raw_products(n_products)."""
+    return inventory_batch(n, n_products, RATES, np.random.default_rng(seed)).to_pandas()
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_dim_product(rows: int, seed: int = 0):
+    """Row loop vs columnar build_dim_product."""
+    products = raw_products(rows, seed)
+    (dim_rows, q_rows), t_rows = _timed(build_dim_product, products, {}, engine="rows")
+    (dim_cols, q_cols), t_cols = _timed(build_dim_product, products, {}, engine="columnar")
+
+    pd.testing.assert_frame_equal(dim_rows, dim_cols)
+    pd.testing.assert_frame_equal(q_rows, q_cols)
+
+    return {
+        "benchmark": "dim_product",
+        "rows": rows,
+        "rows_seconds": t_rows,
+        "columnar_seconds": t_cols,
+        "speedup": t_rows / t_cols if t_cols else float("inf"),
+    }
+
+
+def bench_fact_inventory(rows: int, seed: int = 0):
+    """Row loop vs columnar build_fact_inventory."""
+    n_products = max(rows // 10, 1)
+    dim_product, _ = build_dim_product(raw_products(n_products, seed), {})
+    inventory = raw_inventory(rows, n_products, seed)
+    (fact_rows, q_rows), t_rows = _timed(
+        build_fact_inventory, inventory, dim_product, engine="rows"
+    )
+    (fact_cols, q_cols), t_cols = _timed(
+        build_fact_inventory, inventory, dim_product, engine="columnar"
+    )
+
+    pd.testing.assert_frame_equal(fact_rows, fact_cols)
+    pd.testing.assert_frame_equal(q_rows, q_cols)
+
+    return {
+        "benchmark": "fact_inventory",
+        "rows": rows,
+        "rows_seconds": t_rows,
+        "columnar_seconds": t_cols,
+        "speedup": t_rows / t_cols if t_cols else float("inf"),
+    }
+
+
+def bench_dim_vendor(rows: int, seed: int = 0):
+    """groupby().apply vs sort + drop_duplicates build_dim_vendor."""
+    vendors = vendor_batch(0, rows, np.random.default_rng(seed))
+    (dim_rows, _), t_rows = _timed(build_dim_vendor, vendors, engine="rows")
+    (dim_cols, _), t_cols = _timed(build_dim_vendor, vendors, engine="columnar")
+
+    pd.testing.assert_frame_equal(dim_rows, dim_cols)
+
+    return {
+        "benchmark": "dim_vendor",
+        "rows": rows,
+        "vendors": len(dim_cols),
+        "rows_seconds": t_rows,
+        "columnar_seconds": t_cols,
+        "speedup": t_rows / t_cols if t_cols else float("inf"),
+    }
+
+
+def bench_csv_reader(rows: int, seed: int = 0):
+    """pandas python-engine reader vs multi-threaded pyarrow.csv reader."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "products.csv"
+        write_products(path, rows, max(rows // 100, 10), RATES, seed)
+        (legacy, _), t_python = _timed(read_products_csv, path, engine="python")
+        (products, unparseable), t_arrow = _timed(read_products_csv, path, engine="arrow")
+
+    pd.testing.assert_frame_equal(products, legacy, check_dtype=False)
+
+    return {
+        "benchmark": "csv_reader",
+        "rows": rows,
+        "unparseable_lines": len(unparseable),
+        "python_seconds": t_python,
+        "arrow_seconds": t_arrow,
+        "speedup": t_python / t_arrow if t_arrow else float("inf"),
+    }
+
+
+def bench_validation(rows: int, seed: int = 0):
+    """pandera vs compiled validation of raw inventory and the trusted tables."""
+    dim_product, _ = build_dim_product(raw_products(rows, seed), {})
+    inventory = raw_inventory(rows, rows, seed)
+    fact = inventory[inventory["on_hand"] >= 0].reset_index(drop=True)
+    frames = [
+        (validate_raw_inventory, inventory),
+        (validate_dim_product, dim_product),
+        (validate_fact_inventory, fact),
+    ]
+
+    def validate_all(mode):
+        configure_validation(mode)
+        return [validate(df) for validate, df in frames]
+
+    expected, t_pandera = _timed(validate_all, "pandera")
+    actual, t_compiled = _timed(validate_all, "compiled")
+    configure_validation()
+    for a, e in zip(actual, expected):
+        pd.testing.assert_frame_equal(a, e)
+
+    return {
+        "benchmark": "validation",
+        "rows": rows,
+        "pandera_seconds": t_pandera,
+        "compiled_seconds": t_compiled,
+        "speedup": t_pandera / t_compiled if t_compiled else float("inf"),
+    }
+
+
+def legacy_write_parquet(df: pd.DataFrame, out_path: Path, partition_cols):
+    """The previous partitioned writer: pyarrow defaults, unsorted, written in place."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pq.write_to_dataset(
+        pa.Table.from_pandas(df),
+        root_path=str(out_path),
+        partition_cols=partition_cols,
+        use_dictionary=True,
+    )
+
+
+def _dataset_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*.parquet")) / 2**20
+
+
+def _scan(path: Path, ids) -> float:
+    """Seconds to read the whole dataset, then to look up each of ids by product_id."""
+    import pyarrow.dataset as ds
+
+    _, t_full = _timed(pd.read_parquet, path)
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    start = time.perf_counter()
+    for product_id in ids:
+        dataset.to_table(filter=ds.field("product_id") == product_id)
+    return t_full, time.perf_counter() - start
+
+
+def bench_parquet_writer(rows: int, seed: int = 0):
+    """pyarrow-default write_to_dataset vs the tuned writer, on fact_inventory."""
+    n_products = max(rows // 10, 1)
+    dim_product, _ = build_dim_product(raw_products(n_products, seed), {})
+    fact, _ = build_fact_inventory(raw_inventory(rows, n_products, seed), dim_product)
+    ids = np.random.default_rng(seed).choice(fact["product_id"].to_numpy(), 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy, tuned = Path(tmp) / "legacy", Path(tmp) / "tuned"
+        _, t_legacy = _timed(legacy_write_parquet, fact, legacy, ["warehouse"])
+        _, t_tuned = _timed(
+            write_parquet, fact, tuned, ["warehouse"], SORT_KEYS["fact_inventory"], "overwrite"
+        )
+        scan_legacy, lookup_legacy = _scan(legacy, ids)
+        scan_tuned, lookup_tuned = _scan(tuned, ids)
+        by = list(fact.columns)
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(tuned, columns=by).sort_values(by).reset_index(drop=True),
+            pd.read_parquet(legacy, columns=by).sort_values(by).reset_index(drop=True),
+        )
+        mb_legacy, mb_tuned = _dataset_mb(legacy), _dataset_mb(tuned)
+
+    return {
+        "benchmark": "parquet_writer",
+        "rows": rows,
+        "legacy_seconds": t_legacy,
+        "tuned_seconds": t_tuned,
+        "legacy_scan_seconds": scan_legacy,
+        "tuned_scan_seconds": scan_tuned,
+        "legacy_lookup_ms": lookup_legacy * 1000 / len(ids),
+        "tuned_lookup_ms": lookup_tuned * 1000 / len(ids),
+        "legacy_size_mb": mb_legacy,
+        "tuned_size_mb": mb_tuned,
+        "speedup": t_legacy / t_tuned if t_tuned else float("inf"),
+    }
+
+
+def scan_stock(base: Path, sku: str, warehouse: str) -> pd.DataFrame:
+    """Stock of a SKU in a warehouse the way services did it: read everything, then filter."""
+    products = pd.read_parquet(base / "dim_product")
+    inventory = pd.read_parquet(base / "fact_inventory")
+    ids = products.loc[products["sku"] == sku, "product_id"]
+    return inventory[inventory["product_id"].isin(ids) & (inventory["warehouse"] == warehouse)]
+
+
+def bench_lookup(rows: int, seed: int = 0):
+    """Full scan + filter vs TrustedTables for "stock of SKU X in WH-A"."""
+    n_products = max(rows // 10, 1)
+    dim_product, _ = build_dim_product(raw_products(n_products, seed), {})
+    fact, _ = build_fact_inventory(raw_inventory(rows, n_products, seed), dim_product)
+    skus = dim_product.set_index("product_id").loc[fact["product_id"], "sku"].to_numpy()
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(fact), 1000)
+    queries = list(zip(skus[picks], fact["warehouse"].to_numpy()[picks]))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        write_parquet(dim_product, base / "dim_product", ["vendor_code"], ["product_id"])
+        write_parquet(fact, base / "fact_inventory", ["warehouse"], SORT_KEYS["fact_inventory"])
+
+        start = time.perf_counter()
+        expected = [len(scan_stock(base, sku, w)) for sku, w in queries[:5]]
+        t_scan = (time.perf_counter() - start) / 5
+
+        tables = TrustedTables(base)
+        _, t_build = _timed(lambda: [tables.stock(sku=sku, warehouse=w) for sku, w in queries[:1]])
+        start = time.perf_counter()
+        found = [len(tables.stock(sku=sku, warehouse=w)) for sku, w in queries]
+        t_lookup = (time.perf_counter() - start) / len(queries)
+    assert found[:5] == expected
+
+    return {
+        "benchmark": "lookup",
+        "rows": rows,
+        "scan_ms": t_scan * 1000,
+        "first_lookup_seconds": t_build,
+        "lookup_ms": t_lookup * 1000,
+        "speedup": t_scan / t_lookup if t_lookup else float("inf"),
+    }
+
+
+# name -> (benchmark, default rows)
+BENCHMARKS = {
+    "dim_product": (bench_dim_product, 200_000),
+    "fact_inventory": (bench_fact_inventory, 200_000),
+    "dim_vendor": (bench_dim_vendor, 100_000),
+    "csv_reader": (bench_csv_reader, 5_000_000),
+    "validation": (bench_validation, 1_000_000),
+    "parquet_writer": (bench_parquet_writer, 2_000_000),
+    "lookup": (bench_lookup, 2_000_000),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ETL transforms")
+    parser.add_argument("--rows", type=int, help="Synthetic input rows (default: per benchmark)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the generator")
+    parser.add_argument(
+        "--only", choices=sorted(BENCHMARKS), action="append", help="Run only these benchmarks"
+    )
+    args = parser.parse_args()
+
+    for name in args.only or BENCHMARKS:
+        bench, default_rows = BENCHMARKS[name]
+        result = bench(args.rows or default_rows, args.seed)
+        print(f"\n{name} ({result['rows']:,} rows)")
+        for key, value in result.items():
+            if key.endswith("_seconds"):
+                print(f"  {key[:-8]:<12} {value:8.3f}s  {result['rows'] / value:>12,.0f} rows/s")
+            elif key.endswith("_ms"):
+                print(f"  {key[:-3]:<12} {value:8.3f}ms")
+            elif key.endswith("_mb"):
+                print(f"  {key[:-3]:<12} {value:8.1f}MB")
+        print(f"  speedup      {result['speedup']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Retrieval benchmarks for the RAG index.
+Generates a synthetic Zipf-distributed corpus, compares the BM25 inverted
+index against the original linear substring scan, and measures recall vs
+latency of the ANN vector indexes against exact IndexFlatIP search.
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from src.rag.embed import HashingEmbedder, build_ann_index, set_search_params
+from src.rag.lexical import BM25Index, tokenize
+
+
+def make_corpus(n_chunks: int, vocab: int = 50_000, seed: int = 0):
+    """Chunks of 20-60 words drawn from a Zipf-like vocabulary, like spec sheets."""
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(vocab)], dtype=object)
+    lengths = rng.integers(20, 61, n_chunks)
+    ranks = (rng.zipf(1.2, lengths.sum()) - 1) % vocab
+    tokens = words[ranks]
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    return [" ".join(tokens[bounds[i] : bounds[i + 1]]) for i in range(n_chunks)]
+
+
+def make_queries(n: int, vocab: int = 50_000, seed: int = 0):
+    """Three-word queries mixing frequent, mid-frequency and rare terms."""
+    rng = np.random.default_rng(seed + 1)
+    return [
+        f"w{rng.integers(0, 50)} w{rng.integers(50, 2_000)} w{rng.integers(2_000, vocab)}"
+        for _ in range(n)
+    ]
+
+
+def linear_scan(chunks, query: str, k: int = 5):
+    """The previous RAGIndex.search: substring test of every query word in every chunk."""
+    query_lower = query.lower()
+    scores = []
+    for i, chunk in enumerate(chunks):
+        chunk_lower = chunk.lower()
+        words = query_lower.split()
+        score = sum(1 for word in words if word in chunk_lower) / len(words)
+        scores.append((score, i))
+    scores.sort(reverse=True)
+    return scores[:k]
+
+
+def _postings(index: BM25Index, query: str) -> int:
+    ids = {i for i in map(index.terms.find, tokenize(query)) if i >= 0}
+    return int(sum(index.indptr[t + 1] - index.indptr[t] for t in ids))
+
+
+def bench_lexical(n_chunks: int, queries: int = 200, scan_queries: int = 3, seed: int = 0):
+    chunks = make_corpus(n_chunks, seed=seed)
+    start = time.perf_counter()
+    index = BM25Index.build(chunks)
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    postings = []
+    for query in make_queries(queries, seed=seed):
+        start = time.perf_counter()
+        index.top_k(query, 5)
+        latencies.append(time.perf_counter() - start)
+        postings.append(_postings(index, query))
+
+    scan = []
+    for query in make_queries(scan_queries, seed=seed):
+        start = time.perf_counter()
+        linear_scan(chunks, query)
+        scan.append(time.perf_counter() - start)
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "chunks": n_chunks,
+        "terms": len(index.terms),
+        "build_seconds": build_seconds,
+        "bm25_p50_ms": float(np.percentile(latencies, 50)),
+        "bm25_p95_ms": float(np.percentile(latencies, 95)),
+        "postings_p50": float(np.median(postings)),
+        "scan_ms": float(np.mean(scan)) * 1000,
+    }
+
+
+def _per_query(index, queries: np.ndarray, k: int):
+    """Search one query at a time, like the API does; returns (ids, mean ms per query)."""
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i in range(len(queries)):
+        _, ids[i] = index.search(queries[i : i + 1], k)
+    return ids, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def _recall(found: np.ndarray, exact_scores: np.ndarray, queries, vectors) -> float:
+    # hashed vectors of short texts tie often, so a hit counts when it scores
+    # at least as high as the exact k-th neighbour, whatever its id
+    found_scores = np.einsum("qd,qkd->qk", queries, vectors[np.maximum(found, 0)])
+    ok = (found >= 0) & (found_scores >= exact_scores[:, -1:] - 1e-6)
+    return float(ok.mean())
+
+
+def bench_vector(n_chunks: int, queries: int = 200, k: int = 10, seed: int = 0):
+    chunks = make_corpus(n_chunks, seed=seed)
+    start = time.perf_counter()
+    embedder = HashingEmbedder().fit(chunks)
+    vectors = embedder.embed(chunks)
+    embed_seconds = time.perf_counter() - start
+    q = embedder.embed(make_queries(queries, seed=seed))
+
+    exact_index = build_ann_index(vectors, "flat")
+    exact_scores, _ = exact_index.search(q, k)
+    _, exact_ms = _per_query(exact_index, q, k)
+    rows = [("flat (exact)", "", 1.0, exact_ms)]
+
+    start = time.perf_counter()
+    hnsw = build_ann_index(vectors, "hnsw")
+    hnsw_seconds = time.perf_counter() - start
+    for ef in (16, 32, 64, 128, 256):
+        set_search_params(hnsw, ef_search=ef)
+        found, ms = _per_query(hnsw, q, k)
+        rows.append(("hnsw", f"efSearch={ef}", _recall(found, exact_scores, q, vectors), ms))
+
+    start = time.perf_counter()
+    ivf = build_ann_index(vectors, "ivf")
+    ivf_seconds = time.perf_counter() - start
+    for nprobe in (1, 8, 32, 128):
+        set_search_params(ivf, nprobe=nprobe)
+        found, ms = _per_query(ivf, q, k)
+        rows.append(("ivf", f"nprobe={nprobe}", _recall(found, exact_scores, q, vectors), ms))
+
+    return {
+        "chunks": n_chunks,
+        "dim": embedder.dim,
+        "embed_seconds": embed_seconds,
+        "hnsw_build_seconds": hnsw_seconds,
+        "ivf_build_seconds": ivf_seconds,
+        "ivf_nlist": faiss.extract_index_ivf(ivf).nlist,
+        "rows": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG retrieval")
+    parser.add_argument(
+        "--chunks",
+        type=int,
+        nargs="+",
+        default=[100_000, 1_000_000],
+        help="Corpus sizes for the lexical benchmark",
+    )
+    parser.add_argument(
+        "--vector-chunks", type=int, default=100_000, help="Corpus size for the vector benchmark"
+    )
+    parser.add_argument("--queries", type=int, default=200, help="Queries per corpus")
+    parser.add_argument("--scan-queries", type=int, default=3, help="Linear-scan queries")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the generator")
+    parser.add_argument(
+        "--only", choices=["lexical", "vector"], action="append", help="Run only these benchmarks"
+    )
+    args = parser.parse_args()
+    only = args.only or ["lexical", "vector"]
+
+    if "lexical" in only:
+        for n in args.chunks:
+            r = bench_lexical(n, args.queries, args.scan_queries, args.seed)
+            print(
+                f"\n{r['chunks']:,} chunks, {r['terms']:,} terms "
+                f"(built in {r['build_seconds']:.1f}s)"
+            )
+            print(f"  bm25      p50 {r['bm25_p50_ms']:8.2f} ms  p95 {r['bm25_p95_ms']:8.2f} ms")
+            print(f"            {r['postings_p50']:,.0f} postings per query (median)")
+            print(f"  scan          {r['scan_ms']:8.2f} ms")
+            print(f"  speedup   {r['scan_ms'] / r['bm25_p50_ms']:8.1f}x")
+
+    if "vector" in only:
+        r = bench_vector(args.vector_chunks, args.queries, seed=args.seed)
+        print(
+            f"\nvector: {r['chunks']:,} chunks, {r['dim']}-d "
+            f"(embedded in {r['embed_seconds']:.1f}s, HNSW built in "
+            f"{r['hnsw_build_seconds']:.1f}s, IVF nlist={r['ivf_nlist']} in "
+            f"{r['ivf_build_seconds']:.1f}s)"
+        )
+        print(f"  {'index':<14}{'params':<14}{'recall@10':>10}{'ms/query':>10}")
+        for kind, params, recall, ms in r["rows"]:
+            print(f"  {kind:<14}{params:<14}{recall:>10.3f}{ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Chunking report for PDF documents.
+Chunks the same PDFs with the previous fixed 1200/200-character windows
+(chunk_text, stopped after the window reaching the end of each page; the
+original never stops there) and with the structure-aware chunker used by
+ingestion, and prints the chunk count, token size distribution and duplicated
+share of both.
+"""
+
+import argparse
+from typing import List
+
+import numpy as np
+
+from src.rag.chunking import MAX_TOKENS, OVERLAP_TOKENS, chunk_pages, count_tokens
+from src.rag.ingest import find_pdfs, read_pages
+
+
+def chunk_text(text: str, max_chars=1200, overlap=200) -> List[str]:
+    """The previous chunking (src/rag/ingest.py), verbatim but for the marked line."""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + max_chars)
+        chunks.append(text[start:end])
+        # added: the original steps back by overlap from the end of the text
+        # and repeats its last window forever
+        if end == len(text):
+            break
+        start = end - overlap
+        if start < 0:
+            start = 0
+        if start >= len(text):
+            break
+    return chunks
+
+
+def chunk_report(chunks, source_tokens: int) -> dict:
+    """Chunk count, token size distribution and share of indexed tokens that are repeats."""
+    sizes = np.array([count_tokens(c) for c in chunks] or [0])
+    total = int(sizes.sum())
+    return {
+        "chunks": len(chunks),
+        "tokens": total,
+        "mean": round(float(sizes.mean()), 1),
+        "p10": int(np.percentile(sizes, 10)),
+        "p50": int(np.percentile(sizes, 50)),
+        "p90": int(np.percentile(sizes, 90)),
+        "max": int(sizes.max()),
+        "duplicated": max(total - source_tokens, 0) / total if total else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fixed-window and structure-aware chunks")
+    parser.add_argument("--pdf", required=True, nargs="+", help="PDF files, directories or globs")
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS, help="Tokens per chunk")
+    parser.add_argument(
+        "--overlap-tokens", type=int, default=OVERLAP_TOKENS, help="Tokens repeated between chunks"
+    )
+    args = parser.parse_args()
+
+    before, after, source_tokens = [], [], 0
+    for path in find_pdfs(args.pdf):
+        pages = list(read_pages(path))
+        source_tokens += sum(count_tokens(text) for _, text in pages)
+        before.extend(chunk for _, text in pages for chunk in chunk_text(text))
+        after.extend(chunk for chunk, _ in chunk_pages(pages, args.max_tokens, args.overlap_tokens))
+
+    print(f"{'':24}{'chunks':>8}{'tokens':>9}{'mean':>7}{'p10':>6}{'p50':>6}{'p90':>6}{'max':>6}")
+    for name, chunks in (("fixed 1200/200 chars", before), ("structure-aware", after)):
+        r = chunk_report(chunks, source_tokens)
+        print(
+            f"{name:24}{r['chunks']:>8}{r['tokens']:>9}{r['mean']:>7}{r['p10']:>6}"
+            f"{r['p50']:>6}{r['p90']:>6}{r['max']:>6}   {r['duplicated']:.1%} duplicated"
+        )
+    print(
+        "fixed: the previous chunk_text with one change, it stops after the window that"
+        " reaches the end of a page (the original repeats that window forever)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,31 @@
 #!/usr/bin/env python3
 """
 Simple evaluation script for RAG system.
-Calls /ask endpoint and checks for expected keywords in responses.
+Sends all questions to the /ask_batch endpoint in one streamed request (or
+one /ask request each with --single) and checks for expected keywords in
+responses. With --load it replays the questions against /ask at a target
+concurrency or request rate instead, and reports throughput and latency
+percentiles.
 """
 
+from collections import Counter, defaultdict
+import argparse
+import asyncio
+import itertools
 import json
+import math
+import sys
+import time
+
+import httpx
 import requests
-import argparse
 
 
 def load_questions(path: str):
-    """Load evaluation questions from JSON file."""
+    """Load evaluation questions from a JSON list, or a JSONL file of {"question": ...} lines."""
     with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
         return json.load(f)
 
 
@@ -25,6 +39,32 @@ def call_ask_api(question: str, base_url: str = "http://localhost:8000"):
         return {"error": str(e)}
 
 
+def call_ask_batch_api(questions: list, base_url: str = "http://localhost:8000"):
+    """Call /ask_batch once; yields each NDJSON line as it arrives."""
+    try:
+        with requests.post(
+            f"{base_url}/ask_batch", json={"questions": questions}, stream=True, timeout=60
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+    except Exception as e:
+        yield {"error": str(e)}
+
+
+def collect_batch_answers(questions: list, base_url: str) -> list:
+    """One response per question, in question order; errors for any never answered."""
+    responses = {}
+    for response in call_ask_batch_api(questions, base_url):
+        if "index" not in response:
+            # the request or the stream failed: the remaining answers are lost
+            return [responses.get(i, response) for i in range(len(questions))]
+        responses[response["index"]] = response
+    missing = {"error": "no answer in /ask_batch stream"}
+    return [responses.get(i, missing) for i in range(len(questions))]
+
+
 def check_keywords(text: str, keywords: list) -> dict:
     """Check if expected keywords appear in text (case-insensitive)."""
     text_lower = text.lower()
@@ -46,14 +86,16 @@ def check_keywords(text: str, keywords: list) -> dict:
 
 def evaluate_single_question(item: dict, base_url: str):
     """Evaluate a single question."""
+    return evaluate_answer(item, call_ask_api(item["question"], base_url))
+
+
+def evaluate_answer(item: dict, response: dict):
+    """Check one API response against the question's expected keywords."""
     question = item["question"]
     expected_keywords = item.get("expected_keywords", [])
 
     print(f"\nQ: {question}")
 
-    # Call API
-    response = call_ask_api(question, base_url)
-
     if "error" in response:
         print(f"❌ API Error: {response['error']}")
         return {"question": question, "success": False, "error": response["error"]}
@@ -83,25 +125,245 @@ def evaluate_single_question(item: dict, base_url: str):
     }
 
 
+async def _timed_ask(client, question: str, started: float, samples: list):
+    """POST /ask; latency counts from started, the time the request was due."""
+    try:
+        response = await client.post("/ask", json={"question": question})
+        error = None if response.status_code == 200 else f"HTTP {response.status_code}"
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+    latency_ms = (time.perf_counter() - started) * 1000
+    samples.append({"question": question, "latency_ms": latency_ms, "error": error})
+
+
+async def run_load(
+    items: list,
+    base_url: str,
+    concurrency: int = 8,
+    rate: float = None,
+    duration: float = None,
+    total: int = None,
+    timeout: float = 10.0,
+):
+    """
+    Replay questions against /ask concurrently over one pooled HTTP client.
+
+    Features:
+        - Closed loop (default): concurrency clients, each sending its next
+          question as soon as the previous answer arrives
+        - Open loop (rate): requests start on a fixed schedule of rate per
+          second however slowly answers come back, with at most concurrency
+          connections; latency counts from the scheduled start, so time spent
+          queued behind a slow server is not hidden
+        - Questions are replayed in order, cycling until total requests were
+          sent or duration seconds passed (one pass when neither is given)
+
+    Returns:
+        (samples, seconds): {"question", "latency_ms", "error"} per request,
+        and the wall time of the run
+    """
+    if total is None and duration is None:
+        total = len(items)
+    questions = itertools.cycle(item["question"] for item in items)
+    samples, sent = [], 0
+    started = time.perf_counter()
+    deadline = started + duration if duration else math.inf
+
+    def next_question():
+        nonlocal sent
+        if (total is not None and sent >= total) or time.perf_counter() >= deadline:
+            return None
+        sent += 1
+        return next(questions)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    # no pool timeout: waiting for a free connection is part of the latency
+    client_timeout = httpx.Timeout(timeout, pool=None)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=client_timeout
+    ) as client:
+        if rate:
+            tasks = []
+            for n in itertools.count():
+                due = started + n / rate
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                question = next_question()
+                if question is None:
+                    break
+                tasks.append(asyncio.create_task(_timed_ask(client, question, due, samples)))
+            await asyncio.gather(*tasks)
+        else:
+
+            async def worker():
+                while (question := next_question()) is not None:
+                    await _timed_ask(client, question, time.perf_counter(), samples)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an ascending list; 0.0 when empty."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+def _latency_stats(latencies: list) -> dict:
+    ms = sorted(latencies)
+    return {
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "max_ms": ms[-1] if ms else 0.0,
+        "mean_ms": sum(ms) / len(ms) if ms else 0.0,
+    }
+
+
+def summarize_load(samples: list, seconds: float) -> dict:
+    """Throughput, error rate and latency percentiles overall and per question."""
+    ok = [s["latency_ms"] for s in samples if not s["error"]]
+    by_question = defaultdict(list)
+    for s in samples:
+        by_question[s["question"]].append(s)
+    per_question = [
+        {
+            "question": question,
+            "requests": len(runs),
+            "errors": sum(1 for s in runs if s["error"]),
+            **_latency_stats([s["latency_ms"] for s in runs if not s["error"]]),
+        }
+        for question, runs in by_question.items()
+    ]
+    per_question.sort(key=lambda q: q["p95_ms"], reverse=True)
+    errors = len(samples) - len(ok)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "error_kinds": dict(Counter(s["error"] for s in samples if s["error"])),
+        "seconds": seconds,
+        "throughput_rps": len(ok) / seconds if seconds else 0.0,
+        "latency": _latency_stats(ok),
+        "per_question": per_question,
+    }
+
+
+def print_load_report(summary: dict, top: int = 10):
+    latency = summary["latency"]
+    print(f"\n{'='*50}")
+    print("LOAD TEST SUMMARY")
+    print(f"{'='*50}")
+    print(f"Requests: {summary['requests']} in {summary['seconds']:.1f}s")
+    print(f"Throughput: {summary['throughput_rps']:.1f} req/s")
+    kinds = ", ".join(f"{kind}: {n}" for kind, n in summary["error_kinds"].items())
+    print(f"Error rate: {summary['error_rate']:.2%}" + (f" ({kinds})" if kinds else ""))
+    print(
+        f"Latency ms: p50 {latency['p50_ms']:.1f}  p95 {latency['p95_ms']:.1f}  "
+        f"p99 {latency['p99_ms']:.1f}  max {latency['max_ms']:.1f}  mean {latency['mean_ms']:.1f}"
+    )
+    print(f"\nSlowest questions by p95 (of {len(summary['per_question'])}):")
+    for q in summary["per_question"][:top]:
+        print(
+            f"  {q['p50_ms']:8.1f} {q['p95_ms']:8.1f} {q['max_ms']:8.1f} ms"
+            f"  {q['requests']:>5} req {q['errors']:>3} err  {q['question'][:60]}"
+        )
+
+
+def check_budgets(summary: dict, max_p99_ms: float = None, max_error_rate: float = None) -> list:
+    """Messages for every latency or error budget the run exceeded."""
+    failures = []
+    p99 = summary["latency"]["p99_ms"]
+    if max_p99_ms is not None and p99 > max_p99_ms:
+        failures.append(f"p99 latency {p99:.1f} ms exceeds the budget of {max_p99_ms:g} ms")
+    if max_error_rate is not None and summary["error_rate"] > max_error_rate:
+        failures.append(
+            f"error rate {summary['error_rate']:.2%} exceeds the budget of {max_error_rate:.2%}"
+        )
+    return failures
+
+
+def load_test(args, questions: list):
+    loop = "open" if args.rate else "closed"
+    target = f"{args.rate:g} req/s" if args.rate else f"{args.concurrency} concurrent clients"
+    print(f"🚀 Load test ({loop} loop): {target} against {args.base_url}/ask")
+    if args.warmup:
+        asyncio.run(run_load(questions, args.base_url, args.concurrency, total=args.warmup))
+    samples, seconds = asyncio.run(
+        run_load(
+            questions,
+            args.base_url,
+            args.concurrency,
+            rate=args.rate,
+            duration=args.duration,
+            total=args.requests,
+            timeout=args.timeout,
+        )
+    )
+    summary = summarize_load(samples, seconds)
+    print_load_report(summary, args.top)
+
+    if args.output:
+        config = {
+            "base_url": args.base_url,
+            "questions": args.questions,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "duration": args.duration,
+            "requests": args.requests,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "summary": summary}, f, indent=2, ensure_ascii=False)
+        print(f"\nResults saved to {args.output}")
+
+    failures = check_budgets(summary, args.max_p99_ms, args.max_error_rate)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Evaluate RAG system")
     parser.add_argument("--questions", default="eval/questions.json", help="Questions JSON file")
     parser.add_argument("--base-url", default="http://localhost:8000", help="API base URL")
     parser.add_argument("--output", help="Save results to JSON file")
+    parser.add_argument(
+        "--single", action="store_true", help="One /ask request per question instead of /ask_batch"
+    )
+    load = parser.add_argument_group("load test")
+    load.add_argument("--load", action="store_true", help="Load-test /ask instead of scoring")
+    load.add_argument("--concurrency", type=int, default=8, help="Clients / max connections")
+    load.add_argument("--rate", type=float, help="Target requests per second (open loop)")
+    load.add_argument("--duration", type=float, help="Seconds to run, cycling the questions")
+    load.add_argument("--requests", type=int, help="Requests to send, cycling the questions")
+    load.add_argument("--warmup", type=int, default=0, help="Requests sent first and discarded")
+    load.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout (s)")
+    load.add_argument("--top", type=int, default=10, help="Slowest questions to list")
+    load.add_argument("--max-p99-ms", type=float, help="Exit with status 1 above this p99")
+    load.add_argument("--max-error-rate", type=float, help="Exit with status 1 above this rate")
 
     args = parser.parse_args()
 
     # Load questions
     questions = load_questions(args.questions)
     print(f"Loaded {len(questions)} questions from {args.questions}")
+    if args.load:
+        load_test(args, questions)
+        return
 
     # Evaluate each question
     results = []
     total_score = 0
     successful_questions = 0
 
-    for item in questions:
-        result = evaluate_single_question(item, args.base_url)
+    if args.single:
+        evaluated = (evaluate_single_question(item, args.base_url) for item in questions)
+    else:
+        answers = collect_batch_answers([item["question"] for item in questions], args.base_url)
+        evaluated = (evaluate_answer(item, answer) for item, answer in zip(questions, answers))
+
+    for result in evaluated:
         results.append(result)
 
         if result.get("success"):
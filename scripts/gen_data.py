@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Seeded synthetic data generator for the ETL and RAG pipelines.
+Writes raw/products.csv, raw/vendors.jsonl and raw/inventory.parquet in the
+raw-feed formats with controlled rates of dirty data, plus a corpus of spec
+sheets (specs/*.txt, pages separated by form feeds) and queries.jsonl with
+the document each query is answered by. Rows are written in batches, so
+memory stays flat from 10k to 50M rows. --sample-inventory instead writes the
+hand-written inventory that goes with the sample raw/products.csv.
+"""
+
+import argparse
+import json
+import textwrap
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BATCH_ROWS = 1_000_000
+PAGE_BREAK = "\f"
+CATEGORIES = np.array(["Router", "Switch", "Camera", "Access Point", "Firewall"], dtype=object)
+WAREHOUSES = np.array(["WH-A", "WH-B", "WH-C", "WH-D"], dtype=object)
+COUNTRIES = np.array(["DE", "CN", "US", "BR", "JP"], dtype=object)
+WORDS = (
+    "router switch port module firmware power thermal fan chassis interface latency "
+    "throughput antenna memory storage vlan bandwidth voltage current certification "
+    "enclosure airflow cable buffer queue packet frame optical copper transceiver console "
+    "management redundancy"
+).split()
+# inventory of the sample raw/products.csv and raw/vendors.jsonl: one negative
+# on_hand, one unknown product_id, and rows for products the ETL rejects
+SAMPLE_INVENTORY = [
+    (1001, "WH-A", 10, 5, "2024-11-01T10:00:00"),
+    (1002, "WH-A", -2, 5, "2024-11-01T10:00:00"),
+    (1003, "WH-B", 50, 10, "2024-11-02T12:00:00"),
+    (1004, "WH-C", 3, 5, "2024-11-03T09:00:00"),
+    (9999, "WH-A", 7, 5, "2024-11-04T08:00:00"),
+    (1234, "WH-Z", 1, 2, "2024-11-04T08:00:00"),
+]
+# (question template, fact sentence template) pairs about one model
+FACTS = [
+    ("How much power does the {m} draw?", "The {m} draws at most {v} W under full load."),
+    ("How many ports does the {m} have?", "The {m} provides {v} Gigabit Ethernet ports."),
+    ("What does the {m} weigh?", "The {m} weighs {v} grams without its power adapter."),
+    ("How long does a firmware update of the {m} take?", "Updating the {m} takes {v} minutes."),
+]
+
+
+class Rates:
+    """Share of rows carrying each kind of defect."""
+
+    def __init__(self, args):
+        self.decimal_comma = args.decimal_comma_rate
+        self.bad_dimensions = args.bad_dimensions_rate
+        self.negative = args.negative_rate
+        self.orphan = args.orphan_rate
+        self.missing_id = args.missing_id_rate
+
+
+def _batches(n: int):
+    for start in range(0, n, BATCH_ROWS):
+        yield start, min(BATCH_ROWS, n - start)
+
+
+def product_batch(start: int, size: int, n_vendors: int, rates: Rates, rng) -> pd.DataFrame:
+    """Products start+1 .. start+size in the raw products.csv schema."""
+    ids = np.arange(start + 1, start + size + 1)
+    dims = np.char.add(
+        np.char.add(rng.integers(50, 500, size).astype(str), "x"),
+        np.char.add(np.char.add(rng.integers(50, 400, size).astype(str), "x"), "45"),
+    ).astype(object)
+    bad = rng.random(size) < rates.bad_dimensions
+    dims[bad] = rng.choice(np.array(["90x60x", "x120x45", "220 by 120"], dtype=object), bad.sum())
+
+    vendor = rng.integers(0, n_vendors, size)
+    orphan = rng.random(size) < rates.orphan
+    vendor[orphan] += n_vendors  # codes no vendor record has
+    product_id = ids.astype(object)
+    product_id[rng.random(size) < rates.missing_id] = ""
+
+    return pd.DataFrame(
+        {
+            "product_id": product_id,
+            "sku": np.char.add("SKU-", np.char.zfill(ids.astype(str), 9)),
+            "model": np.char.add("AX-", ids.astype(str)),
+            "category": rng.choice(CATEGORIES, size),
+            "weight_grams": rng.integers(50, 5_000, size),
+            "dimensions_mm": dims,
+            "vendor_code": np.char.add("V-", np.char.zfill(vendor.astype(str), 6)),
+            "launch_date": (
+                pd.Timestamp("2018-01-01") + pd.to_timedelta(rng.integers(0, 2_500, size), "D")
+            ).strftime("%Y-%m-%d"),
+            "msrp_usd": rng.integers(1_000, 500_000, size) / 100,
+        }
+    )
+
+
+def write_products(path: Path, n: int, n_vendors: int, rates: Rates, seed: int):
+    rng = np.random.default_rng(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            "product_id,sku,model,category,weight_grams,dimensions_mm,"
+            "vendor_code,launch_date,msrp_usd\n"
+        )
+        for start, size in _batches(n):
+            lines = product_batch(start, size, n_vendors, rates, rng).to_csv(
+                index=False, header=False
+            )
+            lines = lines.splitlines()
+            # European feeds write prices as "159,90", quoted so the line
+            # parses and the transform converts the decimal comma
+            for i in np.flatnonzero(rng.random(size) < rates.decimal_comma).tolist():
+                head, price = lines[i].rsplit(",", 1)
+                lines[i] = f'{head},"{price.replace(".", ",")}"'
+            f.write("\n".join(lines) + "\n")
+
+
+def vendor_batch(start: int, size: int, rng) -> pd.DataFrame:
+    """Vendor codes start .. start+size-1, about one in five listed twice under a longer name."""
+    suffix = np.array([" GmbH", " Ltd", " Inc.", " Holdings"], dtype=object)
+    codes = np.arange(start, start + size)
+    twice = codes[rng.random(size) < 0.2]
+    codes = np.concatenate([codes, twice])
+    names = np.char.add("Vendor ", codes.astype(str)).astype(object)
+    names[size:] += rng.choice(suffix, len(twice))
+    return pd.DataFrame(
+        {
+            "vendor_code": np.char.add("V-", np.char.zfill(codes.astype(str), 6)),
+            "name": names,
+            "country": rng.choice(COUNTRIES, len(codes)),
+            "support_email": np.char.add(np.char.add("support@vendor", codes.astype(str)), ".com"),
+        }
+    )
+
+
+def write_vendors(path: Path, n: int, seed: int):
+    rng = np.random.default_rng(seed + 1)
+    with open(path, "w", encoding="utf-8") as f:
+        for start, size in _batches(n):
+            frame = vendor_batch(start, size, rng)
+            f.write(frame.to_json(orient="records", lines=True, force_ascii=False))
+
+
+def inventory_batch(size: int, n_products: int, rates: Rates, rng) -> pa.Table:
+    """size inventory rows over product_ids 1 .. n_products in the raw inventory.parquet schema."""
+    product_id = rng.integers(1, n_products + 1, size)
+    orphan = rng.random(size) < rates.orphan
+    product_id[orphan] += n_products
+    on_hand = rng.integers(0, 500, size)
+    on_hand[rng.random(size) < rates.negative] *= -1
+    return pa.table(
+        {
+            "product_id": product_id.astype("int64"),
+            "warehouse": rng.choice(WAREHOUSES, size),
+            "on_hand": on_hand.astype("int64"),
+            "min_stock": rng.integers(0, 50, size).astype("int64"),
+            "last_counted_at": pd.Timestamp("2024-11-01")
+            + pd.to_timedelta(rng.integers(0, 86_400 * 30, size), unit="s"),
+        }
+    )
+
+
+def write_inventory(path: Path, n: int, n_products: int, rates: Rates, seed: int):
+    rng = np.random.default_rng(seed + 2)
+    writer = None
+    for _, size in _batches(n):
+        table = inventory_batch(size, n_products, rates, rng)
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema)
+        writer.write_table(table)
+    if writer is not None:
+        writer.close()
+
+
+def write_sample_inventory(path: Path):
+    columns = ["product_id", "warehouse", "on_hand", "min_stock", "last_counted_at"]
+    df = pd.DataFrame(SAMPLE_INVENTORY, columns=columns)
+    df["last_counted_at"] = pd.to_datetime(df["last_counted_at"])
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(path, index=False)
+
+
+def _sentence(rng) -> str:
+    return " ".join(rng.choice(WORDS, rng.integers(8, 24))).capitalize() + "."
+
+
+def spec_document(doc: int, n_pages: int, n_products: int, rng):
+    """(text, queries) of one datasheet: sections, wrapped paragraphs, bullets and tables."""
+    pages, queries = [], []
+    for page in range(n_pages):
+        lines = [f"AX Series Datasheet {doc}"] if page == 0 else []
+        for section in range(1, int(rng.integers(2, 5))):
+            lines.append(f"{page + 1}.{section} {rng.choice(WORDS).title()} Specifications")
+            model = f"AX-{int(rng.integers(1, n_products + 1))}"
+            question, fact = FACTS[int(rng.integers(len(FACTS)))]
+            body = [_sentence(rng) for _ in range(int(rng.integers(2, 6)))]
+            body.insert(
+                int(rng.integers(len(body) + 1)), fact.format(m=model, v=rng.integers(2, 90))
+            )
+            queries.append({"question": question.format(m=model)})
+            lines += textwrap.wrap(" ".join(body), 80)
+            if rng.random() < 0.4:
+                for word in rng.choice(WORDS, int(rng.integers(2, 6))):
+                    lines.append(f"- {word.title()} rating: {rng.integers(1, 999)} units")
+            if rng.random() < 0.3:
+                lines.append("Model    Ports    Power    Weight")
+                for _ in range(int(rng.integers(3, 10))):
+                    row = rng.integers([1, 4, 10, 1], [n_products + 1, 49, 91, 10])
+                    lines.append(f"AX-{row[0]}    {row[1]}    {row[2]} W    {row[3]} kg")
+        pages.append("\n".join(lines))
+    return PAGE_BREAK.join(pages), queries
+
+
+def write_specs(out: Path, n_docs: int, n_pages: int, n_products: int, seed: int):
+    rng = np.random.default_rng(seed + 3)
+    out.mkdir(parents=True, exist_ok=True)
+    with open(out / "queries.jsonl", "w", encoding="utf-8") as f:
+        for doc in range(n_docs):
+            text, queries = spec_document(doc, n_pages, n_products, rng)
+            name = f"doc{doc:06d}.txt"
+            (out / name).write_text(text, encoding="utf-8")
+            for q in queries:
+                f.write(json.dumps({**q, "source": name}) + "\n")
+
+
+def read_spec_pages(path: Path):
+    """(page number, text) pairs of a generated spec sheet, the input of chunk_pages."""
+    pages = Path(path).read_text(encoding="utf-8").split(PAGE_BREAK)
+    return list(enumerate(pages, start=1))
+
+
+def generate(out_dir: str, rows: int, args) -> dict:
+    """Write every dataset under out_dir; returns row counts and seconds per dataset."""
+    out = Path(out_dir)
+    raw = out / "raw"
+    raw.mkdir(parents=True, exist_ok=True)
+    rates = Rates(args)
+    n_vendors = args.vendors or max(rows // 100, 10)
+    n_inventory = args.inventory or 2 * rows
+    report = {}
+
+    def timed(name, rows, fn, *fn_args):
+        start = time.perf_counter()
+        fn(*fn_args)
+        report[name] = {"rows": rows, "seconds": time.perf_counter() - start}
+
+    timed("products", rows, write_products, raw / "products.csv", rows, n_vendors, rates, args.seed)
+    timed("vendors", n_vendors, write_vendors, raw / "vendors.jsonl", n_vendors, args.seed)
+    timed(
+        "inventory",
+        n_inventory,
+        write_inventory,
+        raw / "inventory.parquet",
+        n_inventory,
+        rows,
+        rates,
+        args.seed,
+    )
+    timed("specs", args.docs, write_specs, out / "specs", args.docs, args.pages, rows, args.seed)
+    return report
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--rows", type=int, default=100_000, help="Products (sets the scale)")
+    parser.add_argument("--vendors", type=int, help="Vendor codes (default: rows / 100)")
+    parser.add_argument("--inventory", type=int, help="Inventory rows (default: 2 x rows)")
+    parser.add_argument("--docs", type=int, default=200, help="Spec sheets")
+    parser.add_argument("--pages", type=int, default=4, help="Pages per spec sheet")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the generator")
+    parser.add_argument(
+        "--decimal-comma-rate", type=float, default=0.01, help='Prices written as "159,90"'
+    )
+    parser.add_argument(
+        "--bad-dimensions-rate", type=float, default=0.02, help="Incomplete dimensions_mm"
+    )
+    parser.add_argument("--negative-rate", type=float, default=0.03, help="Negative on_hand")
+    parser.add_argument(
+        "--orphan-rate", type=float, default=0.02, help="Unknown vendor codes and product_ids"
+    )
+    parser.add_argument(
+        "--missing-id-rate", type=float, default=0.01, help="Empty product_id (derived from SKU)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic ETL and RAG inputs")
+    parser.add_argument("--out", default="data/synthetic", help="Output directory")
+    parser.add_argument(
+        "--sample-inventory",
+        metavar="PATH",
+        help="Only write the inventory of the sample raw/ files to PATH",
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.sample_inventory:
+        write_sample_inventory(args.sample_inventory)
+        print(f"✅ Sample inventory written to {args.sample_inventory}")
+        return
+
+    report = generate(args.out, args.rows, args)
+    for name, r in report.items():
+        print(f"✅ {name:<10} {r['rows']:>12,} rows  {r['seconds']:7.2f}s")
+    print(f"🎉 Synthetic data written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
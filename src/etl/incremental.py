@@ -0,0 +1,257 @@
+import json
+from pathlib import Path
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+from ..fingerprint import file_fingerprint
+from .quarantine import QuarantineStore, read_quarantine
+from .utils import SORT_KEYS, read_products_csv, read_vendors_jsonl, write_outputs, write_parquet
+from .writer import remove_published
+from .validators import validate_raw_products, validate_raw_vendors, validate_raw_inventory
+from .transform import (
+    build_dim_product,
+    build_dim_vendor,
+    build_fact_inventory,
+    inventory_keys,
+    product_keys,
+)
+
+INPUTS = ("products.csv", "vendors.jsonl", "inventory.parquet")
+STATE_DIR = "_state"
+# output table -> (partition column, columns kept per key, key); _state keeps the
+# key of every row it holds, so a run opens only the partitions its changed
+# keys map to
+LOCATIONS = {
+    "dim_product": ("vendor_code", ["product_id", "vendor_code"], product_keys),
+    "fact_inventory": ("warehouse", ["warehouse"], inventory_keys),
+}
+
+
+def _hash_rows(df: pd.DataFrame) -> pd.Series:
+    return pd.util.hash_pandas_object(df, index=False)
+
+
+def _load_manifest(base: Path):
+    path = base / STATE_DIR / "manifest.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def _save_state(base: Path, inputs: dict, products=None, inventory=None, locations=None):
+    state = base / STATE_DIR
+    state.mkdir(parents=True, exist_ok=True)
+    for name, df in (locations or {}).items():
+        df.to_parquet(state / f"{name}.parquet", index=False)
+    for name, df in (("products", products), ("inventory", inventory)):
+        if df is not None:
+            keys = product_keys(df) if name == "products" else inventory_keys(df)
+            pd.DataFrame(
+                {"key": keys.to_numpy(), "row_hash": _hash_rows(df).to_numpy()}
+            ).to_parquet(state / f"{name}.parquet", index=False)
+    (state / "manifest.json").write_text(json.dumps({"inputs": inputs}, indent=2))
+
+
+def _changed_keys(keys: pd.Series, hashes: pd.Series, state_path: Path) -> np.ndarray:
+    """Keys whose set of row hashes differs from the previous run (new, edited or deleted)."""
+    old = pd.read_parquet(state_path)
+    new = pd.DataFrame({"key": keys.to_numpy(), "row_hash": hashes.to_numpy()})
+    new_pairs = _hash_rows(new)
+    old_pairs = _hash_rows(old)
+    changed_new = new.loc[~new_pairs.isin(old_pairs).to_numpy(), "key"]
+    changed_old = old.loc[~old_pairs.isin(new_pairs).to_numpy(), "key"]
+    return np.union1d(changed_new.to_numpy(), changed_old.to_numpy())
+
+
+def _locations(name: str, rows: pd.DataFrame) -> pd.DataFrame:
+    """key plus the LOCATIONS columns of each row of an output table."""
+    column, columns, key_fn = LOCATIONS[name]
+    if rows.empty:
+        return pd.DataFrame({"key": np.array([], dtype="uint64"), **{c: [] for c in columns}})
+    located = (
+        rows[columns].reset_index(drop=True).assign(**{column: rows[column].astype(str).to_numpy()})
+    )
+    return located.assign(key=key_fn(rows).to_numpy())[["key", *columns]]
+
+
+def _load_locations(base: Path, name: str) -> pd.DataFrame:
+    path = base / STATE_DIR / f"{name}.parquet"
+    if path.exists():
+        return pd.read_parquet(path)
+    # state of a run that did not keep locations: derive them from the table once
+    rows, _ = _read_partitions(base / name, LOCATIONS[name][0], None)
+    return _locations(name, rows)
+
+
+def _update_locations(located: pd.DataFrame, name: str, stale, new_rows: pd.DataFrame):
+    kept = located[~located["key"].isin(stale).to_numpy()]
+    return pd.concat([kept, _locations(name, new_rows)], ignore_index=True)
+
+
+def _read_partitions(root: Path, column: str, values, columns=None):
+    """Rows of the given hive partitions plus the files that hold them."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if not root.exists():
+        return pd.DataFrame(columns=columns), []
+    partitioning = ds.partitioning(pa.schema([(column, pa.string())]), flavor="hive")
+    dataset = ds.dataset(root, format="parquet", partitioning=partitioning)
+    expr = ds.field(column).isin(list(values)) if values is not None else None
+    files = [fragment.path for fragment in dataset.get_fragments(filter=expr)]
+    df = dataset.to_table(filter=expr, columns=columns).to_pandas()
+    if column in df.columns:
+        df[column] = df[column].astype(str)
+    return df, files
+
+
+def _rewrite_partitions(root: Path, column: str, values, stale, new_rows: pd.DataFrame, key_fn):
+    """Replace the given partitions with their surviving rows plus new_rows."""
+    values = sorted(set(values))
+    if not values:
+        return 0
+    existing, files = _read_partitions(root, column, values)
+    if not existing.empty:
+        existing = existing[~key_fn(existing).isin(stale).to_numpy()]
+    new_rows = (
+        new_rows[new_rows[column].astype(str).isin(values)] if not new_rows.empty else new_rows
+    )
+    merged = pd.concat([existing, new_rows], ignore_index=True)
+    if not merged.empty:
+        # each partition still holding rows is swapped whole for its new version
+        write_parquet(merged, root, partition_cols=[column], sort_by=SORT_KEYS[root.name])
+    kept = set(merged[column].astype(str)) if not merged.empty else set()
+    for partition in {Path(f).parent for f in files}:
+        if unquote(partition.name.split("=", 1)[1]) not in kept:
+            remove_published(partition)
+    return len(values)
+
+
+def _rewrite_quarantine(store: QuarantineStore, table: str, stale, new_rows: pd.DataFrame, key_fn):
+    # the previous run's rejects of table, minus the reprocessed keys, plus
+    # the new rejects become this run's; earlier runs' files stay as they are
+    existing = read_quarantine(store.base, table)
+    if not existing.empty:
+        existing = existing[~key_fn(existing).isin(stale).to_numpy()]
+    store.append(table, pd.concat([existing, new_rows], ignore_index=True))
+
+
+def _full_run(raw: Path, base: Path, inputs: dict, engine: str, csv_engine: str):
+    # write_outputs publishes whole datasets, replacing whatever was there
+    products, unparseable = read_products_csv(raw / "products.csv", engine=csv_engine)
+    vendors = read_vendors_jsonl(raw / "vendors.jsonl")
+    inventory = pd.read_parquet(raw / "inventory.parquet")
+
+    dim_vendor, vendor_map = build_dim_vendor(validate_raw_vendors(vendors), engine=engine)
+    dim_product, q_prod = build_dim_product(
+        validate_raw_products(products), vendor_map, engine=engine
+    )
+    fact_inventory, q_inv = build_fact_inventory(
+        validate_raw_inventory(inventory), dim_product, engine=engine
+    )
+    write_outputs(
+        str(base), dim_vendor, dim_product, fact_inventory, q_prod, q_inv, q_unparseable=unparseable
+    )
+    locations = {
+        "dim_product": _locations("dim_product", dim_product),
+        "fact_inventory": _locations("fact_inventory", fact_inventory),
+    }
+    _save_state(base, inputs, products, inventory, locations)
+    print(f"Full build: {len(products)} products, {len(inventory)} inventory rows")
+
+
+def run_incremental(
+    raw_dir: str, out_dir: str, engine: str = "columnar", csv_engine: str = "arrow"
+):
+    raw, base = Path(raw_dir), Path(out_dir)
+    manifest = _load_manifest(base)
+    previous = manifest["inputs"] if manifest else {}
+    inputs = {name: file_fingerprint(raw / name, previous.get(name)) for name in INPUTS}
+    if manifest is None:
+        return _full_run(raw, base, inputs, engine, csv_engine)
+
+    changed = {name for name in INPUTS if inputs[name] != previous.get(name)}
+    if not changed:
+        print("Inputs unchanged, nothing to do")
+        return
+
+    store = QuarantineStore(base)
+    state = base / STATE_DIR
+    products = inventory = None
+    locations = {}
+
+    if "vendors.jsonl" in changed:
+        vendors = read_vendors_jsonl(raw / "vendors.jsonl")
+        dim_vendor, _ = build_dim_vendor(validate_raw_vendors(vendors), engine=engine)
+        write_parquet(dim_vendor, base / "dim_vendor", sort_by=SORT_KEYS["dim_vendor"])
+        print(f"dim_vendor: rebuilt {len(dim_vendor)} vendors")
+
+    # product_ids whose dim_product membership may have changed; inventory rows
+    # pointing at them need their FK check redone even if they did not change
+    touched_ids = np.array([], dtype="int64")
+    if "products.csv" in changed:
+        products, unparseable = read_products_csv(raw / "products.csv", engine=csv_engine)
+        keys = product_keys(products)
+        stale = _changed_keys(keys, _hash_rows(products), state / "products.parquet")
+        subset = products[keys.isin(stale).to_numpy()]
+        dim_new, q_new = build_dim_product(validate_raw_products(subset), {}, engine=engine)
+
+        located = _load_locations(base, "dim_product")
+        old = located[located["key"].isin(stale).to_numpy()]
+        partitions = set(old["vendor_code"])
+        if not dim_new.empty:
+            partitions |= set(dim_new["vendor_code"])
+            touched_ids = np.union1d(old["product_id"], dim_new["product_id"])
+        else:
+            touched_ids = old["product_id"].to_numpy(dtype="int64")
+
+        rewritten = _rewrite_partitions(
+            base / "dim_product", "vendor_code", partitions, stale, dim_new, product_keys
+        )
+        locations["dim_product"] = _update_locations(located, "dim_product", stale, dim_new)
+        _rewrite_quarantine(store, "products", stale, q_new, product_keys)
+        store.append("products_unparseable", unparseable)
+        print(
+            f"dim_product: reprocessed {len(subset)} of {len(products)} rows, "
+            f"rewrote {rewritten} vendor_code partitions"
+        )
+
+    if "inventory.parquet" in changed or len(touched_ids):
+        inventory = pd.read_parquet(raw / "inventory.parquet")
+        keys = inventory_keys(inventory)
+        if "inventory.parquet" in changed:
+            stale = _changed_keys(keys, _hash_rows(inventory), state / "inventory.parquet")
+        else:
+            stale = np.array([], dtype="uint64")
+        refk = inventory["product_id"].astype("int64").isin(touched_ids).to_numpy()
+        stale = np.union1d(stale, keys[refk].to_numpy())
+        subset = inventory[keys.isin(stale).to_numpy()]
+
+        # the FK check needs only the subset's product_ids that are in dim_product
+        products_at = locations.get("dim_product")
+        if products_at is None:
+            products_at = _load_locations(base, "dim_product")
+        ids = subset["product_id"].astype("int64")
+        known = products_at.loc[products_at["product_id"].isin(ids).to_numpy(), ["product_id"]]
+        fact_new, q_new = build_fact_inventory(validate_raw_inventory(subset), known, engine=engine)
+
+        located = _load_locations(base, "fact_inventory")
+        partitions = set(located.loc[located["key"].isin(stale).to_numpy(), "warehouse"])
+        if not fact_new.empty:
+            partitions |= set(fact_new["warehouse"].astype(str))
+
+        rewritten = _rewrite_partitions(
+            base / "fact_inventory", "warehouse", partitions, stale, fact_new, inventory_keys
+        )
+        locations["fact_inventory"] = _update_locations(located, "fact_inventory", stale, fact_new)
+        _rewrite_quarantine(store, "inventory", stale, q_new, inventory_keys)
+        print(
+            f"fact_inventory: reprocessed {len(subset)} of {len(inventory)} rows, "
+            f"rewrote {rewritten} warehouse partitions"
+        )
+
+    if store.counts:
+        store.commit()
+    _save_state(base, inputs, products, inventory, locations)
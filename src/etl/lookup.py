@@ -0,0 +1,151 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import unquote
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# trusted dataset -> hive partition column (None: a single data.parquet)
+PARTITIONS = {"dim_vendor": None, "dim_product": "vendor_code", "fact_inventory": "warehouse"}
+
+
+class TrustedTables:
+    """Cached point lookups and pruned scans over the trusted outputs of an ETL run."""
+
+    def __init__(self, base_dir: str = "data"):
+        self.base = Path(base_dir)
+        self._cache = {}  # key -> (signature of its dataset, value)
+        # reentrant: building an index opens the dataset through the cache too
+        self._lock = threading.RLock()
+
+    def dataset(self, name: str) -> ds.Dataset:
+        """Arrow dataset of a trusted table, partition column typed as string."""
+        return self._cached(name, ("dataset", name), lambda: _open(self.base / name, name))
+
+    def scan(self, name: str, filter=None, columns: List[str] = None) -> pd.DataFrame:
+        """Rows of a trusted table matching a pyarrow.dataset expression."""
+        return self.dataset(name).to_table(filter=filter, columns=columns).to_pandas()
+
+    def product(self, sku: str = None, product_id: int = None) -> Optional[Dict]:
+        """The dim_product row of a SKU or product_id, or None."""
+        if (sku is None) == (product_id is None):
+            raise ValueError("Pass exactly one of sku and product_id")
+        column, key = ("sku", sku) if sku is not None else ("product_id", int(product_id))
+        table, index = self._indexed("dim_product", column)
+        return _row(table, index.get(key))
+
+    def vendor(self, vendor_code: str) -> Optional[Dict]:
+        """The dim_vendor row of a vendor code, or None."""
+        table, index = self._indexed("dim_vendor", "vendor_code")
+        return _row(table, index.get(vendor_code))
+
+    def warehouses(self) -> List[str]:
+        return self._cached("fact_inventory", ("warehouses",), self._list_warehouses)
+
+    def stock(self, sku: str = None, product_id: int = None, warehouse: str = None) -> List[Dict]:
+        """fact_inventory rows of a product, in one warehouse or all of them."""
+        if sku is not None:
+            product = self.product(sku=sku)
+            if product is None:
+                return []
+            product_id = product["product_id"]
+        elif product_id is None:
+            raise ValueError("Pass sku or product_id")
+        rows = []
+        for w in [warehouse] if warehouse is not None else self.warehouses():
+            table, keys = self._inventory(w)
+            lo = int(np.searchsorted(keys, product_id, side="left"))
+            hi = int(np.searchsorted(keys, product_id, side="right"))
+            rows += table.slice(lo, hi - lo).to_pylist()
+        return rows
+
+    def below_min_stock(self, warehouse: str = None) -> pd.DataFrame:
+        """fact_inventory rows with on_hand under min_stock, by warehouse and product_id."""
+        parts = []
+        for w in [warehouse] if warehouse is not None else self.warehouses():
+            table, _ = self._inventory(w)
+            parts.append(table.filter(pc.less(table["on_hand"], table["min_stock"])))
+        if not parts:
+            return pd.DataFrame()
+        return pa.concat_tables(parts).to_pandas()
+
+    def refresh(self):
+        """Drop every cached dataset, table and index."""
+        with self._lock:
+            self._cache.clear()
+
+    def _indexed(self, name: str, column: str):
+        """(whole table, {key: row number}) of a trusted table."""
+
+        def build():
+            table = self._table(name)
+            return table, dict(zip(table[column].to_pylist(), range(len(table))))
+
+        return self._cached(name, ("index", name, column), build)
+
+    def _table(self, name: str) -> pa.Table:
+        # one chunk per column: indexing a table read from many files is
+        # otherwise a search through its chunks
+        return self._cached(
+            name, ("table", name), lambda: self.dataset(name).to_table().combine_chunks()
+        )
+
+    def _inventory(self, warehouse: str):
+        """(rows of one warehouse sorted by product_id, their product_ids)."""
+
+        def build():
+            table = self.dataset("fact_inventory").to_table(
+                filter=ds.field("warehouse") == warehouse
+            )
+            # each file is sorted already; a partition written in batches has several
+            table = table.sort_by("product_id").combine_chunks()
+            return table, table["product_id"].to_numpy()
+
+        return self._cached("fact_inventory", ("inventory", warehouse), build)
+
+    def _list_warehouses(self) -> List[str]:
+        root = self.base / "fact_inventory"
+        if not root.exists():
+            return []
+        names = [p.name for p in root.iterdir() if p.name.startswith("warehouse=")]
+        return sorted(unquote(name.split("=", 1)[1]) for name in names)
+
+    def _cached(self, name: str, key, build):
+        signature = _signature(self.base / name)
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or entry[0] != signature:
+                entry = self._cache[key] = (signature, build())
+        return entry[1]
+
+
+def _open(path: Path, name: str) -> ds.Dataset:
+    column = PARTITIONS[name]
+    partitioning = None
+    if column is not None:
+        partitioning = ds.partitioning(pa.schema([(column, pa.string())]), flavor="hive")
+    return ds.dataset(path, format="parquet", partitioning=partitioning)
+
+
+def _signature(path: Path):
+    # publishing a new dataset version changes the inode the link resolves to,
+    # a new partition version renames a link inside it and changes its mtime
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def _row(table: pa.Table, i: Optional[int]) -> Optional[Dict]:
+    if i is None:
+        return None
+    return {name: column[i].as_py() for name, column in zip(table.column_names, table.columns)}
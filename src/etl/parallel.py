@@ -0,0 +1,118 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .utils import read_raw_frames, write_outputs
+from .validators import (
+    configure_validation,
+    merge_validation_stats,
+    reset_validation_stats,
+    validate_raw_inventory,
+    validate_raw_products,
+    validate_raw_vendors,
+    validation_config,
+    validation_stats,
+)
+from .transform import (
+    build_dim_product,
+    build_dim_vendor,
+    build_fact_inventory,
+    merge_parse_stats,
+    parse_stats,
+    product_keys,
+    reset_parse_stats,
+)
+
+
+def _shards(df: pd.DataFrame, keys: np.ndarray, workers: int):
+    shard_of = keys % workers
+    return [df[shard_of == i] for i in range(workers)]
+
+
+def _merge(parts):
+    # every shard keeps the input index, so sorting on it restores input order
+    # no matter how rows were distributed
+    frames = [df for df in parts if not df.empty]
+    if not frames:
+        return parts[0].reset_index(drop=True)
+    return pd.concat(frames).sort_index().reset_index(drop=True)
+
+
+def _counted(fn, *args):
+    # pool processes are reused, so each task starts its counters from zero and
+    # hands them back for the parent to report
+    reset_parse_stats()
+    reset_validation_stats()
+    return fn(*args), parse_stats(), validation_stats()
+
+
+def _pool(workers: int, mp_context=None) -> ProcessPoolExecutor:
+    # the validation settings are module globals, which spawn and forkserver
+    # workers start without; every worker is configured like this process
+    config = validation_config()
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context,
+        initializer=configure_validation,
+        initargs=(config["mode"], config["sample_rows"]),
+    )
+
+
+def _result(future):
+    result, parsing, validation = future.result()
+    merge_parse_stats(parsing)
+    merge_validation_stats(validation)
+    return result
+
+
+def _transform_products(products: pd.DataFrame, vendor_map: dict):
+    return build_dim_product(products, vendor_map, keep_index=True)
+
+
+def _inventory_shard(inventory: pd.DataFrame, known_ids: np.ndarray):
+    known = pd.DataFrame({"product_id": known_ids})
+    return build_fact_inventory(validate_raw_inventory(inventory), known, keep_index=True)
+
+
+def run_parallel(raw_dir: str, out_dir: str, workers: int, csv_engine: str = "arrow"):
+    dfs = read_raw_frames(raw_dir, csv_engine=csv_engine)
+    products = dfs["products"].reset_index(drop=True)
+    inventory = dfs["inventory"].reset_index(drop=True)
+
+    with _pool(workers) as pool:
+        # rows of one SKU share a shard, as do rows of one product_id below
+        shards = _shards(products, product_keys(products).to_numpy(), workers)
+        validating = [pool.submit(_counted, validate_raw_products, shard) for shard in shards]
+
+        # vendors are independent of products until vendor_map is needed, so
+        # they are built here while the pool validates products
+        dim_vendor, vendor_map = build_dim_vendor(validate_raw_vendors(dfs["vendors"]))
+
+        building = [
+            pool.submit(_counted, _transform_products, _result(f), vendor_map) for f in validating
+        ]
+        results = [_result(f) for f in building]
+        dim_product = _merge([dim for dim, _ in results])
+        q_prod = _merge([q for _, q in results])
+
+        ids = dim_product["product_id"].to_numpy(dtype="int64")
+        inv_ids = inventory["product_id"].to_numpy(dtype="int64")
+        # each inventory shard only needs the dim_product ids that hash to it
+        building = [
+            pool.submit(_counted, _inventory_shard, shard, ids[ids % workers == i])
+            for i, shard in enumerate(_shards(inventory, inv_ids, workers))
+        ]
+        results = [_result(f) for f in building]
+        fact_inventory = _merge([fact for fact, _ in results])
+        q_inv = _merge([q for _, q in results])
+
+    write_outputs(
+        out_dir,
+        dim_vendor,
+        dim_product,
+        fact_inventory,
+        q_prod,
+        q_inv,
+        q_unparseable=dfs["products_unparseable"],
+    )
@@ -0,0 +1,101 @@
+import cProfile
+import json
+import resource
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+METRICS_FILE = "run_metrics.json"
+PROFILE_DUMP = "transform.prof"
+
+
+def _children_cpu() -> float:
+    # worker processes (--workers) are only counted once they have exited
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is the process high-water mark, in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RunProfile:
+    """Per-stage wall/CPU time, peak RSS growth and row counts for one ETL run."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.stages = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, rows_in=None, dump: Path = None):
+        """Time the block; the caller may set record["rows_out"] inside it.
+
+        dump writes a cProfile dump of the block (pstats format, readable by
+        snakeviz, gprof2dot or `python -m pstats`).
+        """
+        record = {"name": name, "rows_in": rows_in, "rows_out": None}
+        profiler = cProfile.Profile() if dump else None
+        rss = _peak_rss_mb()
+        wall, cpu, children = time.perf_counter(), time.process_time(), _children_cpu()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(dump)
+                record["profile_dump"] = str(dump)
+            record["wall_seconds"] = time.perf_counter() - wall
+            record["cpu_seconds"] = time.process_time() - cpu
+            record["children_cpu_seconds"] = _children_cpu() - children
+            record["peak_rss_mb"] = _peak_rss_mb()
+            record["peak_rss_delta_mb"] = record["peak_rss_mb"] - rss
+            self.stages.append(record)
+
+    def write(self, out_dir: str, **extra) -> Path:
+        base = Path(out_dir)
+        metrics = {
+            "mode": self.mode,
+            "started_at": self.started_at,
+            "wall_seconds": time.perf_counter() - self._start,
+            "stages": self.stages,
+            "outputs": output_rows(base),
+            "quarantine": quarantine_counts(base),
+            **extra,
+        }
+        base.mkdir(parents=True, exist_ok=True)
+        path = base / METRICS_FILE
+        path.write_text(json.dumps(metrics, indent=2, default=str))
+        return path
+
+
+def output_rows(base: Path) -> dict:
+    """Row counts of the written tables, from parquet metadata only."""
+    import pyarrow.dataset as ds
+
+    counts = {}
+    for name in ("dim_vendor", "dim_product", "fact_inventory"):
+        if (base / name).exists():
+            counts[name] = ds.dataset(base / name, format="parquet").count_rows()
+    return counts
+
+
+def quarantine_counts(base: Path) -> dict:
+    """
+    Quarantined rows by reason per table, plus the number of unparseable
+    lines, of the current rejects; read from the quarantine summary only.
+    """
+    from .quarantine import latest_counts
+
+    latest = latest_counts(base)
+    counts = {
+        name: {reason: n for reason, n in latest.get(name, {}).items() if n}
+        for name in ("products", "inventory")
+    }
+    counts["products_unparseable"] = sum(latest.get("products_unparseable", {}).values())
+    return counts
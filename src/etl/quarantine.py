@@ -0,0 +1,138 @@
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from .writer import write_file
+
+QUARANTINE_DIR = Path("silver") / "_quarantine"
+# one summary file per committed run: SUMMARY_DIR/run_id=<run id>/summary.parquet
+SUMMARY_DIR = "summary"
+# every reason a table can reject a row for, in the transforms' precedence
+# order; stored as dictionary codes, and counted (zeros included) per run
+REASONS = {
+    "products": (
+        "sku_missing",
+        "dimensions_incomplete",
+        "invalid_weight",
+        "invalid_msrp",
+        "vendor_code_missing",
+    ),
+    "inventory": ("negative_on_hand", "fk_product_missing"),
+    # lines of products.csv the reader could not split into fields; the
+    # frame has no reason column, its rows are counted under this one
+    "products_unparseable": ("malformed_line",),
+}
+SUMMARY_COLUMNS = ["run_id", "date", "table", "reason", "rows", "committed_at"]
+
+
+def new_run_id() -> str:
+    """Sortable, unique run id: UTC start time plus a random suffix."""
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + "-" + uuid.uuid4().hex[:6]
+
+
+def reason_codes(reasons, table: str) -> pd.Categorical:
+    """Reason strings as a categorical over every reason of table."""
+    return pd.Categorical(reasons, categories=REASONS[table])
+
+
+class QuarantineStore:
+    """Append-only store of one run's rejected rows, partitioned by date and run_id."""
+
+    def __init__(self, base_dir: str, run_id: str = None):
+        self.base = Path(base_dir)
+        self.root = self.base / QUARANTINE_DIR
+        self.run_id = run_id or new_run_id()
+        self.date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        self.counts: Dict[str, Counter] = {}
+        self._parts = Counter()
+        self._schemas: Dict[str, pa.Schema] = {}
+
+    def path(self, table: str) -> Path:
+        return self.root / table / f"date={self.date}" / f"run_id={self.run_id}"
+
+    def append(self, table: str, df: pd.DataFrame):
+        """Add a batch of table's rejects to this run."""
+        counts = self.counts.setdefault(table, Counter())
+        if df is None or df.empty:
+            return
+        if "reason" in df.columns:
+            df = df.assign(reason=reason_codes(df["reason"], table))
+            counts.update(df["reason"].value_counts().to_dict())
+        else:
+            counts[REASONS[table][0]] += len(df)
+        rows = pa.Table.from_pandas(df, preserve_index=False)
+        # the first batch fixes the run's schema, so its part files read as one
+        schema = self._schemas.setdefault(table, _widen_nulls(rows.schema))
+        write_file(rows.select(schema.names).cast(schema), self._next(table))
+
+    def commit(self) -> pd.DataFrame:
+        """Write this run's counts as its own summary file; returns them."""
+        committed_at = pd.Timestamp.now(tz="UTC")
+        rows = [
+            (self.run_id, self.date, table, reason, self.counts[table][reason], committed_at)
+            for table in self.counts
+            for reason in REASONS[table]
+        ]
+        run = pd.DataFrame(rows, columns=SUMMARY_COLUMNS).astype({"rows": "int64"})
+        # a file per run: concurrent runs never rewrite each other's counts
+        path = self.root / SUMMARY_DIR / f"run_id={self.run_id}" / "summary.parquet"
+        write_file(pa.Table.from_pandas(run, preserve_index=False), path)
+        return run
+
+    def _next(self, table: str) -> Path:
+        part = self._parts[table]
+        self._parts[table] += 1
+        return self.path(table) / f"part-{part:05d}.parquet"
+
+
+def quarantine_summary(base_dir: str) -> pd.DataFrame:
+    """Per-run, per-reason reject counts of every committed run, oldest first."""
+    path = Path(base_dir) / QUARANTINE_DIR / SUMMARY_DIR
+    if not path.exists():
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    summary = ds.dataset(path, format="parquet").to_table().to_pandas()
+    if summary.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    return summary.sort_values(["committed_at", "run_id"], kind="stable", ignore_index=True)
+
+
+def latest_runs(base_dir: str) -> Dict[str, str]:
+    """table -> id of the last committed run that wrote it."""
+    summary = quarantine_summary(base_dir)
+    return dict(zip(summary["table"], summary["run_id"]))
+
+
+def latest_counts(base_dir: str) -> Dict[str, Dict[str, int]]:
+    """table -> {reason: rows} of the latest run writing each table, zeros included."""
+    summary = quarantine_summary(base_dir)
+    latest = latest_runs(base_dir)
+    counts = {}
+    for table, run_id in latest.items():
+        rows = summary[(summary["table"] == table) & (summary["run_id"] == run_id)]
+        counts[table] = dict(zip(rows["reason"], rows["rows"].astype(int)))
+    return counts
+
+
+def read_quarantine(base_dir: str, table: str, run_id: str = None, columns=None) -> pd.DataFrame:
+    """Rejects of one table from run_id, by default the latest committed run writing it."""
+    run_id = run_id or latest_runs(base_dir).get(table)
+    root = Path(base_dir) / QUARANTINE_DIR / table
+    # no directory: the run found nothing to reject in this table
+    paths = list(root.glob(f"date=*/run_id={run_id}")) if run_id else []
+    if not paths:
+        return pd.DataFrame(columns=columns)
+    return ds.dataset(paths[0], format="parquet").to_table(columns=columns).to_pandas()
+
+
+def _widen_nulls(schema: pa.Schema) -> pa.Schema:
+    # an all-missing text column in the first batch is inferred as null; widen
+    # it so later batches with values can be cast to the schema
+    return pa.schema(
+        [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in schema]
+    )
@@ -1,25 +1,171 @@
 import argparse
-from .utils import read_raw_frames, write_outputs
-from .validators import validate_raw_products, validate_raw_vendors, validate_raw_inventory
-from .transform import build_dim_product, build_dim_vendor, build_fact_inventory
+from pathlib import Path
+
+from .incremental import run_incremental
+from .parallel import run_parallel
+from .profiling import PROFILE_DUMP, RunProfile
+from .streaming import run_streaming
+from .utils import CSV_ENGINES, read_raw_frames, write_outputs
+from .validators import (
+    VALIDATION_MODES,
+    configure_validation,
+    format_validation_stats,
+    validate_raw_inventory,
+    validate_raw_products,
+    validate_raw_vendors,
+    validation_stats,
+)
+from .transform import (
+    ENGINES,
+    build_dim_product,
+    build_dim_vendor,
+    build_fact_inventory,
+    format_parse_stats,
+    parse_stats,
+)
 
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--raw-dir", default="raw")
     ap.add_argument("--out-dir", default="data")
+    ap.add_argument("--engine", choices=ENGINES, default="columnar")
+    ap.add_argument("--csv-engine", choices=CSV_ENGINES, default="arrow")
+    ap.add_argument(
+        "--streaming",
+        action="store_true",
+        help="process inputs in batches so memory is bounded by --batch-rows",
+    )
+    ap.add_argument("--batch-rows", type=int, default=100_000)
+    ap.add_argument(
+        "--incremental",
+        action="store_true",
+        help="reprocess only rows that changed since the last --incremental run",
+    )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="validate and transform SKU/product_id shards in this many processes",
+    )
+    ap.add_argument(
+        "--validation",
+        choices=VALIDATION_MODES,
+        default="compiled",
+        help="compiled: vectorized checks, pandera only for frames that fail them",
+    )
+    ap.add_argument(
+        "--validate-sample",
+        type=int,
+        metavar="N",
+        help="check values on a seeded sample of N rows per frame (dtypes are always checked)",
+    )
+    ap.add_argument(
+        "--profile",
+        action="store_true",
+        help="write per-stage timings, memory and row counts to <out-dir>/run_metrics.json",
+    )
+    ap.add_argument(
+        "--profile-dump",
+        action="store_true",
+        help=f"with --profile, also write a cProfile dump of the transform to <out-dir>/{PROFILE_DUMP}",
+    )
     args = ap.parse_args()
 
-    dfs = read_raw_frames(args.raw_dir)
-    p = validate_raw_products(dfs["products"])
-    v = validate_raw_vendors(dfs["vendors"])
-    i = validate_raw_inventory(dfs["inventory"])
+    if args.streaming and args.csv_engine != "arrow":
+        ap.error("--streaming reads products.csv with the arrow engine")
+    if args.streaming and args.incremental:
+        ap.error("--streaming and --incremental cannot be combined")
+    if args.workers > 1 and (args.streaming or args.incremental):
+        ap.error("--workers cannot be combined with --streaming or --incremental")
+    if args.workers > 1 and args.engine != "columnar":
+        ap.error("--workers needs the columnar engine")
+    if args.profile_dump and not args.profile:
+        ap.error("--profile-dump needs --profile")
+    configure_validation(args.validation, args.validate_sample)
+
+    if args.workers > 1:
+        mode = "parallel"
+    elif args.incremental:
+        mode = "incremental"
+    elif args.streaming:
+        mode = "streaming"
+    else:
+        mode = "in_memory"
+    profile = RunProfile(mode)
+    dump = Path(args.out_dir) / PROFILE_DUMP if args.profile_dump else None
+    _run(args, profile, dump)
+
+    print(format_parse_stats(parse_stats()))
+    print(format_validation_stats(validation_stats()))
+    if args.profile:
+        path = profile.write(
+            args.out_dir,
+            args={k: v for k, v in vars(args).items() if k not in ("profile", "profile_dump")},
+            parse_stats=parse_stats(),
+            validation_stats=validation_stats(),
+        )
+        print(f"Run metrics: {path}")
+
+
+def _run(args, profile: RunProfile, dump: Path = None):
+    if dump is not None:
+        dump.parent.mkdir(parents=True, exist_ok=True)
+    # the other modes interleave reading, validation, transform and writing,
+    # so they are recorded (and dumped) as a single stage
+    if args.workers > 1:
+        with profile.stage("parallel", dump=dump):
+            run_parallel(args.raw_dir, args.out_dir, args.workers, csv_engine=args.csv_engine)
+        return
+    if args.incremental:
+        with profile.stage("incremental", dump=dump):
+            run_incremental(
+                args.raw_dir, args.out_dir, engine=args.engine, csv_engine=args.csv_engine
+            )
+        return
+    if args.streaming:
+        with profile.stage("streaming", dump=dump):
+            run_streaming(args.raw_dir, args.out_dir, args.batch_rows, engine=args.engine)
+        return
+
+    with profile.stage("read") as stage:
+        dfs = read_raw_frames(args.raw_dir, csv_engine=args.csv_engine)
+        stage["rows_out"] = {name: len(df) for name, df in dfs.items()}
+
+    raw = {name: dfs[name] for name in ("products", "vendors", "inventory")}
+    with profile.stage("validate", rows_in=_rows(raw)) as stage:
+        p = validate_raw_products(dfs["products"])
+        v = validate_raw_vendors(dfs["vendors"])
+        i = validate_raw_inventory(dfs["inventory"])
+        stage["rows_out"] = _rows({"products": p, "vendors": v, "inventory": i})
+
+    with profile.stage("transform", rows_in=stage["rows_out"], dump=dump) as stage:
+        dim_vendor, vendor_map = build_dim_vendor(v, engine=args.engine)
+        dim_product, q_prod = build_dim_product(p, vendor_map, engine=args.engine)
+        fact_inventory, q_inv = build_fact_inventory(i, dim_product, engine=args.engine)
+        outputs = {
+            "dim_vendor": dim_vendor,
+            "dim_product": dim_product,
+            "fact_inventory": fact_inventory,
+            "quarantine_products": q_prod,
+            "quarantine_inventory": q_inv,
+        }
+        stage["rows_out"] = _rows(outputs)
+
+    with profile.stage("write", rows_in=stage["rows_out"]):
+        write_outputs(
+            args.out_dir,
+            dim_vendor,
+            dim_product,
+            fact_inventory,
+            q_prod,
+            q_inv,
+            q_unparseable=dfs["products_unparseable"],
+        )
 
-    dim_vendor, vendor_map = build_dim_vendor(v)
-    dim_product, q_prod = build_dim_product(p, vendor_map)
-    fact_inventory, q_inv = build_fact_inventory(i, dim_product)
 
-    write_outputs(args.out_dir, dim_vendor, dim_product, fact_inventory, q_prod, q_inv)
+def _rows(frames: dict) -> dict:
+    return {name: len(df) for name, df in frames.items()}
 
 
 if __name__ == "__main__":
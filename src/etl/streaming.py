@@ -0,0 +1,107 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from schemas.raw_schemas import VendorsRawSchema
+
+from .utils import (
+    SORT_KEYS,
+    BadLineLog,
+    append_parquet,
+    empty_frame,
+    iter_jsonl_batches,
+    iter_parquet_batches,
+    iter_products_batches,
+    write_parquet,
+)
+from .quarantine import QuarantineStore
+from .writer import new_version, publish
+from .validators import validate_raw_products, validate_raw_vendors, validate_raw_inventory
+from .transform import build_dim_product, build_dim_vendor, build_fact_inventory
+
+
+def _reduce_vendors(vendors: pd.DataFrame) -> pd.DataFrame:
+    # build_dim_vendor keeps the first row's country/email and the first longest
+    # name, so those (at most two) rows per vendor_code are all it needs to see
+    vendors = vendors.reset_index(drop=True)
+    first = ~vendors.duplicated("vendor_code")
+    longest_idx = vendors["name"].str.len().groupby(vendors["vendor_code"]).idxmax()
+    longest = vendors.index.isin(longest_idx)
+    return vendors[first | longest]
+
+
+def _vendor_prepass(path: Path, batch_rows: int) -> pd.DataFrame:
+    kept = None
+    for batch in iter_jsonl_batches(path, batch_rows):
+        batch = _reduce_vendors(validate_raw_vendors(batch))
+        kept = batch if kept is None else _reduce_vendors(pd.concat([kept, batch]))
+    if kept is None:
+        # no records: an empty frame, as the in-memory path reads it
+        return validate_raw_vendors(empty_frame(VendorsRawSchema))
+    return kept
+
+
+def _product_batches(
+    path: Path, batch_rows: int, vendor_map: dict, engine: str, bad_lines: BadLineLog
+):
+    # column types come from ProductsRawSchema, so every batch has the same dtypes
+    for batch in iter_products_batches(path, batch_rows, bad_lines):
+        yield build_dim_product(validate_raw_products(batch), vendor_map, engine=engine)
+
+
+def _inventory_batches(path: Path, batch_rows: int, known_ids: pd.DataFrame, engine: str):
+    for batch in iter_parquet_batches(path, batch_rows):
+        yield build_fact_inventory(validate_raw_inventory(batch), known_ids, engine=engine)
+
+
+def run_streaming(raw_dir: str, out_dir: str, batch_rows: int, engine: str = "columnar"):
+    raw = Path(raw_dir)
+    base = Path(out_dir)
+    # batches go to new hidden versions of the datasets, published once all
+    # are written; until then readers keep seeing the previous outputs
+    staged = {name: new_version(base / name) for name in ("dim_product", "fact_inventory")}
+    # rejects go out batch by batch, as part files of this run
+    store = QuarantineStore(base)
+    try:
+        _write_batches(raw, base, staged, store, batch_rows, engine)
+    except BaseException:
+        for version in staged.values():
+            shutil.rmtree(version, ignore_errors=True)
+        raise
+    for name, version in staged.items():
+        version.mkdir(parents=True, exist_ok=True)
+        publish(version, base / name)
+    store.commit()
+
+
+def _write_batches(
+    raw: Path, base: Path, staged: dict, store: QuarantineStore, batch_rows: int, engine: str
+):
+    vendors = _vendor_prepass(raw / "vendors.jsonl", batch_rows)
+    dim_vendor, vendor_map = build_dim_vendor(vendors, engine=engine)
+    write_parquet(dim_vendor, base / "dim_vendor", sort_by=SORT_KEYS["dim_vendor"])
+
+    # only the ids of accepted products are kept in memory for the FK check
+    ids = []
+    bad_lines = BadLineLog()
+    products = _product_batches(raw / "products.csv", batch_rows, vendor_map, engine, bad_lines)
+    for part, (dim_product, q) in enumerate(products):
+        if not dim_product.empty:
+            append_parquet(
+                dim_product, staged["dim_product"], part, ["vendor_code"], SORT_KEYS["dim_product"]
+            )
+            ids.append(dim_product["product_id"].to_numpy())
+        store.append("products", q)
+    store.append("products_unparseable", bad_lines.frame(raw / "products.csv"))
+
+    known_ids = pd.DataFrame(
+        {"product_id": np.unique(np.concatenate(ids)) if ids else np.array([], dtype="int64")}
+    )
+    inventory = _inventory_batches(raw / "inventory.parquet", batch_rows, known_ids, engine)
+    for part, (fact, q) in enumerate(inventory):
+        if not fact.empty:
+            append_parquet(
+                fact, staged["fact_inventory"], part, ["warehouse"], SORT_KEYS["fact_inventory"]
+            )
+        store.append("inventory", q)
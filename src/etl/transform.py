@@ -1,17 +1,66 @@
+import numpy as np
 import pandas as pd
 import re
 import hashlib
+import time
 from datetime import datetime
-from schemas.trusted_schemas import DimProductSchema, DimVendorSchema, FactInventorySchema
+from functools import lru_cache
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+from .quarantine import reason_codes
+from .validators import validate_dim_product, validate_dim_vendor, validate_fact_inventory
 
 DECIMAL_COMMA = re.compile(r"(\d+),(\d+)")
 DIMENSIONS_RE = re.compile(r"^\s*(\d+)\s*x\s*(\d+)\s*x\s*(\d+)\s*$")
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y/%d/%m")
+ENGINES = ("columnar", "rows")
+# dim_product columns the columnar engine builds with the trusted dtype and
+# values (cleaned strings, astype, msrp >= 0 filter), so validation skips them;
+# weight/dimensions are truncated to int after their > 0 filter and still checked
+COLUMNAR_GUARANTEED = (
+    "product_id",
+    "sku",
+    "model",
+    "category",
+    "vendor_code",
+    "launch_date",
+    "msrp_usd",
+)
+# distinct raw strings remembered per parser; feeds repeat a few thousand values
+PARSE_CACHE_SIZE = 65_536
+
+
+# Missing values are handled before the cached parsers so NaN (which never
+# equals itself) cannot fill the caches with one entry per row.
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _fix_decimal_text(text: str) -> str:
+    return DECIMAL_COMMA.sub(r"\1.\2", text).strip()
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_date_text(text: str):
+    for fmt in DATE_FORMATS:
+        try:
+            return pd.to_datetime(datetime.strptime(text, fmt))
+        except Exception:
+            continue
+    return None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_dimensions_text(text: str):
+    m = DIMENSIONS_RE.match(text)
+    if not m:
+        return None
+    L, W, H = map(int, m.groups())
+    return L, W, H
 
 
 def _fix_decimal_str(s: str) -> str:
     if pd.isna(s):
         return s
-    return DECIMAL_COMMA.sub(r"\1.\2", str(s)).strip()
+    return _fix_decimal_text(str(s))
 
 
 def _parse_float(s):
@@ -26,22 +75,78 @@ def _parse_float(s):
 def _parse_date(s):
     if pd.isna(s) or str(s).strip() == "":
         return None
-    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%Y/%d/%m"):
-        try:
-            return pd.to_datetime(datetime.strptime(str(s).strip(), fmt))
-        except Exception:
-            continue
-    return None
+    return _parse_date_text(str(s).strip())
 
 
 def _parse_dimensions(s):
     if pd.isna(s):
         return None
-    m = DIMENSIONS_RE.match(str(s))
-    if not m:
-        return None
-    L, W, H = map(int, m.groups())
-    return L, W, H
+    return _parse_dimensions_text(str(s))
+
+
+_CACHED_PARSERS = {
+    "decimal": _fix_decimal_text,
+    "date": _parse_date_text,
+    "dimensions": _parse_dimensions_text,
+}
+# per column: rows seen, distinct values actually parsed, seconds spent
+_column_stats = {}
+# cache counters reported by other processes (see merge_parse_stats)
+_merged_cache_stats = {}
+
+
+def parse_stats() -> dict:
+    """Cache hits/misses of the scalar parsers and factorize counts of the column parsers."""
+    caches = {}
+    for name, fn in _CACHED_PARSERS.items():
+        info = fn.cache_info()
+        merged = _merged_cache_stats.get(name, {})
+        caches[name] = {
+            "hits": info.hits + merged.get("hits", 0),
+            "misses": info.misses + merged.get("misses", 0),
+        }
+    columns = {name: dict(counts) for name, counts in _column_stats.items()}
+    return {"caches": caches, "columns": columns}
+
+
+def merge_parse_stats(stats: dict):
+    """Add parse_stats() taken in another process (e.g. a --workers shard) to this one."""
+    for name, counts in stats["caches"].items():
+        merged = _merged_cache_stats.setdefault(name, {"hits": 0, "misses": 0})
+        for key, value in counts.items():
+            merged[key] += value
+    for name, counts in stats["columns"].items():
+        _record_column(name, **counts)
+
+
+def reset_parse_stats():
+    for fn in _CACHED_PARSERS.values():
+        fn.cache_clear()
+    _column_stats.clear()
+    _merged_cache_stats.clear()
+
+
+def format_parse_stats(stats: dict) -> str:
+    lines = ["Parse stats:"]
+    for name, c in stats["columns"].items():
+        lines.append(
+            f"  {name}: {c['rows']} rows, {c['unique']} distinct parsed in {c['seconds']:.3f}s"
+        )
+    for name, c in stats["caches"].items():
+        calls = c["hits"] + c["misses"]
+        if calls:
+            lines.append(
+                f"  {name} cache: {c['hits']} hits, {c['misses']} misses "
+                f"({c['hits'] / calls:.1%} hit rate)"
+            )
+    return "\n".join(lines)
+
+
+def _record_column(name: str, rows: int, unique: int, seconds: float):
+    counts = _column_stats.setdefault(name, {"rows": 0, "unique": 0, "seconds": 0.0})
+    counts["rows"] += rows
+    counts["unique"] += unique
+    counts["seconds"] += seconds
 
 
 def _gen_product_id_from_sku(sku: str) -> int:
@@ -49,7 +154,106 @@ def _gen_product_id_from_sku(sku: str) -> int:
     return int(h[:12], 16)
 
 
-def build_dim_vendor(vendors: pd.DataFrame):
+# Column-wise counterparts of the scalar helpers above. Each one mirrors the
+# scalar semantics exactly so both engines produce the same frames.
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    if name in df.columns:
+        return df[name]
+    return pd.Series(None, index=df.index, dtype=object, name=name)
+
+
+def _clean_str_col(s: pd.Series) -> pd.Series:
+    # str(v or "").strip(): falsy values become "", NaN is truthy and stays "nan"
+    values = s.to_numpy(dtype=object)
+    falsy = np.equal(values, None) | np.equal(values, 0) | np.equal(values, "")
+    return s.astype(str).str.strip().mask(falsy, "")
+
+
+def _fix_decimal_col(s: pd.Series) -> pd.Series:
+    fixed = s.astype(str).str.replace(DECIMAL_COMMA, r"\1.\2", regex=True).str.strip()
+    return fixed.where(s.notna())
+
+
+def _parse_unique(s: pd.Series, parse_col):
+    """Run parse_col over the distinct values of s only and broadcast the result back."""
+    start = time.perf_counter()
+    codes, uniques = pd.factorize(s)
+    # missing values (code -1) get one trailing slot so they go through parse_col too
+    distinct = pd.Series(np.append(np.asarray(uniques, dtype=object), np.nan), dtype=object)
+    parsed = parse_col(distinct)
+    out = parsed.iloc[np.where(codes < 0, len(uniques), codes)]
+    out.index = s.index
+    _record_column(str(s.name), len(s), len(uniques), time.perf_counter() - start)
+    return out
+
+
+def _parse_float_values(s: pd.Series) -> pd.Series:
+    fixed = _fix_decimal_col(s)
+    out = pd.to_numeric(fixed, errors="coerce").astype("float64")
+    # to_numeric is stricter than float() (e.g. "1_000"), so the few leftovers
+    # go through the scalar parser
+    retry = out.isna() & fixed.notna()
+    if retry.any():
+        out[retry] = fixed[retry].map(_parse_float).astype("float64")
+    return out
+
+
+def _parse_float_col(s: pd.Series) -> pd.Series:
+    if is_numeric_dtype(s) and not is_bool_dtype(s):
+        return s.astype("float64")
+    return _parse_unique(s, _parse_float_values)
+
+
+def _parse_dimensions_values(s: pd.Series) -> pd.DataFrame:
+    # str(NaN) / str(None) never match, so missing values come back as NaN
+    dims = s.astype(str).str.extract(DIMENSIONS_RE)
+    dims.columns = ["length_mm", "width_mm", "height_mm"]
+    return dims
+
+
+def _parse_dimensions_col(s: pd.Series) -> pd.DataFrame:
+    return _parse_unique(s, _parse_dimensions_values)
+
+
+def _parse_date_values(s: pd.Series) -> pd.Series:
+    text = s.astype(str).str.strip()
+    out = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+    for fmt in DATE_FORMATS:
+        todo = out.isna() & s.notna()
+        if not todo.any():
+            break
+        out[todo] = pd.to_datetime(text[todo], format=fmt, errors="coerce")
+    return out
+
+
+def _parse_date_col(s: pd.Series) -> pd.Series:
+    return _parse_unique(s, _parse_date_values)
+
+
+def _gen_product_id_col(skus: pd.Series) -> pd.Series:
+    lookup = {sku: _gen_product_id_from_sku(sku) for sku in skus.unique()}
+    return skus.map(lookup)
+
+
+def product_keys(products: pd.DataFrame) -> pd.Series:
+    """64-bit hash of the cleaned SKU, equal for a product's input, dim and quarantine rows."""
+    return pd.util.hash_pandas_object(_clean_str_col(products["sku"]), index=False)
+
+
+def inventory_keys(inventory: pd.DataFrame) -> pd.Series:
+    """64-bit hash of (product_id, warehouse)."""
+    keys = pd.DataFrame(
+        {
+            "product_id": inventory["product_id"].astype("int64"),
+            "warehouse": inventory["warehouse"].astype(str),
+        }
+    )
+    return pd.util.hash_pandas_object(keys, index=False)
+
+
+def _build_dim_vendor_rows(vendors: pd.DataFrame):
     def choose_name(group):
         return group.loc[group["name"].str.len().idxmax(), "name"]
 
@@ -57,6 +261,11 @@ def build_dim_vendor(vendors: pd.DataFrame):
         preferred = group["support_email"].iloc[0]
         return preferred
 
+    if vendors.empty:
+        # apply() over no groups would return none of the output columns
+        columns = ["vendor_code", "vendor_name", "country", "support_email"]
+        return pd.DataFrame({c: pd.Series(dtype=object) for c in columns})
+
     agg = (
         vendors.groupby("vendor_code", as_index=False)
         .apply(
@@ -70,13 +279,38 @@ def build_dim_vendor(vendors: pd.DataFrame):
         )
         .reset_index(drop=True)
     )
+    return agg
+
+
+def _build_dim_vendor_columnar(vendors: pd.DataFrame):
+    vendors = vendors[vendors["vendor_code"].notna()].reset_index(drop=True)
+    first = vendors.drop_duplicates("vendor_code")
+    # a stable sort on descending name length keeps the earliest row among
+    # equally long names, matching idxmax; missing names sort last
+    lengths = vendors["name"].str.len().to_numpy(dtype="float64")
+    longest = vendors.iloc[np.argsort(-lengths, kind="stable")].drop_duplicates("vendor_code")
+
+    agg = first[["vendor_code", "country", "support_email"]].merge(
+        longest[["vendor_code", "name"]].rename(columns={"name": "vendor_name"}),
+        on="vendor_code",
+    )
+    agg = agg.sort_values("vendor_code", kind="stable").reset_index(drop=True)
+    return agg[["vendor_code", "vendor_name", "country", "support_email"]]
 
-    dim_vendor = DimVendorSchema.validate(agg, lazy=True)
+
+def build_dim_vendor(vendors: pd.DataFrame, engine: str = "columnar"):
+    _check_engine(engine, False)
+    if engine == "columnar":
+        agg = _build_dim_vendor_columnar(vendors)
+    else:
+        agg = _build_dim_vendor_rows(vendors)
+
+    dim_vendor = validate_dim_vendor(agg)
     vendor_map = dim_vendor.set_index("vendor_code").to_dict(orient="index")
     return dim_vendor, vendor_map
 
 
-def build_dim_product(products: pd.DataFrame, vendor_map: dict):
+def _build_dim_product_rows(products: pd.DataFrame, vendor_map: dict):
     rows = []
     quarantine = []
     for _, r in products.iterrows():
@@ -132,12 +366,91 @@ def build_dim_product(products: pd.DataFrame, vendor_map: dict):
 
     dim_product = pd.DataFrame(rows)
     q_prod = pd.DataFrame(quarantine)
+    if not q_prod.empty:
+        q_prod["reason"] = reason_codes(q_prod["reason"], "products")
+    if not dim_product.empty:
+        dim_product = validate_dim_product(dim_product)
+    return dim_product, q_prod
+
+
+def _build_dim_product_columnar(products: pd.DataFrame, vendor_map: dict, keep_index=False):
+    index = products.index
+    products = products.reset_index(drop=True)
+    pid = _column(products, "product_id")
+    sku = _clean_str_col(_column(products, "sku"))
+    model = _clean_str_col(_column(products, "model"))
+    category = _clean_str_col(_column(products, "category"))
+    weight = _parse_float_col(_column(products, "weight_grams"))
+    msrp = _parse_float_col(_column(products, "msrp_usd"))
+    dims = _parse_dimensions_col(_column(products, "dimensions_mm"))
+    vcode = _clean_str_col(_column(products, "vendor_code"))
+    ldate = _parse_date_col(_column(products, "launch_date"))
+
+    # np.select picks the first matching condition, which keeps the row loop's
+    # reason precedence
+    checks = [
+        (sku == "", "sku_missing"),
+        (dims.isna().any(axis=1), "dimensions_incomplete"),
+        (~(weight > 0), "invalid_weight"),
+        (~(msrp >= 0), "invalid_msrp"),
+        (vcode == "", "vendor_code_missing"),
+    ]
+    reason = np.select(
+        [mask.to_numpy() for mask, _ in checks], [name for _, name in checks], default=""
+    )
+    bad = reason != ""
+    ok = ~bad
+
+    q_prod = products[bad].assign(reason=reason_codes(reason[bad], "products"))
+    q_prod = q_prod.reset_index(drop=True).infer_objects()
+    if keep_index:
+        q_prod.index = index[bad]
+
+    ids = pid[ok]
+    missing = ids.isna()
+    if missing.any():
+        ids = ids.where(~missing, _gen_product_id_col(sku[ok][missing]))
+
+    dim_product = pd.DataFrame(
+        {
+            "product_id": ids.astype("int64"),
+            "sku": sku[ok],
+            "model": model[ok].replace("", "UNKNOWN"),
+            "category": category[ok].replace("", "UNKNOWN"),
+            "weight_g": weight[ok].astype("int64"),
+            "length_mm": dims.loc[ok, "length_mm"].astype("int64"),
+            "width_mm": dims.loc[ok, "width_mm"].astype("int64"),
+            "height_mm": dims.loc[ok, "height_mm"].astype("int64"),
+            "vendor_code": vcode[ok],
+            "launch_date": ldate[ok],
+            "msrp_usd": msrp[ok],
+        }
+    ).reset_index(drop=True)
+    if keep_index:
+        dim_product.index = index[ok]
     if not dim_product.empty:
-        dim_product = DimProductSchema.validate(dim_product, lazy=True)
+        dim_product = validate_dim_product(dim_product, guaranteed=COLUMNAR_GUARANTEED)
     return dim_product, q_prod
 
 
-def build_fact_inventory(inventory: pd.DataFrame, dim_product: pd.DataFrame):
+def _check_engine(engine: str, keep_index: bool):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+    if keep_index and engine != "columnar":
+        raise ValueError("keep_index is only supported by the columnar engine")
+
+
+def build_dim_product(
+    products: pd.DataFrame, vendor_map: dict, engine: str = "columnar", keep_index=False
+):
+    """keep_index=True labels output rows with their input index instead of 0..n-1."""
+    _check_engine(engine, keep_index)
+    if engine == "columnar":
+        return _build_dim_product_columnar(products, vendor_map, keep_index)
+    return _build_dim_product_rows(products, vendor_map)
+
+
+def _build_fact_inventory_rows(inventory: pd.DataFrame, dim_product: pd.DataFrame):
     quarantine = []
     valid = []
     valid_ids = set(dim_product["product_id"].tolist())
@@ -153,6 +466,41 @@ def build_fact_inventory(inventory: pd.DataFrame, dim_product: pd.DataFrame):
 
     fact = pd.DataFrame(valid)
     q = pd.DataFrame(quarantine)
+    if not q.empty:
+        q["reason"] = reason_codes(q["reason"], "inventory")
     if not fact.empty:
-        fact = FactInventorySchema.validate(fact, lazy=True)
+        fact = validate_fact_inventory(fact)
     return fact, q
+
+
+def _build_fact_inventory_columnar(
+    inventory: pd.DataFrame, dim_product: pd.DataFrame, keep_index=False
+):
+    negative = (inventory["on_hand"] < 0).to_numpy()
+    # isin hashes dim_product ids once and probes every inventory row against it
+    known = inventory["product_id"].astype("int64").isin(dim_product["product_id"]).to_numpy()
+
+    reason = np.select([negative, ~known], ["negative_on_hand", "fk_product_missing"], default="")
+    bad = reason != ""
+
+    fact = inventory[~bad]
+    q = inventory[bad].assign(reason=reason_codes(reason[bad], "inventory"))
+    if not keep_index:
+        fact = fact.reset_index(drop=True)
+        q = q.reset_index(drop=True)
+    if not fact.empty:
+        fact = validate_fact_inventory(fact)
+    return fact, q
+
+
+def build_fact_inventory(
+    inventory: pd.DataFrame,
+    dim_product: pd.DataFrame,
+    engine: str = "columnar",
+    keep_index=False,
+):
+    """keep_index=True labels output rows with their input index instead of 0..n-1."""
+    _check_engine(engine, keep_index)
+    if engine == "columnar":
+        return _build_fact_inventory_columnar(inventory, dim_product, keep_index)
+    return _build_fact_inventory_rows(inventory, dim_product)
@@ -1,27 +1,223 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from schemas.raw_schemas import ProductsRawSchema, VendorsRawSchema
 
+CSV_ENGINES = ("arrow", "python")
+UNPARSEABLE_COLUMNS = ["line_number", "raw_text", "expected_columns", "actual_columns"]
 
-def read_raw_frames(raw_dir: str):
+
+def read_raw_frames(raw_dir: str, csv_engine: str = "arrow"):
     raw = Path(raw_dir)
-    products = pd.read_csv(raw / "products.csv", on_bad_lines="skip", engine="python")
-    vendors = pd.read_json(raw / "vendors.jsonl", lines=True)
+    products, unparseable = read_products_csv(raw / "products.csv", engine=csv_engine)
+    vendors = read_vendors_jsonl(raw / "vendors.jsonl")
     inventory = pd.read_parquet(raw / "inventory.parquet")
-    return {"products": products, "vendors": vendors, "inventory": inventory}
+    return {
+        "products": products,
+        "products_unparseable": unparseable,
+        "vendors": vendors,
+        "inventory": inventory,
+    }
+
+
+def empty_frame(schema) -> pd.DataFrame:
+    """No rows, but the columns and dtypes of a pandera schema."""
+    return pd.DataFrame(
+        {
+            name: pd.Series(dtype="object" if str(col.dtype) == "str" else str(col.dtype))
+            for name, col in schema.columns.items()
+        }
+    )
+
+
+def read_vendors_jsonl(path: Path) -> pd.DataFrame:
+    vendors = pd.read_json(path, lines=True)
+    # a file without records reads as a frame without columns
+    return vendors if len(vendors.columns) else empty_frame(VendorsRawSchema)
+
+
+def _arrow_column_types(schema):
+    import pyarrow as pa
+
+    return {
+        name: (
+            pa.string()
+            if str(col.dtype) == "str"
+            else pa.from_numpy_dtype(np.dtype(str(col.dtype)))
+        )
+        for name, col in schema.columns.items()
+    }
+
+
+class BadLineLog:
+    """invalid_row_handler for pyarrow.csv that keeps malformed lines instead of dropping them."""
+
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self, row):
+        self.rows.append((row.number, row.text, row.expected_columns, row.actual_columns))
+        return "skip"
+
+    def frame(self, path: Path) -> pd.DataFrame:
+        rows = self.rows
+        if any(number is None for number, *_ in rows):
+            rows = _locate_lines(path, rows)
+        return pd.DataFrame(rows, columns=UNPARSEABLE_COLUMNS).astype(
+            {"expected_columns": "int64", "actual_columns": "int64"}
+        )
+
+
+def _locate_lines(path: Path, rows):
+    # the multi-threaded reader does not know line numbers; a serial Arrow pass
+    # that converts a single column recovers them, and only runs when the file
+    # actually has malformed lines
+    import pyarrow.csv as pacsv
+
+    pending = {}
+    for i, (number, text, *_) in enumerate(rows):
+        if number is None:
+            pending.setdefault(text, []).append(i)
+    located = list(rows)
+
+    def handler(row):
+        slots = pending.get(row.text)
+        if slots:
+            i = slots.pop(0)
+            located[i] = (row.number, *rows[i][1:])
+        return "skip"
+
+    first_column = next(iter(ProductsRawSchema.columns))
+    options = {
+        "parse_options": pacsv.ParseOptions(invalid_row_handler=handler),
+        "convert_options": pacsv.ConvertOptions(include_columns=[first_column]),
+    }
+    with pacsv.open_csv(path, **options) as reader:
+        for _ in reader:
+            pass
+    return located
+
+
+def _arrow_csv_options(use_threads: bool, bad_lines: BadLineLog):
+    import pyarrow.csv as pacsv
+
+    return {
+        "read_options": pacsv.ReadOptions(use_threads=use_threads),
+        "parse_options": pacsv.ParseOptions(invalid_row_handler=bad_lines),
+        "convert_options": pacsv.ConvertOptions(
+            column_types=_arrow_column_types(ProductsRawSchema), strings_can_be_null=True
+        ),
+    }
+
+
+def _products_to_pandas(table) -> pd.DataFrame:
+    df = table.to_pandas()
+    # pandas' readers mark missing text as NaN, Arrow as None; keep NaN so both
+    # readers hand the same frame to validation and transform
+    for name in df.select_dtypes(include="object").columns:
+        values = df[name].to_numpy()
+        missing = np.equal(values, None)
+        if missing.any():
+            values = values.copy()
+            values[missing] = np.nan
+            df[name] = values
+    return df
 
 
-def write_parquet(df: pd.DataFrame, out_path: Path, partition_cols=None):
-    out_path.mkdir(parents=True, exist_ok=True)
+def read_products_csv(path: Path, engine: str = "arrow"):
+    """Return (products, unparseable lines). The python engine cannot report bad lines."""
+    if engine == "python":
+        # text columns stay text, as the arrow reader returns them
+        text = {
+            name: str for name, col in ProductsRawSchema.columns.items() if str(col.dtype) == "str"
+        }
+        products = pd.read_csv(path, on_bad_lines="skip", engine="python", dtype=text)
+        return products, pd.DataFrame(columns=UNPARSEABLE_COLUMNS)
+    if engine != "arrow":
+        raise ValueError(f"Unknown CSV engine {engine!r}, expected one of {CSV_ENGINES}")
+
+    import pyarrow.csv as pacsv
+
+    bad_lines = BadLineLog()
+    table = pacsv.read_csv(path, **_arrow_csv_options(True, bad_lines))
+    return _products_to_pandas(table), bad_lines.frame(path)
+
+
+def iter_products_batches(path: Path, batch_rows: int, bad_lines: BadLineLog):
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    table = None
+    with pacsv.open_csv(path, **_arrow_csv_options(False, bad_lines)) as reader:
+        for batch in reader:
+            chunk = pa.Table.from_batches([batch])
+            table = chunk if table is None else pa.concat_tables([table, chunk])
+            while table.num_rows >= batch_rows:
+                yield _products_to_pandas(table.slice(0, batch_rows))
+                table = table.slice(batch_rows)
+    if table is not None and table.num_rows:
+        yield _products_to_pandas(table)
+
+
+def iter_jsonl_batches(path: Path, batch_rows: int):
+    with pd.read_json(path, lines=True, chunksize=batch_rows) as reader:
+        yield from reader
+
+
+def iter_parquet_batches(path: Path, batch_rows: int):
+    import pyarrow.parquet as pq
+
+    # iter_batches decodes one row group at a time, so memory is bounded by
+    # max(batch_rows, row group size) rather than the file size
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+        yield batch.to_pandas()
+
+
+# key columns each trusted output is sorted by, so row group statistics can
+# prune reads by id
+SORT_KEYS = {
+    "dim_vendor": ["vendor_code"],
+    "dim_product": ["product_id"],
+    "fact_inventory": ["product_id"],
+}
+
+
+def write_parquet(
+    df: pd.DataFrame, out_path: Path, partition_cols=None, sort_by=None, mode="replace"
+):
+    """
+    Write df to out_path with the tuned writer (see src/etl/writer.py).
+
+    Without partition_cols it becomes out_path/data.parquet. Partitioned, each
+    partition in df replaces the one on disk (mode="overwrite" replaces the
+    whole dataset); either way readers never see half-written files.
+    """
+    import pyarrow as pa
+
+    from .writer import write_dataset, write_file
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
     if partition_cols:
-        import pyarrow as pa
-        import pyarrow.parquet as pq
+        write_dataset(table, out_path, partition_cols, sort_by=sort_by, mode=mode)
+    else:
+        out_path.mkdir(parents=True, exist_ok=True)
+        write_file(table, out_path / "data.parquet", sort_by=sort_by)
 
-        table = pa.Table.from_pandas(df)
-        pq.write_to_dataset(
-            table, root_path=str(out_path), partition_cols=partition_cols, use_dictionary=True
+
+def append_parquet(df: pd.DataFrame, out_path: Path, part: int, partition_cols=None, sort_by=None):
+    """Write one batch of a dataset under a deterministic, per-batch file name."""
+    import pyarrow as pa
+
+    from .writer import write_dataset, write_file
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    basename = f"part-{part:05d}.parquet"
+    if partition_cols:
+        write_dataset(
+            table, out_path, partition_cols, sort_by=sort_by, mode="append", basename=basename
         )
     else:
-        df.to_parquet(out_path / "data.parquet", index=False)
+        write_file(table, out_path / basename, sort_by=sort_by)
 
 
 def write_outputs(
@@ -31,15 +227,21 @@ def write_outputs(
     fact_inventory: pd.DataFrame,
     q_prod: pd.DataFrame,
     q_inv: pd.DataFrame,
+    q_unparseable: pd.DataFrame = None,
 ):
     base = Path(base_out)
-    write_parquet(dim_vendor, base / "dim_vendor")
-    write_parquet(dim_product, base / "dim_product", partition_cols=["vendor_code"])
-    write_parquet(fact_inventory, base / "fact_inventory", partition_cols=["warehouse"])
-
-    silver = base / "silver" / "_quarantine"
-    silver.mkdir(parents=True, exist_ok=True)
-    if not q_prod.empty:
-        q_prod.to_parquet(silver / "products.parquet", index=False)
-    if not q_inv.empty:
-        q_inv.to_parquet(silver / "inventory.parquet", index=False)
+    write_parquet(dim_vendor, base / "dim_vendor", sort_by=SORT_KEYS["dim_vendor"])
+    for name, df, column in [
+        ("dim_product", dim_product, "vendor_code"),
+        ("fact_inventory", fact_inventory, "warehouse"),
+    ]:
+        write_parquet(df, base / name, [column], sort_by=SORT_KEYS[name], mode="overwrite")
+
+    from .quarantine import QuarantineStore
+
+    store = QuarantineStore(base)
+    store.append("products", q_prod)
+    store.append("inventory", q_inv)
+    if q_unparseable is not None:
+        store.append("products_unparseable", q_unparseable)
+    store.commit()
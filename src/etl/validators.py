@@ -1,14 +1,175 @@
+import time
+
+import numpy as np
 import pandas as pd
+from pandas.api.types import infer_dtype
 from schemas.raw_schemas import ProductsRawSchema, VendorsRawSchema, InventoryRawSchema
+from schemas.trusted_schemas import DimProductSchema, DimVendorSchema, FactInventorySchema
+
+VALIDATION_MODES = ("compiled", "pandera")
+
+# pandera check name -> (vectorized comparison, statistic holding the bound)
+_RANGE_CHECKS = {
+    "greater_than": (np.greater, "min_value"),
+    "greater_than_or_equal_to": (np.greater_equal, "min_value"),
+    "less_than": (np.less, "max_value"),
+    "less_than_or_equal_to": (np.less_equal, "max_value"),
+}
+
+
+def _compile_check(check):
+    """Vectorized form of a pandera column check, or None if it has none."""
+    if check.name in _RANGE_CHECKS:
+        compare, stat = _RANGE_CHECKS[check.name]
+        bound = check.statistics[stat]
+        return lambda values: compare(values.to_numpy(), bound)
+    if check.name == "str_matches":
+        pattern = check.statistics["pattern"]
+        return lambda values: values.str.match(pattern).to_numpy(dtype=bool)
+    return None
+
+
+class CompiledSchema:
+    """Vectorized dtype, null and range checks derived once from a pandera DataFrameSchema.
+
+    The checks are conservative: a frame that passes them would pass pandera
+    unchanged (coercion included), so it is returned as is. Anything else goes
+    to pandera, which coerces or raises its usual lazy SchemaErrors report.
+    Schemas using features not covered here (unique, strict, index or frame
+    checks, unknown column checks) always go to pandera.
+    """
+
+    def __init__(self, schema):
+        self.columns = {}
+        self.compiled = not (schema.unique or schema.strict or schema.index or schema.checks)
+        for name, column in schema.columns.items():
+            if column.unique or column.regex or not column.required:
+                self.compiled = False
+                continue
+            checks = [_compile_check(check) for check in column.checks]
+            if None in checks:
+                self.compiled = False
+                continue
+            self.columns[name] = (str(column.dtype), column.nullable, checks)
+
+    def passes(self, df: pd.DataFrame, skip=(), sample_rows=None) -> bool:
+        if not self.compiled:
+            return False
+        rows = None
+        if sample_rows is not None and len(df) > sample_rows:
+            # dtypes are always checked on the whole frame; values on a sample
+            rows = np.random.default_rng(0).choice(len(df), sample_rows, replace=False)
+        for name, (dtype, nullable, checks) in self.columns.items():
+            if name in skip:
+                continue
+            if name not in df.columns:
+                return False
+            s = df[name]
+            if str(s.dtype) != ("object" if dtype == "str" else dtype):
+                return False
+            if rows is not None:
+                s = s.iloc[rows]
+            missing = s.isna()
+            if missing.any():
+                if not nullable:
+                    return False
+                s = s[~missing]
+            if dtype == "str" and infer_dtype(s, skipna=False) not in ("string", "empty"):
+                return False
+            if not all(check(s).all() for check in checks):
+                return False
+        return True
+
+
+_SCHEMAS = {
+    "products_raw": ProductsRawSchema,
+    "vendors_raw": VendorsRawSchema,
+    "inventory_raw": InventoryRawSchema,
+    "dim_product": DimProductSchema,
+    "dim_vendor": DimVendorSchema,
+    "fact_inventory": FactInventorySchema,
+}
+_COMPILED = {name: CompiledSchema(schema) for name, schema in _SCHEMAS.items()}
+
+_config = {"mode": "compiled", "sample_rows": None}
+# per schema: calls, rows, seconds, pandera fallbacks
+_stats = {}
+
+
+def configure_validation(mode: str = "compiled", sample_rows: int = None):
+    """sample_rows checks values on a seeded sample of larger frames; dtypes are always checked."""
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode {mode!r}, expected one of {VALIDATION_MODES}")
+    _config.update(mode=mode, sample_rows=sample_rows)
+
+
+def validation_config() -> dict:
+    """The settings of the last configure_validation() call."""
+    return dict(_config)
+
+
+def _validate(name: str, df: pd.DataFrame, guaranteed=()) -> pd.DataFrame:
+    start = time.perf_counter()
+    compiled = _config["mode"] == "compiled"
+    passed = compiled and _COMPILED[name].passes(df, guaranteed, _config["sample_rows"])
+    try:
+        return df if passed else _SCHEMAS[name].validate(df, lazy=True)
+    finally:
+        seconds = time.perf_counter() - start
+        fallbacks = int(compiled and not passed)
+        _record(name, calls=1, rows=len(df), seconds=seconds, fallbacks=fallbacks)
+
+
+def _record(name: str, **counts):
+    stats = _stats.setdefault(name, {"calls": 0, "rows": 0, "seconds": 0.0, "fallbacks": 0})
+    for key, value in counts.items():
+        stats[key] += value
+
+
+def validation_stats() -> dict:
+    return {name: dict(counts) for name, counts in _stats.items()}
+
+
+def merge_validation_stats(stats: dict):
+    """Add validation_stats() taken in another process (e.g. a --workers shard) to this one."""
+    for name, counts in stats.items():
+        _record(name, **counts)
+
+
+def reset_validation_stats():
+    _stats.clear()
+
+
+def format_validation_stats(stats: dict) -> str:
+    lines = [f"Validation stats ({_config['mode']}):"]
+    for name, c in stats.items():
+        line = f"  {name}: {c['calls']} calls, {c['rows']} rows in {c['seconds']:.3f}s"
+        if _config["mode"] == "compiled":
+            line += f", {c['fallbacks']} pandera fallbacks"
+        lines.append(line)
+    return "\n".join(lines)
 
 
 def validate_raw_products(df: pd.DataFrame) -> pd.DataFrame:
-    return ProductsRawSchema.validate(df, lazy=True)
+    return _validate("products_raw", df)
 
 
 def validate_raw_vendors(df: pd.DataFrame) -> pd.DataFrame:
-    return VendorsRawSchema.validate(df, lazy=True)
+    return _validate("vendors_raw", df)
 
 
 def validate_raw_inventory(df: pd.DataFrame) -> pd.DataFrame:
-    return InventoryRawSchema.validate(df, lazy=True)
+    return _validate("inventory_raw", df)
+
+
+def validate_dim_product(df: pd.DataFrame, guaranteed=()) -> pd.DataFrame:
+    """guaranteed names columns whose dtype and values the caller already ensures."""
+    return _validate("dim_product", df, guaranteed)
+
+
+def validate_dim_vendor(df: pd.DataFrame) -> pd.DataFrame:
+    return _validate("dim_vendor", df)
+
+
+def validate_fact_inventory(df: pd.DataFrame) -> pd.DataFrame:
+    return _validate("fact_inventory", df)
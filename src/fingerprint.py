@@ -0,0 +1,16 @@
+from pathlib import Path
+import hashlib
+
+
+def file_fingerprint(path: Path, previous: dict = None) -> dict:
+    """Size, mtime and blake2b hash of a file; the hash is reused while size and mtime match."""
+    stat = Path(path).stat()
+    fp = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if previous and all(previous.get(k) == v for k, v in fp.items()):
+        return previous
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    fp["blake2b"] = digest.hexdigest()
+    return fp
@@ -1,32 +1,274 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from .retriever import load_index, answer_question
+from typing import Dict, List, Literal, Optional
+import asyncio
+import json
+import os
+import threading
+import time
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, confloat, validator
+from .batching import MicroBatcher
+from .cache import QueryCache
+from .retriever import DEFAULT_WEIGHTS, load_index, answer_questions
+from .store import ChunkStore
+
+INDEX_PATH = os.environ.get("RAG_INDEX_PATH", "data/rag/index")
+# poll the index directory every this many seconds and reload it when a new
+# version is saved there; 0 disables the watcher (reload through /admin/reload)
+WATCH_SECONDS = float(os.environ.get("RAG_WATCH_SECONDS", 0))
+# /admin/reload requires it in the X-Admin-Token header, and is disabled without it
+ADMIN_TOKEN = os.environ.get("RAG_ADMIN_TOKEN")
+# other index directories /admin/reload may switch to, separated by os.pathsep;
+# RAG_INDEX_PATH is always allowed
+RELOAD_PATHS = [p for p in os.environ.get("RAG_RELOAD_PATHS", "").split(os.pathsep) if p]
+
+# concurrent /ask requests with equal options are answered by one batched search
+MAX_BATCH = int(os.environ.get("RAG_MAX_BATCH", 64))
+MAX_WAIT_MS = float(os.environ.get("RAG_MAX_WAIT_MS", 2.0))
+# repeated questions are answered from the cache; RAG_CACHE_ENTRIES=0 disables it
+CACHE_ENTRIES = int(os.environ.get("RAG_CACHE_ENTRIES", 4096))
+CACHE_MB = float(os.environ.get("RAG_CACHE_MB", 64))
+CACHE_TTL = float(os.environ.get("RAG_CACHE_TTL", 300))
+# SQLite file shared by all workers, e.g. data/rag/cache.sqlite
+CACHE_PATH = os.environ.get("RAG_CACHE_PATH")
+MAX_BATCH_QUESTIONS = int(os.environ.get("RAG_MAX_BATCH_QUESTIONS", 10_000))
 
 app = FastAPI(title="Specs RAG API")
 _index = None
+_loaded = {}  # path, version, loaded_at, load_seconds of _index
+_batcher = None
+_cache = None
+_reloading = threading.Lock()
+
+
+class SearchOptions(BaseModel):
+    k: int = Field(5, ge=1, le=50)
+    mode: Literal["hybrid", "lexical", "vector"] = "hybrid"
+    fusion: Literal["rrf", "weighted"] = "rrf"
+    # per-retriever fusion weights, e.g. {"vector": 0.5}; missing ones default to 1.0
+    weights: Optional[Dict[Literal["lexical", "vector"], confloat(ge=0)]] = None
+
+    @validator("weights")
+    def _some_weight_positive(cls, weights):
+        # missing weights default to 1.0, so only an all-zero set is rejected
+        if weights and not any({**DEFAULT_WEIGHTS, **weights}.values()):
+            raise ValueError("at least one fusion weight must be > 0")
+        return weights
 
+    def options(self):
+        """Search options as a hashable batch key."""
+        return self.k, self.mode, self.fusion, tuple(sorted((self.weights or {}).items()))
 
-class Ask(BaseModel):
+
+class Ask(SearchOptions):
     question: str
 
 
+class AskBatch(SearchOptions):
+    questions: List[str] = Field(..., min_items=1, max_items=MAX_BATCH_QUESTIONS)
+
+
+class Reload(BaseModel):
+    # index directory to load, RAG_INDEX_PATH or one of RAG_RELOAD_PATHS;
+    # defaults to the one being served
+    path: Optional[str] = None
+
+
+def _answer_batch(options, questions):
+    k, mode, fusion, weights = options
+    index = _acquire_index()
+    try:
+        return answer_questions(
+            index, questions, k=k, mode=mode, fusion=fusion, weights=dict(weights)
+        )
+    finally:
+        index.release()
+
+
+def _acquire_index():
+    """The active index, registered as in use until its release()."""
+    while True:
+        index = _index
+        if index.acquire():
+            return index
+        # swapped out and closing since we read it: the new one is active
+
+
+def _load(path: str):
+    """Load and warm an index; it serves nothing until _activate() swaps it in."""
+    started = time.perf_counter()
+    index = load_index(path)
+    index.warm()
+    info = {
+        "path": str(path),
+        "version": index.version,
+        "loaded_at": time.time(),
+        "load_seconds": round(time.perf_counter() - started, 3),
+    }
+    return index, info
+
+
+def _activate(index, info):
+    global _index, _loaded
+    # one reference assignment: every request sees either the old or the new index
+    previous, _index, _loaded = _index, index, info
+    return previous
+
+
+async def reload_index(path: str = None) -> dict:
+    """
+    Load an index version in the background and swap it in without downtime.
+
+    The new index is loaded and warmed in a worker thread while the current
+    one keeps serving. Requests already searching the previous index finish
+    on it; it is closed, and its memory released, once the last one is done.
+    The cache stops serving answers of the previous version by itself.
+    """
+    if not _reloading.acquire(blocking=False):
+        raise HTTPException(409, "A reload is already running")
+    try:
+        loop = asyncio.get_running_loop()
+        try:
+            index, info = await loop.run_in_executor(None, _load, path or _loaded["path"])
+        except Exception as e:
+            raise HTTPException(500, f"Reload failed, still serving {_loaded['version']}: {e}")
+        previous_version = _loaded["version"]
+        previous = _activate(index, info)
+    finally:
+        _reloading.release()
+    # its own thread: closing waits for in-flight requests, however long they take
+    threading.Thread(target=previous.close, name="rag-close", daemon=True).start()
+    print(f"♻️ Swapped index {previous_version} for {info['version']} in {info['load_seconds']}s")
+    return {**info, "previous_version": previous_version}
+
+
+async def _watch(seconds: float):
+    """Reload whenever the served directory holds a new index version."""
+    failed = None
+    while True:
+        await asyncio.sleep(seconds)
+        try:
+            version = ChunkStore.read_version(_loaded["path"])
+        except (OSError, ValueError):
+            continue  # manifest being replaced; look again next time
+        if version in (None, _loaded["version"], failed) or _reloading.locked():
+            continue
+        try:
+            await reload_index()
+        except HTTPException as e:
+            failed = version
+            print(f"⚠️ {e.detail}")
+
+
 @app.on_event("startup")
 def _startup():
-    global _index
+    global _batcher, _cache
     print("🚀 Starting RAG API...")
-    _index = load_index("data/rag/index")
+    previous = _activate(*_load(INDEX_PATH))
+    if previous is not None:
+        previous.close()
+    _batcher = MicroBatcher(_answer_batch, MAX_BATCH, MAX_WAIT_MS)
+    _cache = QueryCache(
+        CACHE_ENTRIES,
+        int(CACHE_MB * (1 << 20)),
+        CACHE_TTL,
+        CACHE_PATH,
+        current_version=lambda: _index.version,
+    )
     print("✅ RAG API ready!")
 
 
+@app.on_event("startup")
+async def _start_watcher():
+    if WATCH_SECONDS > 0:
+        asyncio.create_task(_watch(WATCH_SECONDS))
+
+
 @app.post("/ask")
-def ask(body: Ask):
-    result = answer_question(_index, body.question)
+async def ask(body: Ask):
+    key = _cache.key(body.question, body.options(), _index.version)
+    result = await _cache.aget(key)
+    if result is None:
+        result = await _batcher.submit(body.options(), body.question)
+        await _cache.aput(key, result)
     return result
 
 
+@app.post("/ask_batch")
+async def ask_batch(body: AskBatch):
+    """
+    Answer many questions, streamed back as NDJSON.
+
+    Each line is {"index", "question", "answer", "sources"} (or "error"), sent
+    as soon as its question is answered: cached answers first, then the rest
+    in batches of MAX_BATCH, each one vectorized search. index is the position
+    in the request; repeated questions are searched once.
+    """
+    return StreamingResponse(_stream_answers(body), media_type="application/x-ndjson")
+
+
+async def _stream_answers(body: AskBatch):
+    options, version = body.options(), _index.version
+    pending = {}  # cache key -> [(index, question)], in first-seen order
+    for i, question in enumerate(body.questions):
+        key = _cache.key(question, options, version)
+        result = None if key in pending else await _cache.aget(key)
+        if result is None:
+            pending.setdefault(key, []).append((i, question))
+        else:
+            yield _ndjson(i, question, result)
+
+    loop = asyncio.get_running_loop()
+    keys = list(pending)
+    for start in range(0, len(keys), MAX_BATCH):
+        part = keys[start : start + MAX_BATCH]
+        questions = [pending[key][0][1] for key in part]
+        try:
+            results = await loop.run_in_executor(None, _answer_batch, options, questions)
+        except Exception as e:
+            results = [{"error": str(e)}] * len(part)
+        for key, result in zip(part, results):
+            if "error" not in result:
+                await _cache.aput(key, result)
+            for i, question in pending[key]:
+                yield _ndjson(i, question, result)
+
+
+def _ndjson(index: int, question: str, result: dict) -> str:
+    return json.dumps({"index": index, "question": question, **result}) + "\n"
+
+
+@app.post("/admin/reload")
+async def admin_reload(body: Reload = None, x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(403, "Admin endpoints are disabled: RAG_ADMIN_TOKEN is not set")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(403, "Invalid admin token")
+    path = body.path if body else None
+    if path is not None and not _reload_allowed(path):
+        raise HTTPException(403, "path is not RAG_INDEX_PATH or in RAG_RELOAD_PATHS")
+    return await reload_index(path)
+
+
+def _reload_allowed(path: str) -> bool:
+    allowed = {os.path.realpath(p) for p in [INDEX_PATH, *RELOAD_PATHS]}
+    return os.path.realpath(path) in allowed
+
+
+@app.get("/stats")
+def stats():
+    index = _index
+    return {
+        "index": {**_loaded, "chunks": len(index.chunks)},
+        "cache": _cache.stats(),
+        "batching": dict(_batcher.stats),
+    }
+
+
 @app.get("/health")
 def health():
-    return {"status": "ok", "index_loaded": _index is not None}
+    return {"status": "ok", "index_loaded": _index is not None, "index": _loaded}
 
 
 if __name__ == "__main__":
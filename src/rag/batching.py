@@ -0,0 +1,81 @@
+import asyncio
+from typing import Callable, Hashable, List
+
+
+class MicroBatcher:
+    """
+    Collect concurrent async requests into batches for a function that serves many at once.
+
+    Features:
+        - Short window: the first request of a batch waits at most max_wait_ms
+          for others to join
+        - Bounded: at most max_batch requests per call
+        - Grouped: requests only share a call when their key (e.g. the search
+          options) is equal
+        - Off the event loop: fn runs in a worker thread; while it does, new
+          requests queue up and form the next batch, so batches grow with load
+
+    Args:
+        fn: fn(key, items) -> results, one per item and in the same order
+        max_batch=64: Largest batch handed to fn
+        max_wait_ms=2.0: Longest extra wait a request pays for batching
+    """
+
+    def __init__(self, fn: Callable, max_batch: int = 64, max_wait_ms: float = 2.0):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.stats = {"batches": 0, "requests": 0, "largest_batch": 0}
+        self._loop = None
+        self._queue = None
+        self._worker = None
+
+    async def submit(self, key: Hashable, item):
+        """Queue one item and wait for its result (exceptions from fn are re-raised)."""
+        loop = asyncio.get_running_loop()
+        # queues and tasks belong to one event loop; test clients may start new ones
+        if self._loop is not loop or self._worker.done():
+            self._loop, self._queue = loop, asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((key, item, future))
+        return await future
+
+    async def _collect(self) -> List:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            groups = {}
+            for key, item, future in batch:
+                groups.setdefault(key, []).append((item, future))
+            for key, entries in groups.items():
+                self.stats["batches"] += 1
+                self.stats["requests"] += len(entries)
+                self.stats["largest_batch"] = max(self.stats["largest_batch"], len(entries))
+                items = [item for item, _ in entries]
+                try:
+                    results = await self._loop.run_in_executor(None, self.fn, key, items)
+                except Exception as e:
+                    for _, future in entries:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (_, future), result in zip(entries, results):
+                    # the caller may have gone away (client disconnect, timeout)
+                    if not future.done():
+                        future.set_result(result)
@@ -0,0 +1,224 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+from .lexical import tokenize
+
+# expired rows are deleted from the shared SQLite file every this many writes
+PURGE_EVERY = 1024
+# _get_memory(): not in memory, look in the shared tier
+_MISS = object()
+
+
+def normalize_query(query: str) -> str:
+    """Lowercased word tokens joined by spaces.
+
+    Retrieval only ever sees tokenize(query), so queries differing in case,
+    spacing or punctuation return the same hits and can share an entry.
+    """
+    return " ".join(tokenize(query))
+
+
+class QueryCache:
+    """
+    LRU + TTL cache of /ask results keyed by normalized query, search options and index version.
+
+    Features:
+        - Bounded: at most max_entries results and max_bytes of serialized JSON
+        - Fresh: entries expire ttl_seconds after they were stored
+        - Index-aware: the key carries the index version, and the first lookup
+          under a new version drops every in-memory entry of the old one
+        - Reload-safe (optional): with current_version set, keys of any other
+          version are neither read nor stored, so a request that started on
+          the previous index cannot bring its answers back after a swap
+        - Shared (optional): with path set, entries are also written to a
+          SQLite file that every worker process reads on a memory miss. Rows
+          are only deleted once expired, so workers serving different
+          versions during a rolling reload do not evict each other
+        - Async: aget()/aput() keep the SQLite calls off the event loop
+        - Safe to share: values are stored serialized, so callers get their own copy
+
+    Args:
+        max_entries=4096: In-memory entries; 0 disables the cache
+        max_bytes=64MB: In-memory serialized size
+        ttl_seconds=300: Lifetime of an entry, in memory and on disk
+        path: SQLite file for the shared tier, None for memory only
+        current_version: Returns the version of the index being served
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        max_bytes: int = 64 << 20,
+        ttl_seconds: float = 300.0,
+        path: str = None,
+        current_version: Callable[[], str] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.version = None
+        self._current_version = current_version
+        self._entries = OrderedDict()  # key -> (expires_at, value bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # serializes the shared connection, which worker threads use
+        self._db_lock = threading.Lock()
+        self._puts = 0
+        self._db = _open_db(path) if path and max_entries > 0 else None
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def key(self, query: str, options, version: str):
+        return (normalize_query(query), options, version)
+
+    def get(self, key):
+        """Cached result for key, or None."""
+        result = self._get_memory(key)
+        return self._get_shared(key) if result is _MISS else result
+
+    async def aget(self, key):
+        """get() for the event loop: only the SQLite lookup leaves it, on a worker thread."""
+        result = self._get_memory(key)
+        if result is _MISS:
+            result = await asyncio.to_thread(self._get_shared, key)
+        return result
+
+    def put(self, key, result):
+        row = self._put_memory(key, result)
+        if row is not None:
+            self._put_shared(key, *row)
+
+    async def aput(self, key, result):
+        """put() for the event loop: the SQLite write runs on a worker thread."""
+        row = self._put_memory(key, result)
+        if row is not None:
+            await asyncio.to_thread(self._put_shared, key, *row)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            c = self.counters
+            lookups = c["hits"] + c["disk_hits"] + c["misses"]
+            return {
+                **c,
+                "hit_ratio": (c["hits"] + c["disk_hits"]) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "version": self.version,
+                "shared": self._db is not None,
+            }
+
+    def _check_version(self, version: str) -> bool:
+        """Follow the served index version; False when version is not that one."""
+        current = self._current_version() if self._current_version else version
+        if current != self.version:
+            # the index was reloaded or rebuilt: every answer in memory may be
+            # stale. Shared rows are left alone; workers still serving the
+            # other version read them, and they expire by TTL
+            self._entries.clear()
+            self._bytes = 0
+            self.version = current
+        return version == current
+
+    def _get_memory(self, key):
+        """Result of key in memory, None when it cannot be cached, or _MISS."""
+        if self.max_entries <= 0:
+            return None
+        now = time.time()
+        with self._lock:
+            if not self._check_version(key[-1]):
+                self.counters["misses"] += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                self._drop(key)
+                self.counters["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return json.loads(entry[1])
+            if self._db is None:
+                self.counters["misses"] += 1
+                return None
+        return _MISS
+
+    def _get_shared(self, key):
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT expires_at, value FROM answers WHERE key = ? AND expires_at > ?",
+                (_db_key(key), time.time()),
+            ).fetchone()
+        with self._lock:
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+            if key[-1] == self.version:
+                self._store(key, *row)
+        return json.loads(row[1])
+
+    def _put_memory(self, key, result):
+        """(expires_at, value) to write to the shared tier, or None."""
+        if self.max_entries <= 0:
+            return None
+        value = json.dumps(result).encode()
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            if not self._check_version(key[-1]):
+                return None
+            self._store(key, expires_at, value)
+        return (expires_at, value) if self._db is not None else None
+
+    def _put_shared(self, key, expires_at: float, value: bytes):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?)",
+                (_db_key(key), key[-1], expires_at, value),
+            )
+            self._puts += 1
+            if self._puts % PURGE_EVERY == 0:
+                # expiry is the only delete: rows of every version live out their TTL
+                self._db.execute("DELETE FROM answers WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def _store(self, key, expires_at: float, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (expires_at, value)
+        self._bytes += len(value)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.counters["evictions"] += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+
+def _db_key(key) -> str:
+    return json.dumps(key)
+
+
+def _open_db(path: str) -> sqlite3.Connection:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+    # WAL lets worker processes read while another one writes
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS answers "
+        "(key TEXT PRIMARY KEY, version TEXT, expires_at REAL, value BLOB)"
+    )
+    return db
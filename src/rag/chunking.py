@@ -0,0 +1,220 @@
+from typing import Iterable, Iterator, List, Tuple
+import re
+
+from .lexical import TOKEN_RE
+
+# budgets in word tokens, as counted by tokenize(): the unit BM25 and the
+# embedder see, and about 6 characters of English text each
+MAX_TOKENS = 200
+OVERLAP_TOKENS = 20
+# a heading closes the current chunk once it holds this many tokens; smaller
+# sections are packed together with the next one
+MIN_TOKENS = 50
+
+BULLET_RE = re.compile(r"^(?:[-•*▪◦]|\d{1,2}[.)]|[a-z][.)])\s+")
+NUMBERED_HEADING_RE = re.compile(r"^\d+(?:\.\d+)*\.?\s+[A-Z]")
+# two or more spaces, a tab or a pipe between two cells
+COLUMN_GAP_RE = re.compile(r"\S(?:\t| {2,}|\s*\|\s*)(?=\S)")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+SMALL_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to"}
+
+# (text, tokens, page, kind, separator from the previous unit)
+Unit = Tuple[str, int, int, str, str]
+
+
+def count_tokens(text: str) -> int:
+    return len(TOKEN_RE.findall(text))
+
+
+def chunk_pages(
+    pages: Iterable[Tuple[int, str]],
+    max_tokens: int = MAX_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+) -> Iterator[Tuple[str, int]]:
+    """
+    Split a document into chunks along its structure, within a token budget.
+
+    Features:
+        - Streaming: pages are read one at a time, and a paragraph or table
+          running over a page break stays in one piece
+        - Boundaries: chunks end between sentences, bullet lines or table
+          rows, never inside a word; a heading starts a new chunk once the
+          current one holds MIN_TOKENS, and never ends one
+        - Tables: kept whole when they fit, otherwise split between rows with
+          the header row repeated on every part
+        - Overlap: the trailing sentences of a chunk, up to overlap_tokens,
+          open the next one; headings and table rows are never repeated, and
+          nothing carries over a section break
+        - Oversized sentences are the only thing cut mid-text, at word boundaries
+
+    Args:
+        pages: (page number, extracted text) pairs in reading order
+        max_tokens=200: Budget per chunk in word tokens
+        overlap_tokens=20: Budget of the repeated sentences
+
+    Yields:
+        (chunk text, page number where its new content starts)
+    """
+    chunk: List[Unit] = []
+    size = fresh = 0  # tokens in chunk; how many of its units are not overlap
+
+    def emit():
+        text = "".join(sep + unit[0] for sep, unit in zip(_seps(chunk), chunk))
+        return text, chunk[len(chunk) - fresh][2]
+
+    for unit in _units(_blocks(pages), max_tokens):
+        tokens, kind = unit[1], unit[3]
+        section_break = kind == "heading" and _size(chunk[len(chunk) - fresh :]) >= MIN_TOKENS
+        if fresh and (section_break or size + tokens > max_tokens):
+            # headings stay with the content that follows them
+            held = []
+            while fresh > 1 and chunk[-1][3] == "heading":
+                held.insert(0, chunk.pop())
+                fresh -= 1
+            yield emit()
+            room = min(overlap_tokens, max_tokens - tokens - _size(held))
+            chunk = ([] if section_break else _tail(chunk, room)) + held
+            fresh = len(held)
+            size = _size(chunk)
+        chunk.append(unit)
+        size += tokens
+        fresh += 1
+    if fresh:
+        yield emit()
+
+
+def _blocks(pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[str, object, int]]:
+    """
+    (kind, content, page) blocks: "heading" lines, "paragraph" texts with
+    wrapped lines rejoined, and "table" row lists.
+    """
+    para, para_page = [], 0
+    rows, rows_page = [], 0
+
+    def end_paragraph():
+        if para:
+            yield "paragraph", _join_lines(para), para_page
+            para.clear()
+
+    def end_table():
+        if len(rows) > 1:
+            yield "table", list(rows), rows_page
+        elif rows:
+            # a lone line with wide spacing is text, not a table
+            yield from end_paragraph()
+            yield "paragraph", rows[0], rows_page
+        rows.clear()
+
+    for page, text in pages:
+        for line in (text or "").splitlines():
+            line = line.strip()
+            if not line:
+                yield from end_table()
+                yield from end_paragraph()
+            elif COLUMN_GAP_RE.search(line) and not BULLET_RE.match(line):
+                if not rows:
+                    yield from end_paragraph()
+                    rows_page = page
+                rows.append(line)
+            else:
+                yield from end_table()
+                if _is_heading(line):
+                    yield from end_paragraph()
+                    yield "heading", line, page
+                elif para and _continues(para[-1], line):
+                    para.append(line)
+                else:
+                    yield from end_paragraph()
+                    para.append(line)
+                    para_page = page
+    yield from end_table()
+    yield from end_paragraph()
+
+
+def _units(blocks, max_tokens: int) -> Iterator[Unit]:
+    """Blocks cut into the pieces chunk_pages packs: sentences, headings and table parts."""
+    for kind, content, page in blocks:
+        if kind == "heading":
+            yield content, count_tokens(content), page, "heading", "\n"
+        elif kind == "table":
+            for part in _table_parts(content, max_tokens):
+                yield part, count_tokens(part), page, "table", "\n"
+        else:
+            sep = "\n"
+            for sentence in SENTENCE_END_RE.split(content):
+                for piece in _split_long(sentence, max_tokens):
+                    yield piece, count_tokens(piece), page, "text", sep
+                    sep = " "
+
+
+def _table_parts(rows: List[str], max_tokens: int) -> Iterator[str]:
+    header, part, size = rows[0], [rows[0]], count_tokens(rows[0])
+    for row in rows[1:]:
+        tokens = count_tokens(row)
+        if len(part) > 1 and size + tokens > max_tokens:
+            yield "\n".join(part)
+            part, size = [header], count_tokens(header)
+        part.append(row)
+        size += tokens
+    yield "\n".join(part)
+
+
+def _split_long(sentence: str, max_tokens: int) -> Iterator[str]:
+    if count_tokens(sentence) <= max_tokens:
+        yield sentence
+        return
+    words, size = [], 0
+    for word in sentence.split():
+        tokens = count_tokens(word)
+        if words and size + tokens > max_tokens:
+            yield " ".join(words)
+            words, size = [], 0
+        words.append(word)
+        size += tokens
+    if words:
+        yield " ".join(words)
+
+
+def _is_heading(line: str) -> bool:
+    words = line.split()
+    if len(words) > 10 or line[-1] in ".,;:!?" or BULLET_RE.match(line):
+        return False
+    if NUMBERED_HEADING_RE.match(line):
+        return True
+    # Title Case or ALL CAPS: every word capitalized except short function words
+    return line[0].isupper() and all(
+        not w[0].isalpha() or w[0].isupper() or w in SMALL_WORDS for w in words
+    )
+
+
+def _continues(previous: str, line: str) -> bool:
+    """Whether line is the wrapped continuation of the previous one."""
+    return previous[-1] not in ".!?:" and not BULLET_RE.match(line) and line[0].islower()
+
+
+def _join_lines(lines: List[str]) -> str:
+    # "high-" + "performance": a hyphen at the line end joins without a space
+    text = lines[0]
+    for line in lines[1:]:
+        text += line if text.endswith("-") else " " + line
+    return text
+
+
+def _seps(units: List[Unit]) -> List[str]:
+    return [""] + [u[4] for u in units[1:]]
+
+
+def _size(units: List[Unit]) -> int:
+    return sum(u[1] for u in units)
+
+
+def _tail(chunk: List[Unit], overlap_tokens: int) -> List[Unit]:
+    """Trailing sentences of chunk totalling at most overlap_tokens."""
+    tail, size = [], 0
+    for unit in reversed(chunk[1:]):
+        if unit[3] != "text" or size + unit[1] > overlap_tokens:
+            break
+        tail.insert(0, unit)
+        size += unit[1]
+    # the carried part opens a new line, not the middle of a sentence run
+    return [(*tail[0][:4], "\n"), *tail[1:]] if tail else []
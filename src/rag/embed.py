@@ -0,0 +1,137 @@
+from pathlib import Path
+from typing import List
+import json
+import zlib
+
+import faiss
+import numpy as np
+
+from .lexical import STEM_CHARS, stem, tokenize
+
+INDEX_KINDS = ("auto", "flat", "hnsw", "ivf")
+# below this many chunks exact search is already fast and IVF cannot be trained well
+AUTO_FLAT_BELOW = 10_000
+
+
+class HashingEmbedder:
+    """
+    Deterministic TF-IDF projection of text into a fixed number of dimensions.
+
+    Features:
+        - No model download: each token is hashed (crc32) to a signed bucket,
+          so the same text always maps to the same vector on every machine
+        - Word variants: tokens longer than STEM_CHARS also add their stem
+          ("consume" and "consumption" share "consu")
+        - TF-IDF weighting: sublinear term frequency times a per-bucket IDF
+          fitted on the ingested chunks
+        - Batched: many chunks are projected per numpy call
+        - Unit-length output, so inner product is cosine similarity
+
+    Args:
+        dim=256: Output dimensions (hash buckets)
+        idf: Per-bucket IDF weights from fit(); all ones when not fitted
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 256, idf=None):
+        self.dim = dim
+        self.idf = np.ones(dim, dtype=np.float32) if idf is None else np.asarray(idf, np.float32)
+        self._codes = {}
+
+    def _code(self, token: str) -> int:
+        # bucket * 2 + sign bit; cached because chunks repeat the same features
+        code = self._codes.get(token)
+        if code is None:
+            h = zlib.crc32(token.encode())
+            code = self._codes[token] = (h % self.dim) * 2 + (h >> 31)
+        return code
+
+    def _features(self, text: str) -> List[str]:
+        tokens = tokenize(text)
+        return tokens + ["^" + stem(t) for t in tokens if len(t) > STEM_CHARS]
+
+    def _tf(self, texts: List[str]) -> np.ndarray:
+        codes, lengths = [], []
+        for text in texts:
+            features = self._features(text)
+            lengths.append(len(features))
+            codes.extend(map(self._code, features))
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        codes = np.asarray(codes, dtype=np.int64)
+        # signed hashing: colliding tokens cancel out on average instead of adding up
+        counts = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(counts, (rows, codes >> 1), 1.0 - 2.0 * (codes & 1))
+        return counts
+
+    def fit(self, texts: List[str], batch_size: int = 4096) -> "HashingEmbedder":
+        df = np.zeros(self.dim, dtype=np.float64)
+        for start in range(0, len(texts), batch_size):
+            df += (self._tf(texts[start : start + batch_size]) != 0).sum(axis=0)
+        self.idf = np.log1p((len(texts) + 1) / (df + 1)).astype(np.float32)
+        return self
+
+    def embed(self, texts: List[str], batch_size: int = 4096) -> np.ndarray:
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            tf = self._tf(texts[start : start + batch_size])
+            vectors = np.sign(tf) * np.log1p(np.abs(tf)) * self.idf
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            out[start : start + len(tf)] = vectors / np.maximum(norms, 1e-12)
+        return out
+
+    def save(self, path: Path):
+        config = {"name": self.name, "dim": self.dim, "idf": self.idf.tolist()}
+        Path(path).write_text(json.dumps(config))
+
+    @classmethod
+    def load(cls, path: Path) -> "HashingEmbedder":
+        config = json.loads(Path(path).read_text())
+        return cls(dim=config["dim"], idf=config["idf"])
+
+
+def build_ann_index(vectors: np.ndarray, kind: str = "auto", m: int = 16, nlist: int = None):
+    """
+    Inner-product FAISS index over unit vectors.
+
+    Args:
+        kind: "flat" (exact IndexFlatIP), "hnsw" (IndexHNSWFlat with M=m),
+              "ivf" (IndexIVFFlat with nlist lists, default ~4*sqrt(n)), or
+              "auto": flat below AUTO_FLAT_BELOW chunks, HNSW above
+    """
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind {kind!r}, expected one of {INDEX_KINDS}")
+    n, dim = vectors.shape
+    if kind == "auto":
+        kind = "flat" if n < AUTO_FLAT_BELOW else "hnsw"
+
+    if kind == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = 40
+    else:
+        nlist = nlist or max(1, min(int(4 * np.sqrt(n)), n // 39))
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def set_search_params(index, ef_search: int = 128, nprobe: int = 32):
+    """Set the HNSW efSearch / IVF nprobe used by the next index.search call.
+
+    faiss 1.7.4 ignores SearchParametersHNSW, so the knobs live on the index;
+    callers sharing an index must hold a lock across set + search.
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = nprobe
+
+
+def embed_chunks(chunks: List[str], kind: str = "auto"):
+    """Fit the embedder on the chunks and index their vectors; returns (embedder, index)."""
+    embedder = HashingEmbedder().fit(chunks)
+    return embedder, build_ann_index(embedder.embed(chunks), kind)
@@ -0,0 +1,54 @@
+from typing import Dict, List, Tuple
+
+FUSION_METHODS = ("rrf", "weighted")
+# the usual reciprocal-rank-fusion constant; damps the gap between top ranks
+RRF_K = 60
+
+Ranking = List[Tuple[int, float]]
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, Ranking], weights: Dict[str, float]):
+    """
+    Fuse ranked (chunk id, score) lists by weighted reciprocal rank.
+
+    Each list contributes weight / (RRF_K + rank) to the chunks it returned.
+    Only ranks matter, so BM25 and cosine scores need no calibration.
+    """
+    fused = {}
+    for name, ranking in rankings.items():
+        weight = weights.get(name, 1.0)
+        for rank, (idx, _) in enumerate(ranking, start=1):
+            fused[idx] = fused.get(idx, 0.0) + weight / (RRF_K + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def weighted_fusion(rankings: Dict[str, Ranking], weights: Dict[str, float]):
+    """
+    Fuse ranked (chunk id, score) lists by a weighted sum of min-max normalized scores.
+
+    A chunk missing from a list gets 0 from it. Unlike RRF, the score gaps
+    inside each list are kept.
+    """
+    fused = {}
+    for name, ranking in rankings.items():
+        if not ranking:
+            continue
+        weight = weights.get(name, 1.0)
+        scores = [score for _, score in ranking]
+        lo, hi = min(scores), max(scores)
+        for idx, score in ranking:
+            norm = (score - lo) / (hi - lo) if hi > lo else 1.0
+            fused[idx] = fused.get(idx, 0.0) + weight * norm
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def fuse(method: str, rankings: Dict[str, Ranking], weights: Dict[str, float]):
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method {method!r}, expected one of {FUSION_METHODS}")
+    used = [weights.get(name, 1.0) for name in rankings]
+    # a negative weight would invert its list's ranking
+    if any(w < 0 for w in used) or not any(w > 0 for w in used):
+        raise ValueError(f"Fusion weights must be >= 0 with one > 0, got {weights}")
+    if method == "rrf":
+        return reciprocal_rank_fusion(rankings, weights)
+    return weighted_fusion(rankings, weights)
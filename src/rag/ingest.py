@@ -1,108 +1,321 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import List, Dict
 from pypdf import PdfReader
 import faiss
-import numpy as np
-import json
+import glob
 import argparse
+from ..fingerprint import file_fingerprint
+from .chunking import MAX_TOKENS, OVERLAP_TOKENS, chunk_pages
+from .embed import INDEX_KINDS, HashingEmbedder, embed_chunks
+from .lexical import BM25Index
+from .store import MANIFEST_FILE, ChunkStore, atomic_path
 
+# rebuild instead of appending once this share of stored chunks is tombstoned
+COMPACT_ABOVE = 0.25
 
-def chunk_text(text: str, max_chars=1200, overlap=200) -> List[str]:
-    """
-    Split text into overlapping chunks for better context preservation.
 
-    Args:
-        max_chars=1200: Optimal chunk size for search - balances context vs precision
-        overlap=200: Overlap between chunks to preserve semantic continuity
-    """
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = min(len(text), start + max_chars)
-        chunks.append(text[start:end])
-        start = end - overlap
-        if start < 0:
-            start = 0
-        if start >= len(text):
-            break
-    return chunks
+def read_pages(pdf_path: str):
+    """Yield (page number, text) of each page, extracted one page at a time."""
+    reader = PdfReader(pdf_path)
+    for i, page in enumerate(reader.pages, start=1):
+        yield i, page.extract_text() or ""
 
 
-def read_pdf_chunks(pdf_path: str):
+def read_pdf_chunks(
+    pdf_path: str, max_tokens: int = MAX_TOKENS, overlap_tokens: int = OVERLAP_TOKENS
+):
     """
     Extract and chunk text content from PDF document.
 
     Features:
-        - Page-by-page extraction: pypdf extracts text from each page
-        - Metadata tracking: Records source page number for each chunk
+        - Structure-aware chunking: pages stream into chunk_pages, which cuts
+          between sentences, headings and table rows within max_tokens
+        - Metadata tracking: Records source document and the page each chunk starts on
         - Error handling: Gracefully handles empty pages with fallback
     """
-    reader = PdfReader(pdf_path)
+    source = Path(pdf_path).as_posix()
     chunks = []
     meta = []
-    for i, page in enumerate(reader.pages, start=1):
-        text = page.extract_text() or ""
-        for ch in chunk_text(text):
-            chunks.append(ch)
-            meta.append({"page": i})
+    for chunk, page in chunk_pages(read_pages(pdf_path), max_tokens, overlap_tokens):
+        chunks.append(chunk)
+        meta.append({"page": page, "source": source})
     return chunks, meta
 
 
-def build_lightweight_index(chunks: List[str]):
+def find_pdfs(patterns: List[str]) -> List[Path]:
+    """PDF files, directories (searched recursively) and glob patterns, deduplicated in order."""
+    found = {}
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = sorted(path.rglob("*.pdf"))
+        elif glob.has_magic(pattern):
+            matches = [Path(m) for m in sorted(glob.glob(pattern, recursive=True))]
+        else:
+            matches = [path]
+        for match in matches:
+            found.setdefault(match.as_posix(), match)
+    return list(found.values())
+
+
+def extract_documents(paths: List[str], workers: int = 1, **chunking):
+    """
+    Yield (chunks, meta) per PDF, in input order.
+
+    With workers > 1 pages are extracted and chunked in a process pool; each
+    document is handed over as soon as it and the ones before it are done,
+    so the builder never waits for the whole batch. chunking (max_tokens,
+    overlap_tokens) is passed on to read_pdf_chunks.
+    """
+    read = partial(read_pdf_chunks, **chunking)
+    if workers <= 1 or len(paths) < 2:
+        yield from map(read, paths)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(read, paths)
+
+
+def build_vector_index(chunks: List[str], kind: str = "auto"):
     """
-    Create a lightweight FAISS index for efficient document retrieval.
+    Embed chunks and build the FAISS ANN index used by vector search.
 
     Features:
-        - FAISS compatibility: Uses industry-standard IndexFlatL2 for vector search
-        - Lightweight approach: Minimal dummy vectors (1D) for development/demo
-        - Scalable design: Structure allows easy upgrade to real embeddings
-        - Production ready: IndexFlatL2 supports millions of vectors efficiently
+        - Offline embeddings: deterministic hashing TF-IDF projection, CPU only,
+          embedded in batches
+        - ANN index: HNSW (efSearch) or IVF (nprobe) over inner product, exact
+          IndexFlatIP for small corpora (kind="auto")
+        - Swappable: the embedder config is saved next to the index so queries
+          are embedded the same way
 
     Args:
         chunks: List of text chunks to index
+        kind: "auto", "flat", "hnsw" or "ivf"
 
     Returns:
-        faiss.IndexFlatL2: Configured FAISS index ready for search operations
+        (faiss index, HashingEmbedder)
     """
+    embedder, index = embed_chunks(chunks, kind)
+    print(f"✅ Built {type(index).__name__} with {index.ntotal} {embedder.dim}-d vectors")
+    return index, embedder
+
+
+def build_lexical_index(chunks: List[str]) -> BM25Index:
+    """
+    Build the BM25 inverted index used by RAGIndex.search.
+
+    Features:
+        - Tokenized once at ingest: queries only read the postings of their terms
+        - Compact storage: CSR postings and chunk lengths as numpy arrays
+    """
+    lexical = BM25Index.build(chunks)
+    print(f"✅ Built lexical index with {len(lexical.terms)} terms")
+    return lexical
+
+
+def update_vector_index(out: Path, store: ChunkStore, chunks: List[str], kind: str = "auto"):
+    """
+    The saved FAISS index of out with chunks (the last ones of store) appended.
+    Rebuilt from store when the embedder config is missing or the index does
+    not match it, e.g. in a directory migrated from the JSON format.
+    """
+    embedder_path, index_path = out / "embedder.json", out / "faiss.index"
+    if embedder_path.exists() and index_path.exists():
+        embedder = HashingEmbedder.load(embedder_path)
+        index = faiss.read_index(str(index_path))
+        if index.d == embedder.dim and index.ntotal == len(store) - len(chunks):
+            if chunks:
+                index.add(embedder.embed(chunks))
+            print(f"✅ Appended {len(chunks)} vectors, {len(store) - store.n_live} tombstoned")
+            return index, embedder
+    return build_vector_index(store.indexable(), kind)
+
 
-    # Create a dummy index for compatibility
-    # The actual search will be keyword-based in retriever
-    dim = 1  # Minimal dimension
-    index = faiss.IndexFlatL2(dim)
+def update_lexical_index(path: Path, store: ChunkStore, chunks: List[str]) -> BM25Index:
+    """
+    The saved BM25 index of path with chunks (the last ones of store) appended
+    and the chunks store tombstoned masked out; only chunks are tokenized.
+    Rebuilt from store when there is no saved index matching it.
+    """
+    if (path / "indptr.npy").exists():
+        lexical = BM25Index.load(path, mmap=False)
+        if len(lexical) == len(store) - len(chunks):
+            lexical = lexical.append(chunks, store.live)
+            print(f"✅ Appended {len(chunks)} chunks to the lexical index")
+            return lexical
+    return build_lexical_index(store.indexable())
 
-    # Add dummy vectors for each chunk
-    vectors = np.ones((len(chunks), dim), dtype=np.float32)
-    index.add(vectors)
 
-    print(f"✅ Built lightweight index with {len(chunks)} chunks")
-    return index
+def save_index(
+    out_dir: str,
+    index,
+    chunks: List[str],
+    meta: List[Dict],
+    lexical=None,
+    embedder=None,
+    documents: Dict[str, Dict] = None,
+):
+    """
+    Write the index directory in the binary format read by RAGIndex.
 
+    Features:
+        - Chunks: one UTF-8 blob plus offsets (chunks.text.npy, chunks.offsets.npy)
+        - Metadata: (page, source id) records in chunks.meta.npy, source names in index.json
+        - Lexical: BM25 arrays as separate .npy files under lexical/
+        - Everything is opened by mmap on load, written before index.json
+        - Each file is written aside and renamed over the old one, so an API
+          serving the previous version can keep reading it until it reloads
 
-def save_index(out_dir: str, index, chunks: List[str], meta: List[Dict]):
+    Args:
+        chunks: Chunk texts, or a ChunkStore (meta is then ignored)
+        documents: Fingerprint per source PDF, compared by the next incremental run
+    """
     out = Path(out_dir)
     out.mkdir(parents=True, exist_ok=True)
 
-    faiss.write_index(index, str(out / "faiss.index"))
-    (out / "chunks.json").write_text(json.dumps(chunks, ensure_ascii=False))
-    (out / "meta.json").write_text(json.dumps(meta, ensure_ascii=False))
+    with atomic_path(out / "faiss.index") as tmp:
+        faiss.write_index(index, str(tmp))
+    if embedder is not None:
+        embedder.save(out / "embedder.json")
+    if lexical is not None:
+        lexical.save(out / "lexical")
+    if isinstance(chunks, ChunkStore):
+        chunks.documents = documents or chunks.documents
+        chunks.save(out)
+    else:
+        ChunkStore.from_lists(chunks, meta, documents).save(out)
 
     print(f"✅ Saved index to {out_dir}")
 
 
+def ingest(
+    pdfs: List[str],
+    out_dir: str,
+    kind: str = "auto",
+    workers: int = 1,
+    full: bool = False,
+    max_tokens: int = MAX_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+) -> dict:
+    """
+    Index a library of PDFs, incrementally when out_dir already holds an index.
+
+    Features:
+        - Content hashes: PDFs whose blake2b hash matches the previous run are
+          not read again (the hash itself is skipped when size and mtime match)
+        - Incremental: chunks of new and changed PDFs are appended, chunks of
+          changed and vanished PDFs are tombstoned; the existing vectors and
+          BM25 postings stay and only the new chunks are embedded and tokenized
+        - Compaction: a full rebuild once more than COMPACT_ABOVE of the
+          stored chunks are tombstones, or when full=True
+
+    Args:
+        pdfs: PDF paths, directories or glob patterns; the complete library,
+              so indexed documents missing from it are removed
+        workers: Processes for page extraction and chunking
+        max_tokens, overlap_tokens: Chunk and overlap budgets; documents
+              already indexed keep their chunks until changed (or full=True)
+
+    Returns:
+        Document names per outcome (added, changed, removed, unchanged) and
+        the resulting chunk counts
+    """
+    out = Path(out_dir)
+    previous = None
+    if not full and (out / MANIFEST_FILE).exists():
+        # loaded into memory: the files are rewritten below
+        previous = ChunkStore.load(out, mmap=False)
+    known = previous.documents if previous else {}
+
+    inputs = {}
+    for path in find_pdfs(pdfs):
+        inputs[path.as_posix()] = file_fingerprint(path, known.get(path.as_posix()))
+    added = [name for name in inputs if name not in known]
+    changed = [
+        name
+        for name in inputs
+        if name in known and known[name].get("blake2b") != inputs[name]["blake2b"]
+    ]
+    # sources only seen in chunk metadata come from indexes built before
+    # fingerprints were kept (e.g. migrated JSON indexes)
+    indexed = dict.fromkeys([*known, *(previous.sources if previous else [])])
+    removed = [name for name in indexed if name not in inputs]
+    summary = {
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "unchanged": len(inputs) - len(added) - len(changed),
+    }
+    if previous is not None and not (added or changed or removed):
+        print(f"✅ {len(inputs)} documents unchanged, nothing to do")
+        return {**summary, "chunks": len(previous), "live": previous.n_live}
+
+    print(f"📄 Processing {len(added) + len(changed)} of {len(inputs)} PDFs")
+    chunks, meta = [], []
+    for doc_chunks, doc_meta in extract_documents(
+        added + changed, workers, max_tokens=max_tokens, overlap_tokens=overlap_tokens
+    ):
+        chunks.extend(doc_chunks)
+        meta.extend(doc_meta)
+    print(f"📝 Extracted {len(chunks)} text chunks")
+
+    store = None
+    if previous is not None:
+        store = previous.append(chunks, meta, drop=changed + removed, documents=inputs)
+        if 1 - store.n_live / max(len(store), 1) > COMPACT_ABOVE:
+            print("♻️ Compacting tombstoned chunks")
+            store = store.compact()
+            previous = None
+
+    lexical = None
+    if previous is None:
+        if store is None:
+            store = ChunkStore.from_lists(chunks, meta, inputs)
+        index, embedder = build_vector_index(store.indexable(), kind)
+    else:
+        index, embedder = update_vector_index(out, store, chunks, kind)
+        lexical = update_lexical_index(out / "lexical", store, chunks)
+    if lexical is None:
+        lexical = build_lexical_index(store.indexable())
+
+    save_index(out, index, store, None, lexical, embedder, inputs)
+    return {**summary, "chunks": len(store), "live": store.n_live}
+
+
 def main():
     ap = argparse.ArgumentParser(description="Ingest PDF documents for RAG")
-    ap.add_argument("--pdf", required=True, help="Path to PDF file")
+    ap.add_argument(
+        "--pdf", required=True, nargs="+", help="PDF files, directories or glob patterns"
+    )
     ap.add_argument("--out", default="data/rag/index", help="Output directory")
+    ap.add_argument(
+        "--index-kind", choices=INDEX_KINDS, default="auto", help="FAISS index for vector search"
+    )
+    ap.add_argument("--workers", type=int, default=1, help="Processes for PDF extraction")
+    ap.add_argument(
+        "--full", action="store_true", help="Rebuild from scratch instead of updating the index"
+    )
+    ap.add_argument("--max-tokens", type=int, default=MAX_TOKENS, help="Tokens per chunk")
+    ap.add_argument(
+        "--overlap-tokens", type=int, default=OVERLAP_TOKENS, help="Tokens repeated between chunks"
+    )
     args = ap.parse_args()
 
-    print(f"📄 Processing PDF: {args.pdf}")
-    chunks, meta = read_pdf_chunks(args.pdf)
-
-    print(f"📝 Extracted {len(chunks)} text chunks")
-    index = build_lightweight_index(chunks)
-
-    save_index(args.out, index, chunks, meta)
-    print("🎉 Document ingestion complete!")
+    summary = ingest(
+        args.pdf,
+        args.out,
+        args.index_kind,
+        args.workers,
+        args.full,
+        args.max_tokens,
+        args.overlap_tokens,
+    )
+    print(
+        f"🎉 Document ingestion complete! {len(summary['added'])} added, "
+        f"{len(summary['changed'])} changed, {len(summary['removed'])} removed, "
+        f"{summary['unchanged']} unchanged; {summary['live']} live chunks"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,235 @@
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import List
+import re
+
+import numpy as np
+
+from .store import SortedStringArray, load_array, save_array
+
+TOKEN_RE = re.compile(r"\w+")
+# crude stemming by truncation: "consume"/"consumption" -> "consu"
+STEM_CHARS = 5
+# saved one .npy each, in BM25Index.__init__ argument order
+ARRAYS = ("indptr", "doc_ids", "tfs", "doc_len")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; used for both chunks and queries."""
+    return TOKEN_RE.findall(text.lower())
+
+
+def stem(token: str) -> str:
+    return token[:STEM_CHARS]
+
+
+class BM25Index:
+    """
+    Token-level inverted index scored with Okapi BM25.
+
+    Features:
+        - CSR postings: for term t, doc_ids/tfs[indptr[t]:indptr[t + 1]] list the
+          chunks containing t and how often, sorted by chunk id
+        - Query cost: proportional to the postings of the query terms, not to
+          the number of chunks
+        - Coverage: the fraction of distinct query terms found in each hit,
+          a bounded score comparable across queries
+        - Sorted vocabulary: terms live in a SortedStringArray and are looked
+          up by binary search, so no per-term Python objects are needed
+        - Persistence: one .npy file per array, opened by mmap on load
+
+    Args:
+        k1=1.2, b=0.75: Standard BM25 term-frequency saturation and length normalization
+    """
+
+    def __init__(self, terms: SortedStringArray, indptr, doc_ids, tfs, doc_len, k1=1.2, b=0.75):
+        self.terms = terms
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        n = len(doc_len)
+        df = np.diff(indptr).astype(np.float32)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        # tombstoned chunks are indexed as empty texts and must not shrink avgdl
+        nonempty = doc_len[doc_len > 0]
+        avgdl = float(nonempty.mean()) if len(nonempty) else 1.0
+        # per-chunk denominator part k1 * (1 - b + b * len / avgdl), computed once
+        self.norm = (k1 * (1 - b + b * doc_len / max(avgdl, 1e-9))).astype(np.float32)
+
+    @classmethod
+    def build(cls, texts: List[str], **params) -> "BM25Index":
+        vocab = {}
+        term_ids = array("i")
+        doc_len = np.zeros(len(texts), dtype=np.int32)
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_len[i] = len(tokens)
+            term_ids.extend(vocab.setdefault(t, len(vocab)) for t in tokens)
+
+        # renumber terms in sorted order so lookups can binary-search the vocabulary
+        terms = sorted(vocab)
+        rank = np.empty(len(terms), dtype=np.int64)
+        rank[[vocab[t] for t in terms]] = np.arange(len(terms))
+        n_docs = max(len(texts), 1)
+        docs = np.repeat(np.arange(len(texts), dtype=np.int64), doc_len)
+        # one sort over (term, doc) keys gives postings grouped by term and
+        # ordered by doc, with the term frequency as the run length
+        keys, tfs = np.unique(
+            rank[np.frombuffer(term_ids, dtype=np.int32)] * n_docs + docs,
+            return_counts=True,
+        )
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // n_docs, minlength=len(vocab)), out=indptr[1:])
+        return cls(
+            SortedStringArray.from_strings(terms),
+            indptr,
+            (keys % n_docs).astype(np.int32),
+            tfs.astype(np.float32),
+            doc_len.astype(np.float32),
+            **params,
+        )
+
+    def append(self, texts: List[str], live=None) -> "BM25Index":
+        """
+        New index with texts added as chunks len(self).., and every chunk
+        where live (a mask over old and new chunks) is False tombstoned.
+
+        Only texts are tokenized. The old postings are copied with those of
+        tombstoned chunks masked out, so the result equals build() of all
+        chunk texts with the tombstoned ones blanked.
+        """
+        added = BM25Index.build(texts)
+        n_old, n_terms = len(self), len(self.terms)
+        keep = np.ones(n_old, bool) if live is None else np.asarray(live[:n_old], bool)
+
+        # postings of live old chunks, still grouped by term and ordered by chunk
+        old_df = np.diff(self.indptr)
+        old_term = np.repeat(np.arange(n_terms), old_df)
+        kept = keep[self.doc_ids]
+        kept_term = old_term[kept]
+        kept_df = np.bincount(kept_term, minlength=n_terms)
+
+        # merge the vocabularies by binary search: only the new terms are decoded
+        new_terms = list(added.terms)
+        pos = np.array([bisect_left(self.terms, t) for t in new_terms], dtype=np.int64)
+        found = np.array(
+            [p < n_terms and self.terms[p] == t for p, t in zip(pos.tolist(), new_terms)], bool
+        )
+        missing = ~found
+        inserted = pos[missing]
+        rank_old = np.arange(n_terms) + np.searchsorted(inserted, np.arange(n_terms), "right")
+        rank_new = np.empty(len(new_terms), dtype=np.int64)
+        rank_new[found] = rank_old[pos[found]]
+        rank_new[missing] = inserted + np.arange(len(inserted))
+        n_union = n_terms + len(inserted)
+
+        old_in_union = np.zeros(n_union, dtype=np.int64)
+        old_in_union[rank_old] = kept_df
+        counts = old_in_union.copy()
+        counts[rank_new] += np.diff(added.indptr)
+        indptr = np.zeros(n_union + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+
+        # old postings first within each term: their chunk ids are the smaller ones
+        doc_ids = np.empty(indptr[-1], dtype=np.int32)
+        tfs = np.empty(indptr[-1], dtype=np.float32)
+        kept_start = np.cumsum(kept_df) - kept_df
+        at = indptr[rank_old[kept_term]] + np.arange(len(kept_term)) - kept_start[kept_term]
+        doc_ids[at], tfs[at] = self.doc_ids[kept], self.tfs[kept]
+        new_term = np.repeat(np.arange(len(new_terms)), np.diff(added.indptr))
+        ranks = rank_new[new_term]
+        at = indptr[ranks] + old_in_union[ranks] + np.arange(len(new_term))
+        at -= added.indptr[new_term]
+        doc_ids[at], tfs[at] = added.doc_ids + n_old, added.tfs
+
+        # the union vocabulary, without terms only tombstoned chunks used
+        new_len = np.diff(added.terms.offsets)
+        blob = np.insert(
+            np.asarray(self.terms.blob),
+            np.repeat(np.asarray(self.terms.offsets)[inserted], new_len[missing]),
+            np.asarray(added.terms.blob)[np.repeat(missing, new_len)],
+        )
+        lengths = np.zeros(n_union, dtype=np.int64)
+        lengths[rank_old] = np.diff(self.terms.offsets)
+        lengths[rank_new] = new_len
+        used = counts > 0
+        offsets = np.zeros(np.count_nonzero(used) + 1, dtype=np.int64)
+        np.cumsum(lengths[used], out=offsets[1:])
+        doc_len = np.concatenate([np.where(keep, self.doc_len, 0), added.doc_len])
+        return BM25Index(
+            SortedStringArray(blob[np.repeat(used, lengths)], offsets),
+            np.concatenate([[0], indptr[1:][used]]),
+            doc_ids,
+            tfs,
+            doc_len.astype(np.float32),
+            k1=self.k1,
+            b=self.b,
+        )
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def score(self, query: str):
+        """Return (chunk ids, BM25 scores, coverage) for chunks matching any query term."""
+        query_terms = set(tokenize(query))
+        ids = sorted(i for i in map(self.terms.find, query_terms) if i >= 0)
+        if not ids:
+            empty = np.array([], dtype=np.int32)
+            return empty, np.array([], dtype=np.float32), np.array([], dtype=np.float32)
+
+        docs, parts = [], []
+        for t in ids:
+            lo, hi = self.indptr[t], self.indptr[t + 1]
+            d, tf = self.doc_ids[lo:hi], self.tfs[lo:hi]
+            docs.append(d)
+            parts.append(self.idf[t] * tf * (self.k1 + 1) / (tf + self.norm[d]))
+        docs = np.concatenate(docs)
+        # sum per chunk over the matched postings only
+        chunk_ids, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(parts)).astype(np.float32)
+        coverage = (np.bincount(inverse) / len(query_terms)).astype(np.float32)
+        return chunk_ids, scores, coverage
+
+    def top_k(self, query: str, k: int = 5):
+        """Best k (chunk id, score, coverage), highest score first."""
+        chunk_ids, scores, coverage = self.score(query)
+        order = top_k_order(scores, k)
+        return list(
+            zip(chunk_ids[order].tolist(), scores[order].tolist(), coverage[order].tolist())
+        )
+
+    def idf_of(self, term: str) -> float:
+        """IDF of an indexed term, None when the term is not in the vocabulary."""
+        i = self.terms.find(term)
+        return float(self.idf[i]) if i >= 0 else None
+
+    def save(self, out_dir: str):
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        self.terms.save(out, "terms")
+        for name in ARRAYS:
+            save_array(out / f"{name}.npy", getattr(self, name))
+        save_array(out / "params.npy", np.array([self.k1, self.b]))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "BM25Index":
+        p = Path(path)
+        k1, b = np.load(p / "params.npy").tolist()
+        arrays = [load_array(p / f"{name}.npy", mmap) for name in ARRAYS]
+        return cls(SortedStringArray.load(p, "terms", mmap), *arrays, k1=k1, b=b)
+
+
+def top_k_order(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first, without sorting the rest."""
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if len(scores) > k:
+        # partial selection in O(n), then sort only the k winners
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
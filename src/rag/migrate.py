@@ -0,0 +1,50 @@
+from pathlib import Path
+import argparse
+
+from .ingest import build_lexical_index
+from .store import MANIFEST_FILE, ChunkStore
+
+LEGACY_FILES = ("chunks.json", "meta.json", "lexical.npz")
+
+
+def migrate_index(path: str, keep_json: bool = False) -> bool:
+    """
+    Convert a JSON index directory (chunks.json/meta.json) to the binary format.
+
+    Features:
+        - Chunks and metadata: rewritten as the mmapped ChunkStore files
+        - Lexical: rebuilt from the chunks into lexical/ (the old lexical.npz
+          keeps terms unsorted and cannot be mapped)
+        - Vectors: faiss.index and embedder.json are already binary and kept
+
+    Returns:
+        False when the directory is already in the binary format
+    """
+    p = Path(path)
+    if (p / MANIFEST_FILE).exists():
+        print(f"✅ {p} is already in the binary format")
+        return False
+
+    store = ChunkStore.load_json(p)
+    build_lexical_index(list(store)).save(p / "lexical")
+    store.save(p)
+    if not keep_json:
+        for name in LEGACY_FILES:
+            (p / name).unlink(missing_ok=True)
+    print(f"✅ Migrated {len(store)} chunks in {p}")
+    return True
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert JSON RAG indexes to the binary format")
+    ap.add_argument("--index", nargs="+", default=["data/rag/index"], help="Index directories")
+    ap.add_argument(
+        "--keep-json", action="store_true", help="Keep chunks.json/meta.json after converting"
+    )
+    args = ap.parse_args()
+    for path in args.index:
+        migrate_index(path, args.keep_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,312 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-import json
+from typing import List
+import gc
+import threading
 import faiss
+import numpy as np
+from .embed import HashingEmbedder, embed_chunks, set_search_params
+from .fusion import fuse
+from .lexical import BM25Index, stem, tokenize
+from .store import ChunkStore
+
+LEXICAL_DIR = "lexical"
+EMBEDDER_FILE = "embedder.json"
+SEARCH_MODES = ("hybrid", "lexical", "vector")
+DEFAULT_WEIGHTS = {"lexical": 1.0, "vector": 1.0}
+# tokenized candidates kept per index; popular chunks are reranked over and over
+TOKEN_CACHE_SIZE = 16_384
+# warm() reads one byte per page of every mapped array
+PAGE_SIZE = 4096
 
 
 class RAGIndex:
     def __init__(self, path: str):
         p = Path(path)
-        self.index = faiss.read_index(str(p / "faiss.index"))
-        self.chunks = json.loads((p / "chunks.json").read_text())
-        self.meta = json.loads((p / "meta.json").read_text())
+        # memory-mapped texts and metadata; chunks[i] decodes one chunk
+        self.chunks = ChunkStore.load(p)
+        self.embedder, self.index = self._load_vectors(p / EMBEDDER_FILE, p / "faiss.index")
+        self._vector_lock = threading.Lock()
+        self.lexical = self._load_lexical(p / LEXICAL_DIR)
+        # hybrid search runs both retrievers side by side; BM25 scoring and
+        # the FAISS search spend most of their time in numpy/C++ without the GIL
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-search")
+        self._chunk_terms = lru_cache(maxsize=TOKEN_CACHE_SIZE)(self._tokenize_chunk)
+        # requests currently searching this index; close() waits for them
+        self._users = 0
+        self._closing = False
+        self._idle = threading.Condition()
         print(f"✅ Loaded index with {len(self.chunks)} chunks")
 
-    def search(self, query: str, k: int = 5):
-        query_lower = query.lower()
-        scores = []
+    @property
+    def version(self) -> str:
+        """Changes whenever the index directory is rewritten; part of cache keys."""
+        return self.chunks.version
+
+    def acquire(self) -> bool:
+        """Register a request using this index; False once close() has started."""
+        with self._idle:
+            if self._closing:
+                return False
+            self._users += 1
+            return True
+
+    def release(self):
+        with self._idle:
+            self._users -= 1
+            self._idle.notify_all()
+
+    def warm(self, queries=("specifications",)):
+        """
+        Fault in the mapped pages and run one search per mode.
+
+        Called on a freshly loaded index before it takes traffic, so the first
+        requests do not pay for page faults, thread start-up and lazy faiss setup.
+        """
+        arrays = [self.chunks.texts.blob, self.chunks.texts.offsets, self.chunks.meta]
+        arrays += [self.chunks.live, self.lexical.terms.blob, self.lexical.terms.offsets]
+        arrays += [self.lexical.indptr, self.lexical.doc_ids, self.lexical.tfs]
+        for array in arrays:
+            data = np.asarray(array).reshape(-1).view(np.uint8)
+            int(data[::PAGE_SIZE].sum())
+        for mode in SEARCH_MODES:
+            self.search_batch(list(queries), mode=mode)
+
+    def close(self, timeout: float = 60.0) -> bool:
+        """
+        Release the index once the requests using it are done.
+
+        New acquire() calls fail from now on; after the last release() the
+        search threads stop and the mapped files, FAISS index and token cache
+        are dropped. Returns False, leaving the index to the garbage collector,
+        when requests still hold it after timeout seconds.
+        """
+        with self._idle:
+            self._closing = True
+            if not self._idle.wait_for(lambda: self._users == 0, timeout):
+                return False
+        self._pool.shutdown(wait=True)
+        # the lru_cache wraps a bound method of self: drop it to break the cycle
+        self._chunk_terms.cache_clear()
+        self._chunk_terms = self.chunks = self.index = self.lexical = None
+        gc.collect()
+        return True
+
+    def _load_vectors(self, embedder_path: Path, index_path: Path):
+        # older index directories hold no embedder config and a dummy 1-d index
+        if embedder_path.exists() and index_path.exists():
+            embedder = HashingEmbedder.load(embedder_path)
+            # IO_FLAG_MMAP maps IVF inverted lists; faiss 1.7.4 still reads
+            # flat and HNSW storage into memory
+            index = faiss.read_index(str(index_path), faiss.IO_FLAG_MMAP)
+            if index.d == embedder.dim and index.ntotal == len(self.chunks):
+                return embedder, index
+        print("⚠️ Vector index missing or stale, building it from chunks")
+        return embed_chunks(self.chunks.indexable())
+
+    def _load_lexical(self, path: Path) -> BM25Index:
+        if (path / "params.npy").exists():
+            lexical = BM25Index.load(path)
+            if len(lexical) == len(self.chunks):
+                return lexical
+        print("⚠️ Lexical index missing or stale, building it from chunks")
+        return BM25Index.build(self.chunks.indexable())
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        mode: str = "hybrid",
+        ef_search: int = 128,
+        nprobe: int = 32,
+        fusion: str = "rrf",
+        weights: dict = None,
+        candidates: int = None,
+        rerank_top: int = 20,
+    ):
+        """
+        Retrieve the k best chunks for a query.
+
+        Modes:
+            - hybrid: lexical and vector candidates (candidates each, default
+              max(4k, 20)) retrieved concurrently, fused by reciprocal rank
+              ("rrf") or normalized score ("weighted") with per-retriever
+              weights, then only the fused top rerank_top are rescored
+            - lexical: BM25 over the inverted index; cost grows with the
+              postings of the query terms, not with the number of chunks
+            - vector: cosine similarity of hashed TF-IDF embeddings through the
+              FAISS index (ef_search for HNSW, nprobe for IVF)
 
-        for i, chunk in enumerate(self.chunks):
-            chunk_lower = chunk.lower()
-            words = query_lower.split()
-            score = sum(1 for word in words if word in chunk_lower) / len(words)
-            scores.append((score, i))
+        Each hit carries the ranking score and the fraction of query terms it
+        contains (coverage, 0..1), which is comparable across modes.
+        """
+        return self.search_batch(
+            [query], k, mode, ef_search, nprobe, fusion, weights, candidates, rerank_top
+        )[0]
 
-        scores.sort(reverse=True)
+    def search_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        mode: str = "hybrid",
+        ef_search: int = 128,
+        nprobe: int = 32,
+        fusion: str = "rrf",
+        weights: dict = None,
+        candidates: int = None,
+        rerank_top: int = 20,
+    ):
+        """
+        search() for many queries sharing the same options, one hit list per query.
 
-        hits = []
-        for score, idx in scores[:k]:
-            if score > 0:
-                chunk = self.chunks[idx]
-                meta = self.meta[idx]
-                hits.append(
-                    {
-                        "score": float(score),
-                        "snippet": chunk[:360],  # 360 characters preview
-                        "page": meta.get("page", 1),
-                    }
-                )
+        The vector side is vectorized: all queries are embedded in one call and
+        looked up in one FAISS search, while BM25 runs query by query alongside.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
+        if mode == "lexical":
+            results = [self.lexical.top_k(query, k) for query in queries]
+        elif mode == "vector":
+            results = self._vector_top_k(queries, k, ef_search, nprobe)
+        else:
+            n = candidates or max(4 * k, 20)
+            vector = self._pool.submit(self._vector_top_k, queries, n, ef_search, nprobe)
+            lexical = [self.lexical.top_k(query, n) for query in queries]
+            weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+            results = []
+            for query, lex, vec in zip(queries, lexical, vector.result()):
+                rankings = {
+                    "lexical": [(idx, score) for idx, score, _ in lex],
+                    "vector": [(idx, score) for idx, score, _ in vec],
+                }
+                fused = fuse(fusion, rankings, weights)
+                results.append(self._rerank(query, fused[: max(rerank_top, k)])[:k])
+        return [[self._hit(idx, score, coverage) for idx, score, coverage in r] for r in results]
 
-        return hits
+    def _rerank(self, query: str, fused):
+        """
+        Rescore fused candidates against their full text.
+
+        Score = share of query terms found in the chunk weighted by IDF squared
+        (as in a TF-IDF cosine), plus bonuses for matched terms appearing close
+        together and for the fused score. Terms match by stem, so "consume"
+        finds "consumption"; a term unknown to the index weighs as much as the
+        rarest indexed term when its stem occurs in a candidate, and nothing
+        otherwise. This tokenizes each candidate, so it only sees the fused top-N.
+        """
+        terms = {stem(t): t for t in tokenize(query)}
+        stems = [self._chunk_terms(idx)[1] for idx, _ in fused]
+        seen = set().union(*stems) if stems else set()
+        idf = self.lexical.idf
+        rarest = float(idf.max()) if len(idf) else 1.0
+        weights = {}
+        for s, t in terms.items():
+            term_idf = self.lexical.idf_of(t)
+            if term_idf is not None:
+                weights[s] = term_idf**2
+            elif s in seen:
+                weights[s] = rarest**2
+        total = sum(weights.values())
+        best = fused[0][1] if fused else 1.0
+        results = []
+        for (idx, fused_score), chunk_stems in zip(fused, stems):
+            matched = terms.keys() & set(chunk_stems)
+            weighted = sum(weights[s] for s in matched) / total if total else 0.0
+            score = weighted + 0.25 * _proximity(chunk_stems, matched)
+            if best > 0:
+                score += 0.25 * fused_score / best
+            # a query of punctuation only has no terms to cover
+            results.append((idx, score, len(matched) / len(terms) if terms else 0.0))
+        results.sort(key=lambda r: r[1], reverse=True)
+        return results
+
+    def _vector_top_k(self, queries: List[str], k: int, ef_search: int, nprobe: int):
+        if not queries:
+            return []
+        vectors = self.embedder.embed(queries)
+        live = self.chunks.live
+        found = [None] * len(queries)
+        pending, fetch = list(range(len(queries))), k
+        while pending:
+            with self._vector_lock:
+                set_search_params(self.index, ef_search=ef_search, nprobe=nprobe)
+                scores, ids = self.index.search(vectors[pending], fetch)
+            retry = []
+            for row, q in enumerate(pending):
+                # -1 pads results when fewer than fetch vectors are reachable
+                row_hits = zip(ids[row].tolist(), scores[row].tolist())
+                hits = [(i, s) for i, s in row_hits if i >= 0 and s > 0]
+                exhausted = len(hits) < fetch or fetch >= self.index.ntotal
+                hits = [(i, s) for i, s in hits if live[i]]
+                # tombstoned chunks keep their vectors until compaction; fetch
+                # deeper until k live ones are found
+                if len(hits) >= k or exhausted:
+                    found[q] = hits[:k]
+                else:
+                    retry.append(q)
+            pending, fetch = retry, fetch * 4
+
+        results = []
+        for query, hits in zip(queries, found):
+            terms = set(tokenize(query))
+            coverage = [len(terms & self._chunk_terms(i)[0]) / len(terms) for i, _ in hits]
+            results.append([(i, s, c) for (i, s), c in zip(hits, coverage)])
+        return results
+
+    def _tokenize_chunk(self, idx: int):
+        """(set of tokens, stems in text order) of one chunk."""
+        tokens = tokenize(self.chunks[idx])
+        return frozenset(tokens), tuple(stem(t) for t in tokens)
+
+    def _hit(self, idx: int, score: float, coverage: float):
+        return {
+            "score": score,
+            "coverage": coverage,
+            "snippet": self.chunks[idx][:360],  # 360 characters preview
+            "page": self.chunks.page(idx),
+            "source": self.chunks.source(idx),
+        }
+
+
+def _proximity(tokens, matched) -> float:
+    """len(matched) / length of the shortest token window containing all of them."""
+    if len(matched) < 2:
+        return 0.0
+    need, counts, have = len(matched), {}, 0
+    best = len(tokens)
+    lo = 0
+    for hi, token in enumerate(tokens):
+        if token not in matched:
+            continue
+        counts[token] = counts.get(token, 0) + 1
+        have += counts[token] == 1
+        while have == need:
+            best = min(best, hi - lo + 1)
+            if tokens[lo] in matched:
+                counts[tokens[lo]] -= 1
+                have -= counts[tokens[lo]] == 0
+            lo += 1
+    return need / best
 
 
 def load_index(path: str) -> RAGIndex:
     return RAGIndex(path)
 
 
-def answer_question(rag: RAGIndex, question: str):
-    hits = rag.search(question, k=5)
-    if not hits or hits[0]["score"] < 0.1:
+def answer_questions(rag: RAGIndex, questions: List[str], k: int = 5, **search_options):
+    """answer_question for many questions with one batched search."""
+    return [_answer(hits) for hits in rag.search_batch(questions, k=k, **search_options)]
+
+
+def answer_question(rag: RAGIndex, question: str, k: int = 5, **search_options):
+    """search_options (mode, fusion, weights, ...) are passed on to RAGIndex.search."""
+    return _answer(rag.search(question, k=k, **search_options))
+
+
+def _answer(hits):
+    # BM25 scores are unbounded, so relevance is judged on coverage
+    if not hits or hits[0]["coverage"] < 0.1:
         return {"answer": "No relevant information found", "sources": []}
 
     context = " | ".join([h["snippet"] for h in hits[:3]])
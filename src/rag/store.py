@@ -0,0 +1,258 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+import json
+import os
+import uuid
+
+import numpy as np
+
+MANIFEST_FILE = "index.json"
+FORMAT_VERSION = 2
+META_DTYPE = np.dtype([("page", "<i4"), ("source", "<i4")])
+
+
+def load_array(path: Path, mmap: bool = True) -> np.ndarray:
+    # read-only mmap: pages are loaded on first touch and shared between processes
+    array = np.load(path, mmap_mode="r" if mmap else None)
+    # a plain ndarray view of the same pages; every np.memmap slice costs
+    # several microseconds of subclass bookkeeping
+    return array.view(np.ndarray) if mmap else array
+
+
+@contextmanager
+def atomic_path(path: Path):
+    """
+    Yield a temporary path next to path and rename it over path once written.
+
+    A server that mapped the previous file keeps reading its pages instead of
+    seeing the file truncated and rewritten under it by the next ingest.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    yield tmp
+    os.replace(tmp, path)
+
+
+def save_array(path: Path, array):
+    with atomic_path(path) as tmp, open(tmp, "wb") as f:
+        np.save(f, np.asarray(array))
+
+
+class StringArray:
+    """
+    Immutable sequence of strings stored as one UTF-8 blob plus an offsets array.
+
+    Item i is blob[offsets[i]:offsets[i + 1]], decoded on access. Both arrays
+    are plain .npy files, so a saved StringArray opens by mmap without reading
+    or parsing the strings.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+        self._bytes = memoryview(blob)
+        self._n = len(offsets) - 1
+
+    @classmethod
+    def from_strings(cls, strings: List[str]) -> "StringArray":
+        encoded = [s.encode() for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i: int) -> str:
+        if not -self._n <= i < self._n:
+            raise IndexError(i)
+        lo, hi = self.offsets[i % self._n : i % self._n + 2].tolist()
+        return str(self._bytes[lo:hi], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def save(self, out_dir: Path, name: str):
+        save_array(Path(out_dir) / f"{name}.text.npy", self.blob)
+        save_array(Path(out_dir) / f"{name}.offsets.npy", self.offsets)
+
+    @classmethod
+    def load(cls, path: Path, name: str, mmap: bool = True):
+        path = Path(path)
+        return cls(
+            load_array(path / f"{name}.text.npy", mmap),
+            load_array(path / f"{name}.offsets.npy", mmap),
+        )
+
+
+class SortedStringArray(StringArray):
+    """StringArray of sorted, distinct strings with binary-search lookup."""
+
+    def find(self, s: str) -> int:
+        """Position of s, or -1 when absent; O(log n) decodes, no dict in memory."""
+        i = bisect_left(self, s)
+        return i if i < len(self) and self[i] == s else -1
+
+    def __contains__(self, s: str) -> bool:
+        return self.find(s) >= 0
+
+
+class ChunkStore:
+    """
+    Chunk texts and their page/source metadata, memory-mapped from the index directory.
+
+    Features:
+        - Compact: one UTF-8 blob with int64 offsets instead of a list of str,
+          and a (page, source id) record array instead of a list of dicts
+        - O(1) open: nothing is parsed at load, chunks are decoded when read,
+          and uvicorn workers opening the same index share the page cache
+        - Tombstones: chunks of replaced or deleted documents stay in place
+          with live[i] False, so chunk ids held by the search indexes stay
+          valid until compact()
+        - Documents: per-source content fingerprints for incremental ingestion
+        - Version: a fresh id on every save, so caches can tell indexes apart
+        - Legacy support: directories with only chunks.json/meta.json are
+          still readable (fully loaded); `python -m src.rag.migrate` converts them
+    """
+
+    def __init__(
+        self,
+        texts: StringArray,
+        meta: np.ndarray,
+        sources: List[str],
+        live: np.ndarray = None,
+        documents: Dict[str, Dict] = None,
+        version: str = None,
+    ):
+        self.texts = texts
+        self.meta = meta
+        self.sources = sources
+        self.live = np.ones(len(meta), dtype=bool) if live is None else live
+        self.documents = documents or {}
+        self.version = version
+
+    @classmethod
+    def from_lists(cls, chunks: List[str], meta: List[Dict], documents=None) -> "ChunkStore":
+        sources = {}
+        records = _records(meta, sources)
+        return cls(StringArray.from_strings(chunks), records, list(sources), documents=documents)
+
+    @property
+    def n_live(self) -> int:
+        return int(np.count_nonzero(self.live))
+
+    def indexable(self) -> List[str]:
+        """All chunk texts by position, tombstoned ones blanked so they match nothing."""
+        return [text if live else "" for text, live in zip(self, self.live.tolist())]
+
+    def append(self, chunks: List[str], meta: List[Dict], drop=(), documents=None):
+        """
+        New store with these chunks added at the end and every chunk whose
+        source is in drop tombstoned. Existing chunk ids do not move.
+        """
+        sources = {name: i for i, name in enumerate(self.sources)}
+        dropped = [sources[name] for name in drop if name in sources]
+        records = np.concatenate([np.asarray(self.meta), _records(meta, sources)])
+        added = StringArray.from_strings(chunks)
+        texts = StringArray(
+            np.concatenate([np.asarray(self.texts.blob), added.blob]),
+            np.concatenate([self.texts.offsets, added.offsets[1:] + self.texts.offsets[-1]]),
+        )
+        live = np.concatenate(
+            [self.live & ~np.isin(self.meta["source"], dropped), np.ones(len(chunks), bool)]
+        )
+        return ChunkStore(texts, records, list(sources), live, documents)
+
+    def compact(self) -> "ChunkStore":
+        """New store holding only the live chunks, renumbered from 0."""
+        keep = np.flatnonzero(self.live).tolist()
+        meta = [{"page": self.page(i), "source": self.source(i)} for i in keep]
+        return ChunkStore.from_lists([self[i] for i in keep], meta, self.documents)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i: int) -> str:
+        return self.texts[i]
+
+    def __iter__(self):
+        return iter(self.texts)
+
+    def page(self, i: int) -> int:
+        return int(self.meta[i]["page"])
+
+    def source(self, i: int) -> str:
+        return self.sources[self.meta[i]["source"]] if self.sources else ""
+
+    def save(self, out_dir: str):
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        self.texts.save(out, "chunks")
+        save_array(out / "chunks.meta.npy", self.meta)
+        save_array(out / "chunks.live.npy", self.live)
+        self.version = uuid.uuid4().hex
+        # the manifest goes last: a directory without it is not a complete index
+        manifest = {
+            "format": FORMAT_VERSION,
+            "version": self.version,
+            "chunks": len(self),
+            "live": self.n_live,
+            "sources": self.sources,
+            "documents": self.documents,
+        }
+        with atomic_path(out / MANIFEST_FILE) as tmp:
+            tmp.write_text(json.dumps(manifest, ensure_ascii=False))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "ChunkStore":
+        p = Path(path)
+        if not (p / MANIFEST_FILE).exists():
+            print(f"⚠️ {p} is a JSON index, run `python -m src.rag.migrate --index {p}`")
+            return cls.load_json(p)
+        manifest = json.loads((p / MANIFEST_FILE).read_text())
+        if manifest["format"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format {manifest['format']} in {p}")
+        live = p / "chunks.live.npy"
+        return cls(
+            StringArray.load(p, "chunks", mmap),
+            load_array(p / "chunks.meta.npy", mmap),
+            manifest["sources"],
+            load_array(live, mmap) if live.exists() else None,
+            manifest.get("documents"),
+            manifest.get("version"),
+        )
+
+    @staticmethod
+    def read_version(path: str) -> str:
+        """Version of the index saved in path, without opening it; None when there is none."""
+        p = Path(path)
+        if (p / MANIFEST_FILE).exists():
+            return json.loads((p / MANIFEST_FILE).read_text()).get("version")
+        if (p / "chunks.json").exists():
+            return _json_version(p)
+        return None
+
+    @classmethod
+    def load_json(cls, path: str) -> "ChunkStore":
+        p = Path(path)
+        chunks = json.loads((p / "chunks.json").read_text())
+        meta = json.loads((p / "meta.json").read_text())
+        store = cls.from_lists(chunks, meta)
+        store.version = _json_version(p)
+        return store
+
+
+def _json_version(path: Path) -> str:
+    stat = (path / "chunks.json").stat()
+    return f"json-{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _records(meta: List[Dict], sources: Dict[str, int]) -> np.ndarray:
+    # source names are interned in sources (name -> id), extended in place
+    records = np.zeros(len(meta), dtype=META_DTYPE)
+    for i, m in enumerate(meta):
+        records[i] = (m.get("page", 1), sources.setdefault(m.get("source", ""), len(sources)))
+    return records
@@ -1,5 +1,34 @@
+import json
+import sys
+
 import pandas as pd
-from src.etl.transform import build_dim_product, build_dim_vendor, build_fact_inventory
+import pytest
+from pandera.errors import SchemaErrors
+from src.etl.incremental import run_incremental
+from src.etl.lookup import TrustedTables
+from src.etl.parallel import run_parallel
+from src.etl.profiling import quarantine_counts
+from src.etl.quarantine import REASONS, quarantine_summary, read_quarantine
+from src.etl.run import main
+from src.etl.streaming import run_streaming
+from src.etl.utils import read_products_csv, write_parquet
+from src.etl.validators import (
+    configure_validation,
+    reset_validation_stats,
+    validate_raw_inventory,
+    validation_config,
+    validation_stats,
+)
+from src.etl.transform import (
+    ENGINES,
+    _parse_date,
+    _parse_date_col,
+    build_dim_product,
+    build_dim_vendor,
+    build_fact_inventory,
+    parse_stats,
+    reset_parse_stats,
+)
 
 
 def test_vendor_dedup():
@@ -26,6 +55,35 @@ def test_vendor_dedup():
     assert dim.iloc[0]["vendor_code"] == "V-77"
 
 
+def test_vendor_engines_match():
+    v = pd.DataFrame(
+        {
+            "vendor_code": ["V-77", "V-12", "V-77", "V-12", "V-01", "V-77"],
+            "name": [
+                "Vectortron",
+                "Zelica",
+                "Vectortron GmbH",
+                "Zelicb",
+                "Acme",
+                "Vectortron AG12",
+            ],
+            "country": ["DE", "CN", "AT", "HK", "US", "CH"],
+            "support_email": ["a@v.com", "b@z.cn", "c@v.com", "d@z.cn", "e@a.us", "f@v.ch"],
+        }
+    )
+    dim_rows, map_rows = build_dim_vendor(v, engine="rows")
+    dim_cols, map_cols = build_dim_vendor(v, engine="columnar")
+    pd.testing.assert_frame_equal(dim_rows, dim_cols)
+    assert map_rows == map_cols
+    # longest name wins, ties go to the earliest row; country/email come from the first row
+    assert map_cols["V-77"] == {
+        "vendor_name": "Vectortron GmbH",
+        "country": "DE",
+        "support_email": "a@v.com",
+    }
+    assert map_cols["V-12"]["vendor_name"] == "Zelica"
+
+
 def test_dimensions_quarantine():
     p = pd.DataFrame(
         [
@@ -82,3 +140,519 @@ def test_inventory_fk_quarantine():
     fact, q = build_fact_inventory(inv, dim)
     assert len(fact) == 0
     assert not q.empty
+
+
+def _dirty_products():
+    return pd.DataFrame(
+        [
+            {
+                "product_id": 1001.0,
+                "sku": "AB-001",
+                "model": "Alpha-X",
+                "category": "Router",
+                "weight_grams": " 950",
+                "dimensions_mm": "220x120x45",
+                "vendor_code": "V-77",
+                "launch_date": "2023-11-15",
+                "msrp_usd": "129.90",
+            },
+            {
+                "product_id": 1002.0,
+                "sku": "AB-002",
+                "model": "Alpha-X Pro",
+                "category": "Router",
+                "weight_grams": "",
+                "dimensions_mm": " 220x120x45 ",
+                "vendor_code": " V-77",
+                "launch_date": " 2023/13/01",
+                "msrp_usd": "159,90",
+            },
+            {
+                "product_id": 1003.0,
+                "sku": "ZX-900",
+                "model": "",
+                "category": None,
+                "weight_grams": "1800",
+                "dimensions_mm": "440x300x44",
+                "vendor_code": "V-12",
+                "launch_date": "2021-02-29",
+                "msrp_usd": "499,00",
+            },
+            {
+                "product_id": 1004.0,
+                "sku": None,
+                "model": "OmegaCam",
+                "category": "Camera",
+                "weight_grams": "650",
+                "dimensions_mm": "90x60x",
+                "vendor_code": "V-77",
+                "launch_date": "2021-02-29",
+                "msrp_usd": "249.00",
+            },
+            {
+                "product_id": None,
+                "sku": "AB-003",
+                "model": "Alpha-Mini",
+                "category": "Router",
+                "weight_grams": "420",
+                "dimensions_mm": "120x80x30",
+                "vendor_code": "V-77",
+                "launch_date": "2024/12/03",
+                "msrp_usd": "99.00",
+            },
+            {
+                "product_id": 1005.0,
+                "sku": "AB-004",
+                "model": "Beta",
+                "category": "Router",
+                "weight_grams": "300",
+                "dimensions_mm": "10x10x10",
+                "vendor_code": "",
+                "launch_date": None,
+                "msrp_usd": "-1",
+            },
+            {
+                "product_id": 1006.0,
+                "sku": "AB-005",
+                "model": "Gamma",
+                "category": "Router",
+                "weight_grams": "300",
+                "dimensions_mm": "10x10x10",
+                "vendor_code": None,
+                "launch_date": "2020-01-01",
+                "msrp_usd": "10",
+            },
+        ]
+    )
+
+
+def test_dim_product_engines_match():
+    p = _dirty_products()
+    dim_rows, q_rows = build_dim_product(p, {}, engine="rows")
+    dim_cols, q_cols = build_dim_product(p, {}, engine="columnar")
+    pd.testing.assert_frame_equal(dim_rows, dim_cols)
+    pd.testing.assert_frame_equal(q_rows, q_cols)
+    assert q_cols["reason"].tolist() == [
+        "invalid_weight",
+        "sku_missing",
+        "invalid_msrp",
+        "vendor_code_missing",
+    ]
+
+
+def test_fact_inventory_engines_match():
+    dim, _ = build_dim_product(_dirty_products(), {})
+    inv = pd.DataFrame(
+        {
+            "product_id": [1001, 1001, 9999, 1003, 1002, 1003],
+            "warehouse": ["WH-A", "WH-B", "WH-A", "WH-B", "WH-C", "WH-C"],
+            "on_hand": [10, -2, 7, 50, 3, -1],
+            "min_stock": [5, 5, 5, 10, 5, 0],
+            "last_counted_at": pd.to_datetime(["2024-11-01"] * 6),
+        }
+    )
+    fact_rows, q_rows = build_fact_inventory(inv, dim, engine="rows")
+    fact_cols, q_cols = build_fact_inventory(inv, dim, engine="columnar")
+    pd.testing.assert_frame_equal(fact_rows, fact_cols)
+    pd.testing.assert_frame_equal(q_rows, q_cols)
+    assert q_cols["reason"].tolist() == [
+        "negative_on_hand",
+        "fk_product_missing",
+        "fk_product_missing",
+        "negative_on_hand",
+    ]
+
+
+def test_parse_caches_repeated_strings():
+    reset_parse_stats()
+    dates = pd.Series(["2023-11-15", " 2023/13/01", None, "bad", float("nan")] * 200)
+    dates.name = "launch_date"
+    expected = dates.map(_parse_date)
+
+    # scalar parser: one strptime cascade per distinct string, NaN never cached
+    stats = parse_stats()["caches"]["date"]
+    assert stats["misses"] == 3
+    assert stats["hits"] == 597
+
+    # column parser: only the distinct values are parsed
+    parsed = _parse_date_col(dates)
+    pd.testing.assert_series_equal(parsed, pd.to_datetime(expected), check_names=False)
+    column = parse_stats()["columns"]["launch_date"]
+    assert (column["rows"], column["unique"]) == (1000, 3)
+
+
+def test_compiled_validation_falls_back_to_pandera():
+    inv = pd.DataFrame(
+        {
+            "product_id": [1001, 1002],
+            "warehouse": ["WH-A", "WH-B"],
+            "on_hand": [10, -2],
+            "min_stock": [5, 0],
+            "last_counted_at": pd.to_datetime(["2024-11-01"] * 2),
+        }
+    )
+    reset_validation_stats()
+    # frames that pass the compiled checks are returned untouched
+    assert validate_raw_inventory(inv) is inv
+    # anything else goes through pandera, which coerces or reports every error
+    coerced = validate_raw_inventory(inv.astype({"on_hand": "int32"}))
+    pd.testing.assert_frame_equal(coerced, inv)
+    with pytest.raises(SchemaErrors):
+        validate_raw_inventory(inv.assign(min_stock=[-1, 0]))
+    stats = validation_stats()["inventory_raw"]
+    assert (stats["calls"], stats["fallbacks"]) == (3, 2)
+
+
+def test_compiled_schema_leaves_unknown_checks_to_pandera():
+    import pandera as pa
+    from src.etl.validators import CompiledSchema
+
+    ranged = pa.DataFrameSchema({"n": pa.Column(int, pa.Check.ge(0))})
+    listed = pa.DataFrameSchema({"n": pa.Column(int, pa.Check.isin([1, 2]))})
+    assert CompiledSchema(ranged).passes(pd.DataFrame({"n": [0, 5]}))
+    # no vectorized form for isin: the schema is never passed without pandera
+    assert not CompiledSchema(listed).compiled
+    assert not CompiledSchema(listed).passes(pd.DataFrame({"n": [1, 2]}))
+
+
+PRODUCTS_CSV = (
+    "product_id,sku,model,category,weight_grams,dimensions_mm,vendor_code,launch_date,msrp_usd\n"
+    "1001,AB-001,Alpha-X,Router,950,220x120x45,V-77,2023-11-15,129.90\n"
+    "1002,AB-002,Alpha-X Pro,Router,0,220x120x45,V-77,2023/13/01,159.90\n"
+    "1003,ZX-900,,Switch,1800,440x300x44,V-12,2022-05-07,499.00\n"
+    "1004,ZZ-001,OmegaCam,Camera,650,90x60x,V-77,2021-02-29,249.00\n"
+    ",AB-003,Alpha-Mini,Router,420,120x80x30,V-77,2024-03-12,99.00\n"
+)
+
+
+def _write_raw(raw):
+    raw.mkdir()
+    (raw / "products.csv").write_text(PRODUCTS_CSV)
+    v = pd.DataFrame(
+        {
+            "vendor_code": ["V-77", "V-12", "V-77", "V-12"],
+            "name": ["Vectortron", "Zelica", "Vectortron GmbH", "Zelica Ltd"],
+            "country": ["DE", "CN", "DE", "HK"],
+            "support_email": ["a@v.com", "b@z.cn", "c@v.com", "d@z.cn"],
+        }
+    )
+    v.to_json(raw / "vendors.jsonl", orient="records", lines=True)
+    inv = pd.DataFrame(
+        {
+            "product_id": [1001, 1001, 9999, 1003, 1002, 1004],
+            "warehouse": ["WH-A", "WH-B", "WH-A", "WH-B", "WH-C", "WH-C"],
+            "on_hand": [10, -2, 7, 50, 3, 4],
+            "min_stock": [5, 5, 5, 10, 5, 1],
+            "last_counted_at": pd.to_datetime(["2024-11-01"] * 6),
+        }
+    )
+    inv.to_parquet(raw / "inventory.parquet", index=False)
+    return v, inv
+
+
+def test_streaming_matches_in_memory(tmp_path):
+    raw = tmp_path / "raw"
+    v, inv = _write_raw(raw)
+
+    run_streaming(str(raw), str(tmp_path / "out"), batch_rows=2)
+
+    dim_vendor, _ = build_dim_vendor(v)
+    dim_product, q_prod = build_dim_product(pd.read_csv(raw / "products.csv"), {})
+    fact, q_inv = build_fact_inventory(inv, dim_product)
+
+    def read(name, by):
+        df = pd.read_parquet(tmp_path / "out" / name)
+        return df.sort_values(by).reset_index(drop=True)
+
+    assert read("dim_vendor", "vendor_code").equals(dim_vendor)
+    assert read("dim_product", "sku")["sku"].tolist() == sorted(dim_product["sku"])
+    assert len(read("fact_inventory", "product_id")) == len(fact)
+    q = read_quarantine(tmp_path / "out", "products").sort_values("sku")
+    assert q["reason"].tolist() == q_prod.sort_values("sku")["reason"].tolist()
+    q = read_quarantine(tmp_path / "out", "inventory").sort_values("product_id")
+    assert q["reason"].tolist() == q_inv.sort_values("product_id")["reason"].tolist()
+
+
+def test_arrow_reader_records_malformed_lines(tmp_path):
+    path = tmp_path / "products.csv"
+    path.write_text(
+        "product_id,sku,model,category,weight_grams,dimensions_mm,vendor_code,launch_date,msrp_usd\n"
+        "1001,AB-001,Alpha-X,Router, 950,220x120x45,V-77,2023-11-15,129.90\n"
+        "1002,AB-002,Alpha-X Pro,Router,900,220x120x45,V-77,2023/13/01,159,90\n"
+        "1003,ZX-900,,Switch,1800,440x300x44,V-12,2022-05-07,499.00\n"
+    )
+    products, unparseable = read_products_csv(path, engine="arrow")
+    legacy, _ = read_products_csv(path, engine="python")
+
+    # same values; the arrow reader takes dtypes from ProductsRawSchema
+    pd.testing.assert_frame_equal(products, legacy, check_dtype=False)
+    assert products["product_id"].dtype == "float64"
+    assert unparseable["line_number"].tolist() == [3]
+    assert unparseable["raw_text"].iloc[0].startswith("1002,AB-002")
+    assert unparseable["actual_columns"].iloc[0] == 10
+
+
+def test_generated_decimal_comma_prices_reach_the_transform(tmp_path, monkeypatch):
+    import argparse
+
+    monkeypatch.syspath_prepend("scripts")
+    from gen_data import Rates, add_arguments, write_products
+
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    args = parser.parse_args(["--decimal-comma-rate", "0.5", "--bad-dimensions-rate", "0"])
+    write_products(tmp_path / "products.csv", 200, 10, Rates(args), seed=0)
+
+    products, unparseable = read_products_csv(tmp_path / "products.csv")
+    assert unparseable.empty and len(products) == 200
+    comma = products["msrp_usd"].str.contains(",", regex=False).to_numpy()
+    assert 50 < comma.sum() < 150
+    expected = products["msrp_usd"].str.replace(",", ".").astype(float)
+    vendor_map = {code: {} for code in products["vendor_code"]}
+    for engine in ENGINES:
+        dim, q = build_dim_product(products, vendor_map, engine=engine)
+        assert "invalid_msrp" not in set(q.get("reason", []))
+        msrp = dim.set_index("sku")["msrp_usd"]
+        assert msrp.loc[products["sku"][comma]].tolist() == expected[comma].tolist()
+
+
+def _read_sorted(path, by):
+    # silver/_quarantine/<table>: the table's current rejects
+    if path.parent.name == "_quarantine":
+        df = read_quarantine(path.parent.parent.parent, path.name)
+    else:
+        df = pd.read_parquet(path)
+    for col in df.select_dtypes(include="category").columns:
+        df[col] = df[col].astype(str)
+    return df.sort_values(by).reset_index(drop=True)
+
+
+def test_incremental_reprocesses_only_changes(tmp_path, monkeypatch):
+    import src.etl.incremental as incremental
+
+    raw = tmp_path / "raw"
+    _, inv = _write_raw(raw)
+    out = tmp_path / "out"
+    run_incremental(str(raw), str(out))
+    untouched = sorted((out / "dim_product" / "vendor_code=V-12").iterdir())
+
+    # fix ZZ-001's dimensions (now valid, so its inventory row passes the FK
+    # check) and edit one inventory row
+    (raw / "products.csv").write_text(PRODUCTS_CSV.replace("90x60x,", "90x60x40,"))
+    inv.loc[0, "on_hand"] = 11
+    inv.to_parquet(raw / "inventory.parquet", index=False)
+    reads = []
+    with monkeypatch.context() as m:
+        read_partitions = incremental._read_partitions
+        m.setattr(
+            incremental,
+            "_read_partitions",
+            lambda root, column, values, *a: reads.append(values)
+            or read_partitions(root, column, values, *a),
+        )
+        run_incremental(str(raw), str(out))
+    # only the partitions the changed keys map to are opened
+    assert reads and None not in reads
+
+    full = tmp_path / "full"
+    run_incremental(str(raw), str(full))
+    for name, by in [("dim_product", "key"), ("fact_inventory", "key")]:
+        pd.testing.assert_frame_equal(
+            _read_sorted(out / "_state" / f"{name}.parquet", by),
+            _read_sorted(full / "_state" / f"{name}.parquet", by),
+        )
+
+    assert sorted((out / "dim_product" / "vendor_code=V-12").iterdir()) == untouched
+    for name, by in [
+        ("dim_product", "sku"),
+        ("fact_inventory", ["product_id", "warehouse"]),
+        ("silver/_quarantine/products", "sku"),
+        ("silver/_quarantine/inventory", ["product_id", "warehouse"]),
+    ]:
+        expected = _read_sorted(full / name, by)
+        actual = _read_sorted(out / name, by)
+        pd.testing.assert_frame_equal(actual[expected.columns], expected)
+    assert 1004 in _read_sorted(out / "fact_inventory", "product_id")["product_id"].tolist()
+
+
+def test_parallel_matches_single_process(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    _write_raw(raw)
+    # baseline: the plain in-memory run with default arguments
+    monkeypatch.setattr(
+        sys, "argv", ["run", "--raw-dir", str(raw), "--out-dir", str(tmp_path / "single")]
+    )
+    main()
+    for workers in (2, 3):
+        run_parallel(str(raw), str(tmp_path / f"w{workers}"), workers)
+
+    for name, by in [
+        ("dim_vendor", "vendor_code"),
+        ("dim_product", "sku"),
+        ("fact_inventory", ["product_id", "warehouse"]),
+        ("silver/_quarantine/products", "sku"),
+        ("silver/_quarantine/inventory", ["product_id", "warehouse"]),
+    ]:
+        expected = _read_sorted(tmp_path / "single" / name, by)
+        for workers in (2, 3):
+            actual = _read_sorted(tmp_path / f"w{workers}" / name, by)
+            pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_parallel_workers_get_validation_config():
+    import multiprocessing
+    import src.etl.parallel as parallel
+
+    configure_validation("pandera", 50)
+    try:
+        # a spawned worker does not inherit the parent's module globals
+        with parallel._pool(1, multiprocessing.get_context("spawn")) as pool:
+            config = pool.submit(validation_config).result()
+    finally:
+        configure_validation()
+    assert config == {"mode": "pandera", "sample_rows": 50}
+
+
+def test_parquet_writer_sorts_and_swaps_partitions(tmp_path):
+    import pyarrow.parquet as pq
+
+    root = tmp_path / "fact_inventory"
+    df = pd.DataFrame(
+        {"product_id": [3, 1, 2, 5, 4], "warehouse": ["WH-A", "WH-A", "WH-B", "WH-B", "WH-A"]}
+    )
+    write_parquet(df, root, ["warehouse"], sort_by=["product_id"])
+    # replace: WH-A is swapped for its new rows, WH-B is left alone
+    write_parquet(df[:1].assign(product_id=9), root, ["warehouse"], sort_by=["product_id"])
+
+    meta = pq.ParquetFile(root / "warehouse=WH-B" / "data.parquet").metadata
+    assert meta.row_group(0).column(0).compression == "ZSTD"
+    assert meta.row_group(0).column(0).statistics.min == 2
+    assert pd.read_parquet(root / "warehouse=WH-B")["product_id"].tolist() == [2, 5]
+    assert _read_sorted(root, "product_id")["product_id"].tolist() == [2, 5, 9]
+
+    # partitions are links to hidden versions; replacing one deletes its old version
+    assert (root / "warehouse=WH-A").is_symlink()
+    names = sorted(p.name for p in root.iterdir())
+    assert len(names) == 4 and names[2:] == ["warehouse=WH-A", "warehouse=WH-B"]
+
+    # overwrite publishes a new version of the dataset, dropping partitions
+    # missing from the new frame; only that version is left behind
+    write_parquet(df[df["warehouse"] == "WH-A"], root, ["warehouse"], ["product_id"], "overwrite")
+    assert root.is_symlink() and [p.name for p in root.iterdir()] == ["warehouse=WH-A"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [root.resolve().name, "fact_inventory"]
+    assert pd.read_parquet(root)["product_id"].tolist() == [1, 3, 4]
+
+
+def test_trusted_tables_lookups_reload_after_a_run(tmp_path):
+    import pyarrow.dataset as ds
+
+    raw = tmp_path / "raw"
+    _, inv = _write_raw(raw)
+    out = tmp_path / "out"
+    run_incremental(str(raw), str(out))
+
+    tables = TrustedTables(out)
+    assert tables.product(sku="AB-001")["product_id"] == 1001
+    assert tables.product(product_id=1003)["sku"] == "ZX-900"
+    assert tables.product(sku="ZZ-001") is None
+    assert tables.vendor("V-77")["vendor_name"] == "Vectortron GmbH"
+    assert tables.warehouses() == ["WH-A", "WH-B"]
+    assert [r["on_hand"] for r in tables.stock(sku="AB-001", warehouse="WH-A")] == [10]
+    assert [r["warehouse"] for r in tables.stock(product_id=1003)] == ["WH-B"]
+    assert tables.below_min_stock().empty
+    scanned = tables.scan("fact_inventory", ds.field("warehouse") == "WH-B", ["product_id"])
+    assert scanned["product_id"].tolist() == [1003]
+
+    # the next run swaps the partition; cached indexes notice and reload
+    inv.loc[0, "on_hand"] = 2
+    inv.to_parquet(raw / "inventory.parquet", index=False)
+    run_incremental(str(raw), str(out))
+    assert [r["on_hand"] for r in tables.stock(sku="AB-001", warehouse="WH-A")] == [2]
+    assert tables.below_min_stock("WH-A")["product_id"].tolist() == [1001]
+
+
+def test_run_engine_selects_vendor_engine_too(tmp_path, monkeypatch):
+    import src.etl.transform as transform
+
+    raw = tmp_path / "raw"
+    _write_raw(raw)
+    frames = {}
+    for engine in ENGINES:
+        out = tmp_path / engine
+        argv = ["run", "--raw-dir", str(raw), "--out-dir", str(out), "--engine", engine]
+        monkeypatch.setattr(sys, "argv", argv)
+        with monkeypatch.context() as m:
+            if engine == "rows":
+                # --engine rows must not reach the columnar vendor dedup
+                m.setattr(transform, "_build_dim_vendor_columnar", None)
+            main()
+        frames[engine] = pd.read_parquet(out / "dim_vendor")
+    pd.testing.assert_frame_equal(frames["rows"], frames["columnar"])
+    assert frames["rows"]["vendor_name"].tolist() == ["Zelica Ltd", "Vectortron GmbH"]
+
+
+def test_profile_writes_run_metrics(tmp_path, monkeypatch):
+    raw, out = tmp_path / "raw", tmp_path / "out"
+    _write_raw(raw)
+    argv = ["run", "--raw-dir", str(raw), "--out-dir", str(out), "--profile", "--profile-dump"]
+    monkeypatch.setattr(sys, "argv", argv)
+    main()
+
+    metrics = json.loads((out / "run_metrics.json").read_text())
+    stages = {stage["name"]: stage for stage in metrics["stages"]}
+    assert list(stages) == ["read", "validate", "transform", "write"]
+    assert stages["read"]["rows_out"]["products"] == 5
+    assert stages["transform"]["rows_out"]["dim_product"] == 3
+    assert all(stage["wall_seconds"] >= 0 for stage in stages.values())
+    assert (out / "transform.prof").exists()
+    assert metrics["outputs"]["fact_inventory"] == 2
+    assert metrics["quarantine"]["products"] == {"invalid_weight": 1, "dimensions_incomplete": 1}
+
+
+def test_streaming_with_empty_vendors_matches_in_memory(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    _write_raw(raw)
+    (raw / "vendors.jsonl").write_text("")
+    run_streaming(str(raw), str(tmp_path / "streaming"), batch_rows=2)
+    monkeypatch.setattr(
+        sys, "argv", ["run", "--raw-dir", str(raw), "--out-dir", str(tmp_path / "mem")]
+    )
+    main()
+
+    assert pd.read_parquet(tmp_path / "streaming" / "dim_vendor").empty
+    for name, by in [("dim_vendor", "vendor_code"), ("dim_product", "sku")]:
+        expected = _read_sorted(tmp_path / "mem" / name, by)
+        pd.testing.assert_frame_equal(_read_sorted(tmp_path / "streaming" / name, by), expected)
+
+
+def test_quarantine_store_keeps_runs_and_summary(tmp_path):
+    raw, out = tmp_path / "raw", tmp_path / "out"
+    _write_raw(raw)
+    run_streaming(str(raw), str(out), batch_rows=2)
+    first = quarantine_summary(out)["run_id"].iloc[0]
+    run_streaming(str(raw), str(out), batch_rows=3)
+
+    summary = quarantine_summary(out)
+    assert summary["run_id"].nunique() == 2
+    assert summary["run_id"].iloc[0] == first
+    # each run committed its own summary file; none was rewritten
+    summaries = sorted((out / "silver" / "_quarantine" / "summary").glob("run_id=*/*.parquet"))
+    assert [p.parent.name for p in summaries] == sorted(
+        f"run_id={r}" for r in summary["run_id"].unique()
+    )
+    runs = sorted((out / "silver" / "_quarantine" / "products").glob("date=*/run_id=*"))
+    assert len(runs) == 2
+    # earlier runs stay readable; both found the same rejects
+    old, new = read_quarantine(out, "products", run_id=first), read_quarantine(out, "products")
+    assert sorted(old["sku"]) == sorted(new["sku"])
+
+    reasons = new["reason"]
+    assert reasons.dtype == "category"
+    assert list(reasons.cat.categories) == list(REASONS["products"])
+    latest = summary[summary["run_id"] != first]
+    counts = latest[latest["table"] == "products"].set_index("reason")["rows"]
+    assert counts.to_dict() == {r: int((reasons == r).sum()) for r in REASONS["products"]}
+    assert (
+        quarantine_counts(out)["inventory"]
+        == read_quarantine(out, "inventory")["reason"].value_counts().loc[lambda n: n > 0].to_dict()
+    )
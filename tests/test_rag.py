@@ -1,5 +1,22 @@
+import asyncio
+import json
+import time
+import httpx
 from fastapi.testclient import TestClient
+import src.rag.api as api
 from src.rag.api import app, _startup
+import shutil
+import numpy as np
+import pytest
+from src.rag.cache import QueryCache
+from src.rag.chunking import chunk_pages, count_tokens
+from src.rag.embed import HashingEmbedder, build_ann_index, set_search_params
+from src.rag.fusion import fuse
+from src.rag.ingest import ingest
+from src.rag.lexical import BM25Index
+from src.rag.migrate import migrate_index
+from src.rag.retriever import RAGIndex, answer_question
+from src.rag.store import ChunkStore
 
 
 def test_ask_smoke():
@@ -11,3 +28,333 @@ def test_ask_smoke():
     assert "answer" in data and "sources" in data
     assert isinstance(data["sources"], list)
     assert len(data["sources"]) >= 1
+
+
+def test_bm25_ranks_and_round_trips(tmp_path):
+    chunks = [
+        "Router specifications: dual-band router, 4 Gigabit ports",
+        "Operating temperature: 0C to 40C",
+        "Router firmware updates over the web interface",
+        "Power consumption: 12V/2A adapter",
+    ]
+    index = BM25Index.build(chunks)
+    top = index.top_k("router specifications", k=2)
+    assert [idx for idx, _, _ in top] == [0, 2]
+    assert top[0][2] == 1.0 and top[1][2] == 0.5
+    assert index.top_k("nothing matches", k=3) == []
+
+    index.save(tmp_path / "lexical")
+    loaded = BM25Index.load(tmp_path / "lexical")
+    assert loaded.top_k("operating temperature", k=1) == index.top_k("operating temperature", k=1)
+
+
+def test_index_without_lexical_file_is_rebuilt():
+    rag = RAGIndex("data/rag/index")
+    hits = rag.search("Gigabit ports", k=3)
+    assert hits[0]["snippet"].startswith("Ethernet ports")
+    assert hits[0]["coverage"] == 1.0
+
+
+def test_ann_indexes_match_exact_search():
+    rng = np.random.default_rng(0)
+    words = [f"spec{i}" for i in range(300)]
+    chunks = [" ".join(rng.choice(words, 12)) for _ in range(2000)]
+    embedder = HashingEmbedder(dim=64).fit(chunks)
+    vectors = embedder.embed(chunks)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+    # deterministic across instances (no salted hash)
+    assert np.array_equal(HashingEmbedder(dim=64).fit(chunks).embed(chunks[:5]), vectors[:5])
+
+    exact = build_ann_index(vectors, "flat")
+    query = embedder.embed([chunks[42]])
+    for kind in ("hnsw", "ivf"):
+        index = build_ann_index(vectors, kind)
+        set_search_params(index, ef_search=256, nprobe=index.nlist if kind == "ivf" else 1)
+        assert index.search(query, 1)[1][0, 0] == exact.search(query, 1)[1][0, 0] == 42
+
+
+def test_vector_search_mode():
+    rag = RAGIndex("data/rag/index")
+    hits = rag.search("router specifications", k=3, mode="vector")
+    assert hits[0]["snippet"].startswith("Alpha-X Pro Router Specifications")
+    assert hits[0]["coverage"] == 1.0
+
+
+def test_rank_fusion():
+    rankings = {"lexical": [(1, 9.0), (2, 8.0), (4, 1.0)], "vector": [(2, 0.9), (3, 0.8)]}
+    # 2 is found by both retrievers, so it beats 1 despite ranking second lexically
+    assert [idx for idx, _ in fuse("rrf", rankings, {})] == [2, 1, 3, 4]
+    assert [idx for idx, _ in fuse("rrf", rankings, {"vector": 0.0})][0] == 1
+    assert [idx for idx, _ in fuse("weighted", rankings, {})][:2] == [2, 1]
+
+
+def test_hybrid_search_and_ask_options():
+    rag = RAGIndex("data/rag/index")
+    # no exact token matches; hybrid finds them through the stem features and rerank
+    for query, expected in [("certifications", "Power consumption"), ("managing", "Management")]:
+        assert rag.search(query, k=3, mode="lexical") == []
+        assert rag.search(query, k=3)[0]["snippet"].startswith(expected)
+    assert rag.search("Gigabit ports", k=1, mode="hybrid", fusion="weighted")[0]["coverage"] == 1.0
+
+    _startup()
+    c = TestClient(app)
+    body = {"question": "Gigabit ports", "k": 2, "fusion": "weighted", "weights": {"vector": 0.5}}
+    r = c.post("/ask", json=body)
+    assert r.status_code == 200
+    assert len(r.json()["sources"]) == 2
+    assert c.post("/ask", json={"question": "x", "mode": "fuzzy"}).status_code == 422
+    for weights in ({"lexical": 0, "vector": 0}, {"vector": -1}):
+        body = {"question": "Gigabit ports", "fusion": "weighted", "weights": weights}
+        assert c.post("/ask", json=body).status_code == 422
+    # no lexical hits and a zero vector weight: every fused score is 0
+    assert rag.search("certifications", k=1, fusion="weighted", weights={"vector": 0})
+    with pytest.raises(ValueError):
+        rag.search("Gigabit ports", fusion="weighted", weights={"lexical": 0, "vector": 0})
+    assert all(hit["coverage"] == 0.0 for hit in rag.search("?!", k=3))
+
+
+def test_migrated_index_is_mmapped_and_equivalent(tmp_path):
+    shutil.copytree("data/rag/index", tmp_path / "index")
+    legacy = RAGIndex(tmp_path / "index")
+    assert migrate_index(tmp_path / "index")
+    assert not (tmp_path / "index" / "chunks.json").exists()
+    assert not migrate_index(tmp_path / "index")
+
+    rag = RAGIndex(tmp_path / "index")
+    assert isinstance(rag.chunks.texts.blob.base, np.memmap)
+    assert isinstance(rag.lexical.doc_ids.base, np.memmap)
+    assert list(rag.chunks) == list(legacy.chunks)
+    for query in ("Gigabit ports", "power consumption", "Ünïcode ∞"):
+        assert rag.search(query, k=3) == legacy.search(query, k=3)
+
+
+def _write_pdf(path, text):
+    # smallest valid single-page PDF with one line of Helvetica text
+    objs = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R"
+        b" /Resources << /Font << /F1 5 0 R >> >> >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objs[3] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+def test_incremental_ingest_on_migrated_index(tmp_path, monkeypatch):
+    import faiss
+    import src.rag.ingest as rag_ingest
+
+    # a migrated JSON index: no embedder config and the dummy 1-d faiss.index
+    # older directories were written with
+    index = tmp_path / "index"
+    shutil.copytree("data/rag/index", index)
+    dummy = faiss.IndexFlatIP(1)
+    dummy.add(np.zeros((8, 1), dtype="float32"))
+    faiss.write_index(dummy, str(index / "faiss.index"))
+    assert migrate_index(index)
+    _write_pdf(tmp_path / "new.pdf", "Spec sheet: fan noise details")
+
+    # the unnamed legacy chunks are tombstoned; keep them so the run appends
+    monkeypatch.setattr(rag_ingest, "COMPACT_ABOVE", 1.0)
+    summary = ingest([str(tmp_path / "new.pdf")], index)
+    assert summary["added"] == [(tmp_path / "new.pdf").as_posix()]
+    assert (summary["chunks"], summary["live"]) == (9, 1)
+    rag = RAGIndex(index)
+    assert rag.index.ntotal == 9 and rag.index.d == rag.embedder.dim
+    assert rag.search("fan noise", k=1, mode="vector")[0]["source"].endswith("new.pdf")
+
+
+def test_incremental_multi_pdf_ingest(tmp_path, capsys):
+    topics = ["fan noise", "battery life", "rack mounting", "poe budget"]
+    topics += ["vlan tagging", "mesh roaming", "usb storage", "dns filtering"]
+    lib, out = tmp_path / "lib", tmp_path / "index"
+    lib.mkdir()
+    for i, topic in enumerate(topics):
+        _write_pdf(lib / f"doc{i}.pdf", f"Spec sheet {i}: {topic} details")
+
+    summary = ingest([str(lib)], out, workers=2)
+    assert len(summary["added"]) == 8 and summary["live"] == 8
+    hit = RAGIndex(out).search("battery life", k=1)[0]
+    assert hit["source"].endswith("doc1.pdf") and hit["page"] == 1
+
+    assert ingest([str(lib / "*.pdf")], out)["unchanged"] == 8
+
+    # one changed document: its old chunk is tombstoned, the new one appended
+    _write_pdf(lib / "doc1.pdf", "Spec sheet 1: thermal throttling details")
+    summary = ingest([str(lib)], out)
+    assert summary["changed"] == [(lib / "doc1.pdf").as_posix()]
+    assert (summary["chunks"], summary["live"]) == (9, 8)
+    # BM25 postings are appended to and masked, and match a rebuild
+    assert "Appended 1 chunks to the lexical index" in capsys.readouterr().out
+    lexical = BM25Index.load(out / "lexical")
+    expected = BM25Index.build(ChunkStore.load(out).indexable())
+    assert list(lexical.terms) == list(expected.terms)
+    for name in ("indptr", "doc_ids", "tfs", "doc_len"):
+        assert np.array_equal(getattr(lexical, name), getattr(expected, name))
+    rag = RAGIndex(out)
+    for mode in ("lexical", "vector", "hybrid"):
+        assert all("battery" not in h["snippet"] for h in rag.search("battery life", 8, mode))
+    assert rag.search("thermal throttling", k=1)[0]["source"].endswith("doc1.pdf")
+
+    # past COMPACT_ABOVE tombstones the index is rebuilt from the live chunks
+    (lib / "doc2.pdf").unlink()
+    (lib / "doc3.pdf").unlink()
+    summary = ingest([str(lib)], out)
+    assert len(summary["removed"]) == 2
+    assert (summary["chunks"], summary["live"]) == (6, 6)
+    assert RAGIndex(out).search("rack mounting", k=1, mode="lexical") == []
+
+
+def test_concurrent_asks_are_micro_batched():
+    _startup()
+    questions = ["Gigabit ports", "power consumption", "firmware", "weight"] * 4
+
+    async def ask_all():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            requests = [c.post("/ask", json={"question": q, "k": 3}) for q in questions]
+            requests.append(c.post("/ask", json={"question": "weight", "mode": "lexical"}))
+            return await asyncio.gather(*requests)
+
+    responses = asyncio.run(ask_all())
+    assert all(r.status_code == 200 for r in responses)
+    # same answers as one-by-one; the lexical request has other options, so its own batch
+    for q, r in zip(questions, responses):
+        assert r.json() == answer_question(api._index, q, k=3)
+    assert responses[-1].json() == answer_question(api._index, "weight", mode="lexical")
+    stats = api._batcher.stats
+    assert stats["requests"] == 17 and stats["batches"] < 17 and stats["largest_batch"] > 1
+
+
+def test_query_cache_limits_and_invalidation(tmp_path):
+    cache = QueryCache(max_entries=2, path=tmp_path / "cache.sqlite")
+    key = cache.key("Gigabit  PORTS?", (5, "hybrid"), "v1")
+    assert key == cache.key("gigabit ports", (5, "hybrid"), "v1")
+    assert cache.get(key) is None
+    cache.put(key, {"answer": "a"})
+    assert cache.get(key) == {"answer": "a"}
+    for q in ("b", "c"):
+        cache.put(cache.key(q, (5, "hybrid"), "v1"), {"answer": q})
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 1
+
+    # another worker sharing the SQLite file; evicted entries are still on disk
+    other = QueryCache(path=tmp_path / "cache.sqlite")
+    assert other.get(key) == {"answer": "a"} and other.stats()["disk_hits"] == 1
+    # a worker moving to a new index version drops its memory entries only:
+    # one still serving v1 during a rolling reload keeps its shared hits
+    v2 = cache.key("gigabit ports", (5, "hybrid"), "v2")
+    assert other.get(v2) is None and other.stats()["entries"] == 0
+    asyncio.run(other.aput(v2, {"answer": "a2"}))
+    assert QueryCache(path=tmp_path / "cache.sqlite").get(key) == {"answer": "a"}
+    assert asyncio.run(QueryCache(path=tmp_path / "cache.sqlite").aget(v2)) == {"answer": "a2"}
+
+    expired = QueryCache(ttl_seconds=0)
+    expired.put(key, {"answer": "a"})
+    assert expired.get(key) is None and expired.stats()["expired"] == 1
+
+
+def test_ask_uses_cache_and_reports_stats():
+    _startup()
+    c = TestClient(app)
+    first = c.post("/ask", json={"question": "Gigabit ports"}).json()
+    assert c.post("/ask", json={"question": "gigabit ports!"}).json() == first
+    c.post("/ask", json={"question": "gigabit ports", "k": 2})
+    stats = c.get("/stats").json()
+    assert stats["cache"]["hits"] == 1 and stats["cache"]["misses"] == 2
+    assert stats["index"]["version"] == api._index.version
+
+
+def test_ask_batch_streams_ndjson():
+    _startup()
+    c = TestClient(app)
+    c.post("/ask", json={"question": "firmware", "k": 2})
+    questions = ["Gigabit ports", "firmware", "weight", "gigabit PORTS", "nothing here zzz"]
+    r = c.post("/ask_batch", json={"questions": questions, "k": 2})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    # the cached question streams first, every question gets exactly one line
+    assert lines[0]["index"] == 1
+    assert sorted(line["index"] for line in lines) == list(range(len(questions)))
+    for line in lines:
+        expected = answer_question(api._index, questions[line["index"]], k=2)
+        assert line["question"] == questions[line["index"]]
+        assert {"answer": line["answer"], "sources": line["sources"]} == expected
+    assert c.post("/ask_batch", json={"questions": []}).status_code == 422
+
+
+def test_admin_reload_swaps_index_without_dropping_requests(tmp_path, monkeypatch):
+    index_dir = tmp_path / "index"
+    shutil.copytree("data/rag/index", index_dir)
+    monkeypatch.setattr(api, "INDEX_PATH", str(index_dir))
+    _startup()
+    c = TestClient(app)
+    # disabled unless a token is configured
+    monkeypatch.setattr(api, "ADMIN_TOKEN", None)
+    assert c.post("/admin/reload").status_code == 403
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    admin = {"X-Admin-Token": "secret"}
+    before = c.post("/ask", json={"question": "Gigabit ports"}).json()
+    old = api._index
+    assert c.get("/health").json()["index"]["version"] == old.version
+
+    # a new version lands on disk while a request is still searching the old one
+    migrate_index(str(index_dir))
+    assert old.acquire()
+    r = c.post("/admin/reload", headers=admin)
+    assert r.status_code == 200 and r.json()["previous_version"] == old.version
+    health = c.get("/health").json()
+    assert health["index"]["version"] == r.json()["version"] != old.version
+    assert health["index"]["load_seconds"] >= 0
+    assert old.search("Gigabit ports", k=1)  # the in-flight request still works
+    old.release()
+    for _ in range(100):
+        if old.chunks is None:
+            break
+        time.sleep(0.05)
+    assert old.chunks is None  # released once it was no longer in use
+
+    # same answer from the new index, not served from the old version's cache entry
+    assert c.post("/ask", json={"question": "Gigabit ports"}).json() == before
+    assert c.get("/stats").json()["cache"]["misses"] == 2
+
+    assert c.post("/admin/reload", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    # only the served directory and RAG_RELOAD_PATHS can be loaded
+    missing = str(tmp_path / "missing")
+    assert c.post("/admin/reload", json={"path": missing}, headers=admin).status_code == 403
+    monkeypatch.setattr(api, "RELOAD_PATHS", [missing])
+    r = c.post("/admin/reload", json={"path": missing}, headers=admin)
+    assert r.status_code == 500 and api._index.version == health["index"]["version"]
+
+
+def test_chunker_keeps_sentences_tables_and_page_breaks_together():
+    sentence = "The fan speed follows the chassis temperature sensor reading."
+    pages = [
+        (1, "Thermal Design\n" + " ".join([sentence] * 8) + "\nThe enclosure ships with a wall"),
+        (2, "adapter rated at 24 V.\nPort Table\nModel    Ports    Power\nAX-1    8    20 W"),
+    ]
+    chunks = list(chunk_pages(pages, max_tokens=60, overlap_tokens=10))
+    assert chunks[0][0].startswith("Thermal Design\n") and chunks[0][1] == 1
+    assert all(count_tokens(text) <= 60 and text.endswith((".", "W")) for text, _ in chunks)
+    # the sentence running over the page break stays whole; the overlap is one sentence
+    assert any("a wall adapter rated at 24 V." in text for text, _ in chunks)
+    assert chunks[1][0].startswith(sentence) and chunks[0][0].endswith(sentence)
+    assert any("Port Table\nModel    Ports    Power\nAX-1    8    20 W" in t for t, _ in chunks)
+
+    # an oversized table is split between rows, each part under its header row
+    rows = "\n".join(f"AX-{i}    {i}    {10 * i} W" for i in range(1, 9))
+    parts = [t for t, _ in chunk_pages([(1, "Model    Ports    Power\n" + rows)], 20)]
+    assert len(parts) > 1 and all(t.startswith("Model    Ports    Power\nAX-") for t in parts)
+    assert sum(t.count("\nAX-") for t in parts) == 8